@@ -1,7 +1,7 @@
 import asyncio
 import struct
 from const import API_ACTIONS as spec
-from const import RT_CMDS
+from rt_templates import RT_TMPL
 from hdlr_class import HdlrBase
 
 
@@ -21,12 +21,12 @@ class ActionsHdlr(HdlrBase):
                 if self.args_err:
                     return
                 outp_bit = 1 << (self._args[2] - 1)
-                self._rt_command = (
-                    RT_CMDS.SET_OUT_ON.replace("<rtr>", chr(rt))
-                    .replace("<mod>", chr(mod))
-                    .replace("<outl>", chr(outp_bit & 0xFF))
-                    .replace("<outm>", chr((outp_bit >> 8) & 0xFF))
-                    .replace("<outh>", chr((outp_bit >> 16) & 0xFF))
+                self._rt_command = RT_TMPL.SET_OUT_ON.build(
+                    rt,
+                    mod=mod,
+                    outl=outp_bit & 0xFF,
+                    outm=(outp_bit >> 8) & 0xFF,
+                    outh=(outp_bit >> 16) & 0xFF,
                 )
 
                 self.logger.debug(
@@ -41,12 +41,12 @@ class ActionsHdlr(HdlrBase):
                 if self.args_err:
                     return
                 outp_bit = 1 << (self._args[2] - 1)
-                self._rt_command = (
-                    RT_CMDS.SET_OUT_OFF.replace("<rtr>", chr(rt))
-                    .replace("<mod>", chr(mod))
-                    .replace("<outl>", chr(outp_bit & 0xFF))
-                    .replace("<outm>", chr((outp_bit >> 8) & 0xFF))
-                    .replace("<outh>", chr((outp_bit >> 16) & 0xFF))
+                self._rt_command = RT_TMPL.SET_OUT_OFF.build(
+                    rt,
+                    mod=mod,
+                    outl=outp_bit & 0xFF,
+                    outm=(outp_bit >> 8) & 0xFF,
+                    outh=(outp_bit >> 16) & 0xFF,
                 )
                 self.logger.debug(
                     f"Router {rt}, module {mod}: turn output {self._args[2]} off"
@@ -62,11 +62,11 @@ class ActionsHdlr(HdlrBase):
                 )
                 if self.args_err:
                     return
-                self._rt_command = (
-                    RT_CMDS.SET_DIMM_VAL.replace("<rtr>", chr(rt))
-                    .replace("<mod>", chr(mod))
-                    .replace("<out>", chr(self._args[2]))
-                    .replace("<val>", chr(self._args[3]))
+                self._rt_command = RT_TMPL.SET_DIMM_VAL.build(
+                    rt,
+                    mod=mod,
+                    out=self._args[2],
+                    val=self._args[3],
                 )
                 await self.handle_router_cmd(rt, self._rt_command)
                 await asyncio.sleep(0.1)
@@ -74,12 +74,12 @@ class ActionsHdlr(HdlrBase):
                 if self.api_srv.routers[rt - 1].get_module(mod)._typ[0] == 1:
                     out_offs = 10  # on SC Dimm1 = Out 11
                 outp_bit = 1 << (self._args[2] + out_offs - 1)
-                self._rt_command = (
-                    RT_CMDS.SET_OUT_ON.replace("<rtr>", chr(rt))
-                    .replace("<mod>", chr(mod))
-                    .replace("<outl>", chr(outp_bit & 0xFF))
-                    .replace("<outm>", chr((outp_bit >> 8) & 0xFF))
-                    .replace("<outh>", chr((outp_bit >> 16) & 0xFF))
+                self._rt_command = RT_TMPL.SET_OUT_ON.build(
+                    rt,
+                    mod=mod,
+                    outl=outp_bit & 0xFF,
+                    outm=(outp_bit >> 8) & 0xFF,
+                    outh=(outp_bit >> 16) & 0xFF,
                 )
                 self.logger.debug(
                     f"Router {rt}, module {mod}: set dimm value output {self._args[2]} to {self._args[3]}"
@@ -104,12 +104,12 @@ class ActionsHdlr(HdlrBase):
                 if val in range(1, 99):
                     # Fix, otherwise position is always wrong
                     val -= 1
-                self._rt_command = (
-                    RT_CMDS.SET_COVER_POS.replace("<rtr>", chr(rt))
-                    .replace("<mod>", chr(mod))
-                    .replace("<sob>", chr(self._args[2]))
-                    .replace("<out>", chr(self._args[3]))
-                    .replace("<val>", chr(val))
+                self._rt_command = RT_TMPL.SET_COVER_POS.build(
+                    rt,
+                    mod=mod,
+                    sob=self._args[2],
+                    out=self._args[3],
+                    val=val,
                 )
                 self.logger.debug(
                     f"Router {rt}, module {mod}: set cover {self._args[3]} position to {self._args[4]}"
@@ -130,12 +130,12 @@ class ActionsHdlr(HdlrBase):
                     sel = 87
                 else:
                     sel = 100
-                self._rt_command = (
-                    RT_CMDS.SET_TEMP.replace("<rtr>", chr(rt))
-                    .replace("<mod>", chr(mod))
-                    .replace("<sel>", chr(sel))
-                    .replace("<tmpl>", chr(self._args[3]))
-                    .replace("<tmph>", chr(self._args[4]))
+                self._rt_command = RT_TMPL.SET_TEMP.build(
+                    rt,
+                    mod=mod,
+                    sel=sel,
+                    tmpl=self._args[3],
+                    tmph=self._args[4],
                 )
                 self.logger.debug(
                     f"Router {rt}, module {mod}: set temperature set value of control {self._args[2]} to {(self._args[3]+256*self._args[4])/10}"
@@ -145,11 +145,11 @@ class ActionsHdlr(HdlrBase):
                 self.check_router_module_no(rt, mod)
                 if self.args_err:
                     return
-                self._rt_command = (
-                    RT_CMDS.CALL_VIS_CMD.replace("<rtr>", chr(rt))
-                    .replace("<mod>", chr(mod))
-                    .replace("<cmdl>", chr(self._args[2]))
-                    .replace("<cmdh>", chr(self._args[3]))
+                self._rt_command = RT_TMPL.CALL_VIS_CMD.build(
+                    rt,
+                    mod=mod,
+                    cmdl=self._args[2],
+                    cmdh=self._args[3],
                 )
                 self.logger.debug(
                     f"Router {rt}, module {mod}: visualization command {self._args[2]+256*self._args[3]}"
@@ -162,9 +162,7 @@ class ActionsHdlr(HdlrBase):
                 )
                 if self.args_err:
                     return
-                self._rt_command = RT_CMDS.CALL_COLL_CMD.replace(
-                    "<rtr>", chr(self._p4)
-                ).replace("<cmd>", chr(self._p5))
+                self._rt_command = RT_TMPL.CALL_COLL_CMD.build(self._p4, cmd=self._p5)
                 self.logger.debug(f"Router {rt}, collective command {self._p5}")
 
             case spec.DIR_CMD:
@@ -178,10 +176,10 @@ class ActionsHdlr(HdlrBase):
                 )
                 if self.args_err:
                     return
-                self._rt_command = (
-                    RT_CMDS.CALL_DIR_CMD.replace("<rtr>", chr(rt))
-                    .replace("<mod>", chr(mod))
-                    .replace("<cmd>", chr(self._args[0]))
+                self._rt_command = RT_TMPL.CALL_DIR_CMD.build(
+                    rt,
+                    mod=mod,
+                    cmd=self._args[0],
                 )
                 self.logger.debug(
                     f"Router {rt}, module {mod}: direct command {self._args[0]}"
@@ -200,19 +198,19 @@ class ActionsHdlr(HdlrBase):
                 flg_msk = 1 << (self._args[0] - 1)
                 if self._spec == spec.FLAG_SET:
                     if self._p5:
-                        cmd = RT_CMDS.SET_FLAG_ON
+                        cmd = RT_TMPL.SET_FLAG_ON
                     else:
-                        cmd = RT_CMDS.SET_GLB_FLAG_ON
+                        cmd = RT_TMPL.SET_GLB_FLAG_ON
                 else:
                     if self._p5:
-                        cmd = RT_CMDS.SET_FLAG_OFF
+                        cmd = RT_TMPL.SET_FLAG_OFF
                     else:
-                        cmd = RT_CMDS.SET_GLB_FLAG_OFF
-                self._rt_command = (
-                    cmd.replace("<rtr>", chr(rt))
-                    .replace("<mod>", chr(mod))
-                    .replace("<flgl>", chr(flg_msk & 0xFF))
-                    .replace("<flgh>", chr(flg_msk >> 8))
+                        cmd = RT_TMPL.SET_GLB_FLAG_OFF
+                self._rt_command = cmd.build(
+                    rt,
+                    mod=mod,
+                    flgl=flg_msk & 0xFF,
+                    flgh=flg_msk >> 8,
                 )
 
             case spec.LOGIC_RESET | spec.LOGIC_SET | spec.COUNTR_UP | spec.COUNTR_DOWN:
@@ -244,11 +242,11 @@ class ActionsHdlr(HdlrBase):
                     sr_str = "set"
                 inp_cnt = 164 + 8 * (self._args[0] - 1) + inp_no
 
-                self._rt_command = (
-                    RT_CMDS.SET_LOGIC_INP.replace("<rtr>", chr(rt))
-                    .replace("<mod>", chr(mod))
-                    .replace("<sr>", chr(rs_val))
-                    .replace("<inp>", chr(inp_cnt))
+                self._rt_command = RT_TMPL.SET_LOGIC_INP.build(
+                    rt,
+                    mod=mod,
+                    sr=rs_val,
+                    inp=inp_cnt,
                 )
                 self.logger.info(
                     f"Router {rt}, module {mod}: {sr_str} input {inp_no} of logic block {self._args[0]}"
@@ -262,11 +260,11 @@ class ActionsHdlr(HdlrBase):
                 )
                 if self.args_err:
                     return
-                self._rt_command = (
-                    RT_CMDS.SET_COUNTER_VAL.replace("<rtr>", chr(rt))
-                    .replace("<mod>", chr(mod))
-                    .replace("<lno>", chr(self._args[0]))
-                    .replace("<val>", chr(self._args[1]))
+                self._rt_command = RT_TMPL.SET_COUNTER_VAL.build(
+                    rt,
+                    mod=mod,
+                    lno=self._args[0],
+                    val=self._args[1],
                 )
                 self.logger.info(
                     f"Router {rt}, module {mod}: set value of counter {self._args[0]} to {self._args[1]}"
@@ -283,43 +281,41 @@ class ActionsHdlr(HdlrBase):
                     return
                 inp_code = self._args[0]
                 if self._spec == spec.OUTP_RBG_OFF:
-                    rt_cmd = RT_CMDS.SWOFF_RGB_CORNR
+                    rt_cmd = RT_TMPL.SWOFF_RGB_CORNR
                     if inp_code == 0:
-                        rt_cmd = RT_CMDS.SWOFF_RGB_AMB
+                        rt_cmd = RT_TMPL.SWOFF_RGB_AMB
                 elif inp_code == 0:
-                    rt_cmd = RT_CMDS.SET_RGB_AMB_COL
+                    rt_cmd = RT_TMPL.SET_RGB_AMB_COL
                 else:
-                    rt_cmd = RT_CMDS.SET_RGB_CORNR
-                rt_cmd = (
-                    rt_cmd.replace("<r>", chr(30))
-                    .replace("<g>", chr(30))
-                    .replace("<b>", chr(30))
-                )
+                    rt_cmd = RT_TMPL.SET_RGB_CORNR
                 if inp_code == 0:
                     inp_code = 100
                 else:
                     inp_code += 40
-                self._rt_command = (
-                    rt_cmd.replace("<rtr>", chr(rt))
-                    .replace("<mod>", chr(mod))
-                    .replace("<cnr>", chr(inp_code))
+                self._rt_command = rt_cmd.build(
+                    rt,
+                    mod=mod,
+                    cnr=inp_code,
+                    r=30,
+                    g=30,
+                    b=30,
                 )
                 # Code for setting output on/off flag, not needed later
                 await self.handle_router_cmd(rt, self._rt_command)
                 await asyncio.sleep(0.1)
                 if self._spec == spec.OUTP_RBG_OFF:
-                    rt_cmd = RT_CMDS.SET_OUT_OFF
+                    rt_cmd = RT_TMPL.SET_OUT_OFF
                 else:
-                    rt_cmd = RT_CMDS.SET_OUT_ON
+                    rt_cmd = RT_TMPL.SET_OUT_ON
                 out_msk = 1 << (self._args[0] + 15)
                 #  quick fix: use outputs 2..6, change also in Habitron module.py
                 # out_msk = 1 << (self._args[0] + 2)
-                self._rt_command = (
-                    rt_cmd.replace("<rtr>", chr(rt))
-                    .replace("<mod>", chr(mod))
-                    .replace("<outl>", chr(out_msk & 0xFF))
-                    .replace("<outm>", chr((out_msk >> 8) & 0xFF))
-                    .replace("<outh>", chr((out_msk >> 16) & 0xFF))
+                self._rt_command = rt_cmd.build(
+                    rt,
+                    mod=mod,
+                    outl=out_msk & 0xFF,
+                    outm=(out_msk >> 8) & 0xFF,
+                    outh=(out_msk >> 16) & 0xFF,
                 )
 
             case spec.OUTP_RBG_VAL:
@@ -338,34 +334,34 @@ class ActionsHdlr(HdlrBase):
                     inp_code = 100
                 else:
                     inp_code += 40
-                self._rt_command = (
-                    RT_CMDS.SET_RGB_LED.replace("<rtr>", chr(rt))
-                    .replace("<mod>", chr(mod))
-                    .replace("<tsk>", chr(task))
-                    .replace("<inp>", chr(inp_code))
-                    .replace("<md>", chr(2))
-                    .replace("<r>", chr(self._args[1]))
-                    .replace("<g>", chr(self._args[2]))
-                    .replace("<b>", chr(self._args[3]))
-                    .replace("<tl>", chr(3))
-                    .replace("<th>", chr(0))
+                self._rt_command = RT_TMPL.SET_RGB_LED.build(
+                    rt,
+                    mod=mod,
+                    tsk=task,
+                    inp=inp_code,
+                    md=2,
+                    r=self._args[1],
+                    g=self._args[2],
+                    b=self._args[3],
+                    tl=3,
+                    th=0,
                 )
                 # Code for setting output on/off flag, not needed later
                 await self.handle_router_cmd(rt, self._rt_command)
                 await asyncio.sleep(0.1)
                 if sum(self._args[1:4]) == 0:
-                    rt_cmd = RT_CMDS.SET_OUT_OFF
+                    rt_cmd = RT_TMPL.SET_OUT_OFF
                 else:
-                    rt_cmd = RT_CMDS.SET_OUT_ON
+                    rt_cmd = RT_TMPL.SET_OUT_ON
                 #  out_msk = 1 << (self._args[0] + 16)
                 #  quick fix: use outputs 2..6, change also in Habitron module.py
                 out_msk = 1 << (self._args[0] + 2)
-                self._rt_command = (
-                    rt_cmd.replace("<rtr>", chr(rt))
-                    .replace("<mod>", chr(mod))
-                    .replace("<outl>", chr(out_msk & 0xFF))
-                    .replace("<outm>", chr((out_msk >> 8) & 0xFF))
-                    .replace("<outh>", chr((out_msk >> 16) & 0xFF))
+                self._rt_command = rt_cmd.build(
+                    rt,
+                    mod=mod,
+                    outl=out_msk & 0xFF,
+                    outm=(out_msk >> 8) & 0xFF,
+                    outh=(out_msk >> 16) & 0xFF,
                 )
                 # self.logger.debug(
                 #     f"Router {rt}, module {mod}, led {inp_code}: turn LED to R:{self._args[1]} G:{self._args[2]} B:{self._args[3]}"
@@ -1,3 +1,4 @@
+import json
 import time
 import struct
 from const import API_ADMIN as spec
@@ -19,6 +20,7 @@ class AdminHdlr(HdlrBase):
             case spec.SMHUB_REINIT:
                 self.response = await self.api_srv.reinit_opr_mode(rt, self._p5)
             case spec.SMHUB_INFO:
+                await self.api_srv.sm_hub.wait_info()
                 self.response = self.api_srv.sm_hub.get_info()
             case spec.SMHUB_RESTART:
                 self.response = "Smart Hub will be restarted"
@@ -57,6 +59,22 @@ class AdminHdlr(HdlrBase):
                         f"Logging level for file handler set to {self._p5}"
                     )
                 self.response = "OK"
+            case spec.SMHUB_SERIAL_STAT:
+                self.check_arg(
+                    self._p4,
+                    range(2),
+                    "Parameter 4 must be 0 (read) or 1 (read and reset).",
+                )
+                if self.args_err:
+                    return
+                arbiter = self.api_srv.rt_arbiter
+                if arbiter is None:
+                    self.response = "Error: no serial interface in offline mode"
+                    self.logger.warning(self.response)
+                    return
+                self.response = json.dumps(arbiter.get_metrics())
+                if self._p4 == 1:
+                    arbiter.metrics.reset()
             case spec.RT_RESTART:
                 self.check_router_no(rt)
                 if self.args_err:
@@ -16,7 +16,11 @@ from files_hdlr import FilesHdlr
 from setup_hdlr import SetupHdlr
 from admin_hdlr import AdminHdlr
 from router import HbtnRouter
+from event_bus import EventBus, EventHistory
 from event_server import EventServer
+from serial_arbiter import SerialArbiter, operate_reads
+from status_journal import StatusJournal
+from snapshot import load_snapshot, save_snapshot
 
 # GPIO23, Pin 16: switch input, unpressed == 1
 # GPIO13, Pin 33: red
@@ -32,6 +36,12 @@ class ApiServer:
         self.sm_hub = sm_hub
         self.logger = logging.getLogger(__name__)
         self._rt_serial: tuple[StreamReader, StreamWriter] = rt_serial
+        self.rt_arbiter = SerialArbiter(self, rt_serial)
+        self.rt_arbiter.start()
+        self.event_bus = EventBus()
+        self.event_history = EventHistory(self.event_bus)
+        self.status_journal = StatusJournal()
+        self.snapshot_seq: int = -1  # journal seq of latest saved snapshot
         self._opr_mode: bool = True  # Allows explicitly setting operate mode off
         self.routers = []
         self.routers.append(HbtnRouter(self, 1))
@@ -61,11 +71,40 @@ class ApiServer:
         self.hdlr = DataHdlr(self)
         self.evnt_srv = EventServer(self)
         await self.set_initial_server_mode()
+        if self.warm_start():
+            # Serve restored status with events at once, check it in background
+            self._init_mode = False
+            await self.set_operate_mode()
+            rtr = self.routers[0]
+            rtr.reconcile_task = self.loop.create_task(
+                rtr.reconcile_snapshot(), name="snapshot_check"
+            )
+            return
         await self.routers[0].get_full_system_status()
         self.logger.info(
             f"API server, router, and {len(self.routers[0].modules)} modules initialized"
         )
         self._init_mode = False
+        save_snapshot(self)
+
+    def warm_start(self) -> bool:
+        """Restore router and modules from snapshot, checked later in background."""
+        snapshot = load_snapshot(self)
+        if snapshot is None:
+            return False
+        try:
+            self.routers[0].restore_snapshot(*snapshot)
+        except Exception as err_msg:
+            self.logger.warning(f"Warm start failed, reading full status: {err_msg}")
+            # Drop partly restored router with its status rows, and their changes
+            self.routers[0] = HbtnRouter(self, 1)
+            self.status_journal.clear()
+            return False
+        self.snapshot_seq = self.status_journal.seq
+        self.logger.info(
+            f"API server, router, and {len(self.routers[0].modules)} modules restored from snapshot"
+        )
+        return True
 
     async def handle_api_command(
         self, ip_reader: StreamReader, ip_writer: StreamWriter
@@ -158,6 +197,7 @@ class ApiServer:
 
     async def shutdown(self, rt, restart_flg):
         """Terminating all tasks and self."""
+        save_snapshot(self)
         await self.sm_hub.conf_srv.runner.cleanup()
         await self.set_server_mode(rt)
         await self.routers[rt - 1].flush_buffer()
@@ -274,38 +314,26 @@ class ApiServer:
         if self._init_mode:
             self.logger.debug("Skipping set Client/Server mode due to init_mode")
             return True
+        if operate_reads.get():
+            # Background reads through arbiter, events keep flowing
+            return True
 
         # Disable mirror first, then stop event handler
-        # Serial reader still used by event server
-        await self.hdlr.handle_router_cmd(rt_no, RT_CMDS.SET_SRV_MODE)
+        # Response is routed by serial arbiter, events may still be queued
+        await self.hdlr.handle_router_cmd_resp(rt_no, RT_CMDS.SET_SRV_MODE)
         await self.evnt_srv.stop()
+        self.rt_arbiter.flush()
         self._opr_mode = False
-        await asyncio.sleep(1)
-        await self.ensure_empty_response()
         self.logger.info("--- Switched to Client/Server mode")
         return not self._opr_mode
 
-    async def ensure_empty_response(self, rt_no=1) -> None:
-        """Send test command and wait for correspondig response."""
-        await self.hdlr.handle_router_cmd_resp(rt_no, RT_CMDS.GET_GLOB_MODE)
-        if len(self.hdlr.rt_msg._resp_buffer) < 4:
-            await self.hdlr.handle_router_cmd_resp(rt_no, RT_CMDS.GET_GLOB_MODE)
-        recent_resp = self.hdlr.rt_msg._resp_buffer[3] != ord(RT_CMDS.GET_GLOB_MODE[7])
-        while recent_resp:
-            self.logger.warning(
-                f"Received unexpected test response: {self.hdlr.rt_msg._resp_msg}"
-            )
-            await self.hdlr.handle_router_resp(rt_no)
-            recent_resp = self.hdlr.rt_msg._resp_buffer[3] != ord(
-                RT_CMDS.GET_GLOB_MODE[7]
-            )
-
     async def set_initial_server_mode(self, rt_no=1) -> None:
         """Turn on server mode: disable router events"""
         self._init_mode = True
         self._opr_mode = False
         await self.hdlr.handle_router_cmd_resp(rt_no, RT_CMDS.SET_SRV_MODE)
         await self.evnt_srv.stop()
+        self.rt_arbiter.flush()
         self.logger.debug("API mode turned off initially")
 
     async def set_testing_mode(self, activate: bool) -> None:
@@ -317,6 +345,8 @@ class ApiServer:
             if not self.last_operate:
                 await self.set_server_mode()
             self._test_mode = False
+        if "evnt_srv" in self.__dir__():
+            self.evnt_srv.set_testing_events(activate)
 
     def get_client_ip(self) -> bool:
         """Return host id from latest call."""
@@ -337,8 +367,10 @@ class ApiServerMin(ApiServer):
         self.sm_hub = sm_hub
         self.logger = logging.getLogger(__name__)
         self._rt_serial: None = None
+        self.rt_arbiter = None
         self._opr_mode: bool = False  # Always off
         self.hdlr = []
+        self.status_journal = StatusJournal()
         self.routers = []
         self.routers.append(HbtnRouter(self, 1))
         self.mirror_mode_enabled: bool = True
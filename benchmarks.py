@@ -0,0 +1,467 @@
+"""Micro-benchmarks of time critical code paths, run: python benchmarks.py [name ...]"""
+
+import asyncio
+import io
+import os
+import random
+import sys
+import timeit
+from checksum import (
+    Crc16,
+    calc_crc,
+    crc16_update,
+    crc16_update_py,
+    init_crc16_tbl,
+    xor_checksum,
+)
+from const import HA_EVENTS, MODULE_CODES, RT_CMDS, MirrIdx
+from mirr_decoder import get_decoder, swap_cover_idx
+from rt_framer import RtFramer
+from serial_capture import CAP_RX, CaptureWriter, read_capture, load_capture
+from rt_templates import RT_TMPL, finalize_cmd
+
+
+def report(name: str, number: int, secs: float) -> None:
+    """Print time per call in microseconds."""
+    print(f"{name:<40} {1e6 * secs / number:8.2f} us")
+
+
+def legacy_rt_cmd(cmd: str, rt: int) -> bytes:
+    """Former str based command preparation of RtMessage."""
+    buf = cmd.replace("<rtr>", chr(rt))
+    buf = buf[:2] + chr(len(buf)) + buf[3:]
+    chksum = 0
+    buf = buf[:-1]
+    for byt in buf:
+        chksum ^= ord(byt)
+    buf += chr(chksum)
+    return buf.encode("iso8859-1")
+
+
+LEGACY_CRC16_TBL = init_crc16_tbl()
+
+
+def legacy_calc_crc(data: bytes) -> int:
+    """Former byte loop crc16 of messages."""
+    tbl = LEGACY_CRC16_TBL
+    crc = 0xFFFF
+    for byt in data:
+        idx = tbl[(crc ^ int(byt)) & 0xFF]
+        crc = ((crc >> 8) & 0xFF) ^ idx
+    return ((crc << 8) & 0xFF00) | ((crc >> 8) & 0x00FF)
+
+
+def legacy_xor(buf: bytes) -> int:
+    """Former byte loop checksum of router responses."""
+    chksum = 0
+    for byt in buf:
+        chksum ^= byt
+    return chksum
+
+
+def bench_rt_cmds(number: int = 100000) -> None:
+    """Output switching and SMC package commands: str.replace chains vs. compiled templates."""
+    outp_bit = 1 << 12
+
+    def out_on_legacy():
+        cmd = (
+            RT_CMDS.SET_OUT_ON.replace("<mod>", chr(12))
+            .replace("<outl>", chr(outp_bit & 0xFF))
+            .replace("<outm>", chr((outp_bit >> 8) & 0xFF))
+            .replace("<outh>", chr((outp_bit >> 16) & 0xFF))
+        )
+        return legacy_rt_cmd(cmd, 1)
+
+    def out_on_tmpl():
+        return RT_TMPL.SET_OUT_ON.build(
+            1,
+            mod=12,
+            outl=outp_bit & 0xFF,
+            outm=(outp_bit >> 8) & 0xFF,
+            outh=(outp_bit >> 16) & 0xFF,
+        )
+
+    def smc_legacy():
+        cmd = (
+            RT_CMDS.GET_MOD_SMC.replace("<mod>", chr(12))
+            .replace("<area>", chr(50))
+            .replace("<pckg>", chr(7))
+        )
+        return legacy_rt_cmd(cmd, 1)
+
+    def smc_tmpl():
+        return RT_TMPL.GET_MOD_SMC.build(1, mod=12, area=50, pckg=7)
+
+    fw_buf = bytes(range(246))
+
+    def fw_legacy():
+        cmd = (
+            RT_CMDS.UPDATE_MOD_PKG.replace("<len>", chr(254))
+            .replace("<pno>", chr(3))
+            .replace("<pcnt>", chr(9))
+            .replace("<blen>", chr(246))
+            .replace("<buf>", fw_buf.decode("iso8859-1"))
+        )
+        return legacy_rt_cmd(cmd, 1)
+
+    def fw_tmpl():
+        return RT_TMPL.UPDATE_MOD_PKG.build(1, pno=3, pcnt=9, blen=246, buf=fw_buf)
+
+    assert out_on_legacy() == out_on_tmpl()
+    assert smc_legacy() == smc_tmpl()
+    assert fw_legacy() == fw_tmpl()
+    for name, func in [
+        ("SET_OUT_ON str.replace", out_on_legacy),
+        ("SET_OUT_ON template", out_on_tmpl),
+        ("GET_MOD_SMC str.replace", smc_legacy),
+        ("GET_MOD_SMC template", smc_tmpl),
+        ("UPDATE_MOD_PKG str.replace", fw_legacy),
+        ("UPDATE_MOD_PKG template", fw_tmpl),
+    ]:
+        n = number if "PKG" not in name else number // 10
+        report(name, n, timeit.timeit(func, number=n))
+
+
+def bench_framer(number: int = 200) -> None:
+    """Mirror burst of 50 frames: readexactly per header and tail vs. chunk reads into framer."""
+    frame = b"\xff" + finalize_cmd(bytearray(b"\x23\x01\x00\x87" + bytes(226) + b"\x00"))
+    burst = frame * 50
+
+    async def read_legacy(rd: asyncio.StreamReader) -> int:
+        cnt = 0
+        while cnt < 50:
+            prefix = await rd.readexactly(4)
+            await rd.readexactly(prefix[3] - 3)
+            cnt += 1
+        return cnt
+
+    async def read_framer(rd: asyncio.StreamReader) -> int:
+        framer = RtFramer()
+        cnt = 0
+        while cnt < 50:
+            data = await rd.read(framer.room())
+            for frm in framer.feed(data):
+                bytes(frm)
+                cnt += 1
+        return cnt
+
+    async def run(reader) -> float:
+        t_total = 0.0
+        for _ in range(number):
+            rd = asyncio.StreamReader()
+            rd.feed_data(burst)
+            t_start = timeit.default_timer()
+            assert await reader(rd) == 50
+            t_total += timeit.default_timer() - t_start
+        return t_total
+
+    report("mirror burst readexactly", number, asyncio.run(run(read_legacy)))
+    report("mirror burst framer", number, asyncio.run(run(read_framer)))
+
+
+def bench_checksum(number: int = 200) -> None:
+    """Crc16 of API message and firmware, streamed in chunks, xor of mirror frame."""
+    rnd = random.Random(2)
+    api_msg = bytes(rnd.randrange(256) for _ in range(40))
+    fw_buf = bytes(rnd.randrange(256) for _ in range(64 * 1024))
+    mirror = bytes(rnd.randrange(256) for _ in range(231))
+    assert legacy_calc_crc(fw_buf) == calc_crc(fw_buf)
+    assert legacy_calc_crc(fw_buf[:-1]) == calc_crc(fw_buf[:-1])
+    assert legacy_xor(mirror) == xor_checksum(mirror)
+
+    def streamed() -> int:
+        crc = Crc16()
+        for idx in range(0, len(fw_buf), 4096):
+            crc.update(fw_buf[idx : idx + 4096])
+        return crc.value()
+
+    assert streamed() == calc_crc(fw_buf)
+    backend = "C" if crc16_update is not crc16_update_py else "Python"
+    for name, func, n in [
+        ("crc16 api msg, byte loop", lambda: legacy_calc_crc(api_msg), 1000 * number),
+        (f"crc16 api msg, {backend}", lambda: calc_crc(api_msg), 1000 * number),
+        ("crc16 64k fw, byte loop", lambda: legacy_calc_crc(fw_buf), number // 10),
+        ("crc16 64k fw, words", lambda: crc16_update_py(0xFFFF, fw_buf), number // 10),
+        (f"crc16 64k fw, {backend}", lambda: calc_crc(fw_buf), number // 10),
+        ("crc16 64k fw, 4k chunks", streamed, number // 10),
+        ("xor mirror frame, byte loop", lambda: legacy_xor(mirror), 1000 * number),
+        ("xor mirror frame, int fold", lambda: xor_checksum(mirror), 1000 * number),
+    ]:
+        report(name, n, timeit.timeit(func, number=n))
+
+
+def legacy_compare(
+    stat1: bytes, stat2: bytes, diff_idx: list[int], idx: int
+) -> list[int]:
+    """Former byte loop of changed mirror indices."""
+    for x, y in zip(stat1, stat2):
+        if x != y:
+            diff_idx.append(idx)
+        idx += 1
+    return diff_idx
+
+
+def legacy_mirror_diff(
+    typ: bytes, mod_type: str, old_status: bytes, new_status: bytes, group: int
+) -> list[list[int]]:
+    """Former diff of HbtnModule.update_status, range chain per changed byte."""
+    if old_status == new_status:
+        return []
+    block_list = []
+    update_info = []
+    i_diff = []
+
+    if mod_type in [
+        "Smart Nature",
+        "Smart GSM",
+        "FanM-Bus",
+        "Smart In 8/24V",
+        "Smart In 8/230V",
+        "Fanekey",
+    ]:
+        pass  # Don't track update changes for these modules
+    else:
+        if mod_type in ["Smart In 8/24V-1"]:
+            i0 = MirrIdx.AD_1
+            i1 = MirrIdx.DISPL_CONTR + 1
+        elif mod_type in [
+            "Smart Detect 180",
+            "Smart Detect 180-2",
+            "Smart Detect 360",
+        ]:
+            i0 = MirrIdx.LUM
+            i1 = MirrIdx.MOV + 1
+        elif mod_type in [
+            "Smart Out 8/R",
+            "Smart Out 8/R-1",
+            "Smart Out 8/R-2",
+            "Smart Out 8/T",
+        ]:
+            block_list = [
+                MirrIdx.LUM,
+                MirrIdx.TEMP_ROOM,
+                MirrIdx.TEMP_PWR,
+                MirrIdx.TEMP_EXT,
+            ]
+            i0 = MirrIdx.DIM_1
+            i1 = MirrIdx.T_SHORT  # includes BLAD_POS
+        else:  # Controller modules
+            block_list = [
+                MirrIdx.HUM,
+                MirrIdx.AQI,
+                MirrIdx.LUM,
+                MirrIdx.TEMP_ROOM,
+                MirrIdx.TEMP_PWR,
+                MirrIdx.TEMP_EXT,
+            ]
+            ia0 = MirrIdx.AD_1
+            ia1 = MirrIdx.AD_2 + 1
+            im0 = MirrIdx.MODE
+            im1 = MirrIdx.MODE + 1
+            i0 = MirrIdx.DIM_1
+            i1 = MirrIdx.T_SHORT
+            i2 = MirrIdx.LOGIC
+            i3 = MirrIdx.FLAG_LOC + 2
+            i_diff = legacy_compare(
+                old_status[i2:i3], new_status[i2:i3], i_diff, i2
+            )
+            i_diff = legacy_compare(
+                old_status[im0:im1], new_status[im0:im1], i_diff, im0
+            )
+            i_diff = legacy_compare(
+                old_status[ia0:ia1], new_status[ia0:ia1], i_diff, ia0
+            )
+        i_diff = legacy_compare(
+            old_status[i0:i1], new_status[i0:i1], i_diff, i0
+        )
+        for i_d in i_diff:
+            if i_d not in block_list:
+                ev_type = 0
+                ev_str = "-"
+                val = new_status[i_d]
+                if i_d in range(MirrIdx.MODE, MirrIdx.MODE + 1):
+                    ev_type = HA_EVENTS.MODE
+                    ev_str = "Mode"
+                    idv = group
+                elif i_d in range(MirrIdx.MOV, MirrIdx.MOV + 1):
+                    ev_type = HA_EVENTS.MOVE
+                    ev_str = "Movement"
+                    idv = 0
+                elif i_d in range(MirrIdx.COVER_POS, MirrIdx.COVER_POS + 8):
+                    ev_type = HA_EVENTS.COV_VAL
+                    idv = swap_cover_idx(typ, i_d - MirrIdx.COVER_POS)
+                    ev_str = f"Cover {idv + 1} pos"
+                elif i_d in range(MirrIdx.BLAD_POS, MirrIdx.BLAD_POS + 8):
+                    ev_type = HA_EVENTS.BLD_VAL
+                    idv = swap_cover_idx(typ, i_d - MirrIdx.BLAD_POS)
+                    ev_str = f"Blade {idv + 1} pos"
+                elif i_d in range(MirrIdx.DIM_1, MirrIdx.DIM_4 + 1):
+                    ev_type = HA_EVENTS.DIM_VAL
+                    idv = i_d - MirrIdx.DIM_1
+                    ev_str = f"Dimmmer {idv + 1}"
+                elif i_d in range(MirrIdx.FLAG_LOC, MirrIdx.FLAG_LOC + 2):
+                    ev_type = HA_EVENTS.FLAG
+                    old_val = old_status[i_d]
+                    new_val = new_status[i_d]
+                    chg_msk = old_val ^ new_val
+                    val = new_val & chg_msk
+                    for i in range(8):
+                        if (chg_msk & (1 << i)) > 0:
+                            break
+                    idv = 1 << i
+                    if idv != chg_msk:
+                        # more than one flag changed, return mask and byte
+                        idv = chg_msk + 1000
+                        if i_d > MirrIdx.FLAG_LOC:  # upper byte
+                            idv = idv + 1000
+                    else:
+                        # single change, return flag no and value 0/1
+                        idv = i
+                        if i_d > MirrIdx.FLAG_LOC:  # upper byte
+                            idv = idv + 8
+                        val = int(val > 0)
+                    ev_str = f"Flag {idv + 1}"
+                elif i_d in range(MirrIdx.COUNTER_VAL, MirrIdx.COUNTER_VAL + 28):
+                    ev_type = HA_EVENTS.CNT_VAL
+                    idv = int((i_d - MirrIdx.COUNTER_VAL) / 3)
+                    ev_str = f"Counter {idv + 1}"
+                elif i_d in range(MirrIdx.AD_1, MirrIdx.AD_2 + 1):
+                    ev_type = HA_EVENTS.ANLG_VAL
+                    idv = i_d - MirrIdx.AD_1
+                    ev_str = f"Analog in {idv + 1}"
+                elif i_d in range(MirrIdx.GEN_1, MirrIdx.GEN_2 + 1):
+                    if typ == b"\x0b\x1f":
+                        ev_type = HA_EVENTS.ANLG_VAL
+                        idv = i_d - MirrIdx.GEN_1 + 2
+                        ev_str = f"Analog in {idv + 1}"
+                elif i_d in range(MirrIdx.GEN_3, MirrIdx.GEN_4 + 1):
+                    if typ == b"\x0b\x1f":
+                        ev_type = HA_EVENTS.ANLG_VAL
+                        idv = i_d - MirrIdx.GEN_3 + 4
+                        ev_str = f"Analog in {idv + 1}"
+                if ev_type > 0:
+                    update_info.append(
+                        [
+                            new_status[0],
+                            ev_type,
+                            idv,
+                            val,
+                        ]
+                    )
+    return update_info
+
+
+def bench_mirror_diff(number: int = 20) -> None:
+    """Mirror updates of capture in SMHUB_BENCH_CAPTURE or synthetic: range chain vs. decoder table."""
+    path = os.getenv("SMHUB_BENCH_CAPTURE")
+    records = load_capture(path) if path else synthetic_capture(changes=3)
+    framer = RtFramer()
+    mirrors = []
+    for _, direction, data in records:
+        if direction != CAP_RX:
+            continue
+        framer.room()
+        for frm in framer.feed(data):
+            if frm[4] == 0x87 and len(frm) == MirrIdx.END + 6:
+                mirrors.append(bytes(frm[5:-1]))
+    for typ in [b"\x01\x02", b"\x0a\x01", b"\x0b\x1f"]:
+        mod_type = MODULE_CODES[typ.decode("iso8859-1")]
+        decoder = get_decoder(typ, mod_type)
+        pairs = []
+        last: dict[int, bytes] = {}
+        for mirr in mirrors:
+            if mirr[0] in last:
+                pairs.append((last[mirr[0]], mirr))
+            last[mirr[0]] = mirr
+
+        def diff_legacy() -> int:
+            cnt = 0
+            for old, new in pairs:
+                cnt += len(legacy_mirror_diff(typ, mod_type, old, new, 0))
+            return cnt
+
+        def diff_table() -> int:
+            cnt = 0
+            for old, new in pairs:
+                if old != new:
+                    cnt += len(decoder.diff(old, new))
+            return cnt
+
+        for old, new in pairs:
+            assert legacy_mirror_diff(typ, mod_type, old, new, 0) == [
+                [new[0], ev_type, idv, val]
+                for _, ev_type, idv, val, _ in decoder.diff(old, new)
+            ]
+        no_events = diff_table()
+        for name, func in [("range chain", diff_legacy), ("decoder table", diff_table)]:
+            secs = timeit.timeit(func, number=number)
+            report(f"{mod_type[:14]}, {name}", number * len(pairs), secs)
+        print(f"{'':<40} {no_events} events of {len(pairs)} updates")
+
+
+def synthetic_capture(no_mods: int = 60, cycles: int = 10, changes: int = 0) -> list:
+    """Capture of mirror bursts and events, received in random chunks.
+
+    With changes > 0, mirrors of a module differ in that many bytes per cycle.
+    """
+    rnd = random.Random(1)
+    stream = b""
+    mirrors: dict[int, bytearray] = {}
+    for _ in range(cycles):
+        for mod in range(1, no_mods + 1):
+            if changes and mod in mirrors:
+                for _ in range(changes):
+                    mirrors[mod][rnd.randrange(1, MirrIdx.END)] = rnd.randrange(256)
+            else:
+                mirrors[mod] = bytearray([mod]) + bytes(
+                    rnd.randrange(4) for _ in range(225)
+                )
+            status = bytes(mirrors[mod])
+            stream += b"\xff" + finalize_cmd(bytearray(b"\x23\x01\x00\x87" + status + b"\x00"))
+            if rnd.random() < 0.3:
+                event = bytes([0x86, mod, 10, rnd.randrange(1, 9)])
+                stream += b"\xff" + finalize_cmd(bytearray(b"\x23\x01\x00" + event + b"\x00"))
+    fid = io.BytesIO()
+    cap = CaptureWriter(fid)
+    idx = 0
+    while idx < len(stream):
+        chunk_len = rnd.randrange(1, 512)
+        cap.record(CAP_RX, stream[idx : idx + chunk_len])
+        idx += chunk_len
+    fid.seek(0)
+    return list(read_capture(fid))
+
+
+def bench_capture(number: int = 20) -> None:
+    """Framing of received chunks of capture file in SMHUB_BENCH_CAPTURE, or synthetic capture."""
+    path = os.getenv("SMHUB_BENCH_CAPTURE")
+    records = load_capture(path) if path else synthetic_capture()
+    chunks = [data for _, direction, data in records if direction == CAP_RX]
+    no_bytes = sum(len(chunk) for chunk in chunks)
+
+    def frame_chunks() -> int:
+        framer = RtFramer()
+        for chunk in chunks:
+            framer.room()
+            for frm in framer.feed(chunk):
+                bytes(frm)
+        return framer.frames
+
+    no_frames = frame_chunks()
+    secs = timeit.timeit(frame_chunks, number=number)
+    report(f"capture, per frame ({no_frames} frames)", number * no_frames, secs)
+    print(f"{'capture throughput':<40} {number * no_bytes / secs / 1e6:8.2f} MB/s")
+
+
+BENCHMARKS = {
+    "rt_cmds": bench_rt_cmds,
+    "framer": bench_framer,
+    "capture": bench_capture,
+    "checksum": bench_checksum,
+    "mirror_diff": bench_mirror_diff,
+}
+
+if __name__ == "__main__":
+    for bench in sys.argv[1:] or BENCHMARKS.keys():
+        print(f"--- {bench}")
+        BENCHMARKS[bench]()
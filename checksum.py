@@ -0,0 +1,118 @@
+import sys
+from array import array
+
+try:
+    # Optional C implementation of crc16, pip install crcmod
+    from crcmod.predefined import mkPredefinedCrcFun
+except ImportError:
+    mkPredefinedCrcFun = None
+
+CRC16_INIT = 0xFFFF
+CRC16_POLY = 0xA001  # reflected polynomial 0x8005, as Modbus
+CRC16_WORDS_MIN = 64  # shorter data is processed byte by byte
+
+
+def xor_checksum(buf: bytes | bytearray | memoryview) -> int:
+    """Simple xor checksum of router messages."""
+    if len(buf) < 16:
+        chksum = 0
+        for byt in buf:
+            chksum ^= byt
+        return chksum
+    # Fold halves of big integer, log2(len) steps instead of byte loop
+    val = int.from_bytes(buf, "little")
+    width = len(buf)
+    while width > 1:
+        half = (width + 1) >> 1
+        val = (val >> (half << 3)) ^ (val & ((1 << (half << 3)) - 1))
+        width = half
+    return val
+
+
+def init_crc16_tbl() -> list[int]:
+    """Prepare the crc16 table."""
+    res: list[int] = []
+    for byte in range(256):
+        crc = 0x0000
+        for _ in range(8):
+            if (byte ^ crc) & 0x0001:
+                crc = (crc >> 1) ^ CRC16_POLY
+            else:
+                crc >>= 1
+            byte >>= 1
+        res.append(crc)
+    return res
+
+
+def init_crc16_wtbl(tbl: list[int]) -> list[int]:
+    """Prepare table of two steps, indexed by crc xor next 16 bit little endian word."""
+    return [
+        (tbl[wrd & 0xFF] >> 8) ^ tbl[((wrd >> 8) ^ tbl[wrd & 0xFF]) & 0xFF]
+        for wrd in range(0x10000)
+    ]
+
+
+_crc16_tbl: list[int] = init_crc16_tbl()
+_crc16_wtbl: list[int] = []  # built on first use, 64k entries
+
+
+def crc16_update_py(crc: int, data: bytes | bytearray | memoryview) -> int:
+    """Continue crc16 register value with data, two bytes per step for longer data."""
+    global _crc16_wtbl
+    tbl = _crc16_tbl
+    d_len = len(data)
+    w_len = d_len & ~1 if d_len >= CRC16_WORDS_MIN else 0
+    if w_len:
+        if not _crc16_wtbl:
+            _crc16_wtbl = init_crc16_wtbl(tbl)
+        wtbl = _crc16_wtbl
+        if sys.byteorder == "little":
+            words = memoryview(data)[:w_len].cast("B").cast("H")
+        else:
+            words = array("H", bytes(data[:w_len]))
+            words.byteswap()
+        for wrd in words:
+            crc = wtbl[crc ^ wrd]
+    for byt in data[w_len:]:
+        crc = (crc >> 8) ^ tbl[(crc ^ byt) & 0xFF]
+    return crc
+
+
+if mkPredefinedCrcFun is not None:
+    _crc16_ext = mkPredefinedCrcFun("modbus")
+
+    def crc16_update(crc: int, data: bytes | bytearray | memoryview) -> int:
+        """Continue crc16 register value with data, C implementation."""
+        return _crc16_ext(bytes(data), crc)
+
+else:
+    crc16_update = crc16_update_py
+
+
+def crc16_final(crc: int) -> int:
+    """Return crc16 of register value, high and low byte swapped."""
+    return ((crc << 8) & 0xFF00) | ((crc >> 8) & 0x00FF)
+
+
+def calc_crc(data: bytes | bytearray | memoryview) -> int:
+    """Calculate a crc16 for the given byte string."""
+    return crc16_final(crc16_update(CRC16_INIT, data))
+
+
+class Crc16:
+    """Incremental crc16 of data in chunks, same result as calc_crc of joined chunks."""
+
+    def __init__(self, data: bytes | bytearray | memoryview = b"") -> None:
+        self.crc = CRC16_INIT
+        self.length = 0
+        if data:
+            self.update(data)
+
+    def update(self, data: bytes | bytearray | memoryview) -> None:
+        """Add next chunk of data."""
+        self.crc = crc16_update(self.crc, data)
+        self.length += len(data)
+
+    def value(self) -> int:
+        """Return crc16 of all data so far."""
+        return crc16_final(self.crc)
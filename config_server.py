@@ -27,6 +27,7 @@ from config_commons import (
     show_not_authorized,
 )
 from licenses import get_package_licenses, show_license_text
+from checksum import Crc16
 from messages import calc_crc
 from module import HbtnModule
 from module_hdlr import ModHdlr
@@ -274,7 +275,16 @@ class ConfigServer:
         rtr = api_srv.routers[0]
         data = await request.post()
         # fw_filename = data["file"].filename
-        rtr.fw_upload = data["file"].file.read()  # type: ignore
+        fw_file = data["file"].file  # type: ignore
+        fw_crc = Crc16()
+        fw_chunks = []
+        while chunk := fw_file.read(0x10000):
+            fw_crc.update(chunk)
+            fw_chunks.append(chunk)
+        rtr.fw_upload = b"".join(fw_chunks)
+        app.logger.debug(
+            f"Firmware upload: {fw_crc.length} bytes, crc16 0x{fw_crc.value():04X}"
+        )
         upd_type = str(data["SysUpload"])
         if upd_type == "rtr":
             fw_vers = rtr.fw_upload[-27:-5].decode()
@@ -385,6 +395,37 @@ class ConfigServer:
             text=json.dumps(stat), content_type="text/plain", charset="utf-8"
         )
 
+    @routes.get("/serial_metrics")
+    async def get_serial_metrics(request: web.Request) -> web.Response:  # type: ignore
+        api_srv = request.app["api_srv"]
+        if api_srv.is_offline or (api_srv.rt_arbiter is None):
+            return web.json_response({})
+        return web.json_response(api_srv.rt_arbiter.get_metrics())
+
+    @routes.get("/event_history")
+    async def get_event_history(request: web.Request) -> web.Response:  # type: ignore
+        api_srv = request.app["api_srv"]
+        if api_srv.is_offline:
+            return web.json_response([])
+        try:
+            mod_addr = int(request.query.get("mod", "0"))
+            since = float(request.query.get("since", "0"))
+        except ValueError:
+            return web.HTTPBadRequest(text="mod and since must be numbers")
+        return web.json_response(api_srv.event_history.get_history(mod_addr, since))
+
+    @routes.get("/status_delta")
+    async def get_status_delta(request: web.Request) -> web.Response:  # type: ignore
+        api_srv = request.app["api_srv"]
+        try:
+            since = int(request.query.get("since", "0"))
+            epoch = int(request.query.get("epoch", "0"))
+        except ValueError:
+            return web.HTTPBadRequest(text="since and epoch must be integers")
+        return web.json_response(
+            api_srv.status_journal.delta_dict(since, api_srv.routers, epoch)
+        )
+
     @routes.get(path="/show_doc")
     async def show_doc(request: web.Request) -> web.Response:  # type: ignore
         with open(WEB_FILES_DIR + DOC_FILE, "rb") as doc_file:
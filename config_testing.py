@@ -8,7 +8,7 @@ from config_commons import (
     fill_page_template,
 )
 from config_settings import activate_side_menu
-from const import CONF_PORT, MirrIdx, HA_EVENTS
+from const import CONF_PORT, EVNT_SSE_KEEPALIVE, MirrIdx, HA_EVENTS
 import json
 
 routes = web.RouteTableDef()
@@ -42,26 +42,57 @@ class ConfigTestingServer:
         mod_addr = int(request.match_info["mod_addr"])
         main_app["mod_addr"] = mod_addr
         await api_srv.set_testing_mode(True)
+        main_app["evnt_seq"] = api_srv.evnt_srv.test_ring.seq  # no former events
         return await show_module_testpage(main_app, mod_addr, True)
 
     @routes.get("/events")
     async def get_events(request: web.Request) -> web.Response:  # type: ignore
         main_app = request.app["parent"]
         mod_addr = main_app["mod_addr"]
-        events_dict: dict[str, list[list[int]]] = {}
-        # get events
-        events_buf = main_app["api_srv"].evnt_srv.get_events_buffer()
-        for evnt in events_buf:
-            if evnt[0] == mod_addr:
-                dict_str = HA_EVENTS.EVENT_DICT[evnt[1]].replace(" ", "_")
-                if dict_str in events_dict.keys():
-                    events_dict[dict_str].append([evnt[2], evnt[3]])
-                else:
-                    events_dict[dict_str] = [[evnt[2], evnt[3]]]
+        # get events of module since last call
+        test_ring = main_app["api_srv"].evnt_srv.test_ring
+        new_events = test_ring.get_since(mod_addr, main_app.get("evnt_seq", 0))
+        if new_events:
+            main_app["evnt_seq"] = new_events[-1][0]
         return web.Response(
-            text=json.dumps(events_dict), content_type="text/plain", charset="utf-8"
+            text=json.dumps(events_by_type(new_events)),
+            content_type="text/plain",
+            charset="utf-8",
         )
 
+    @routes.get("/event_stream")
+    async def stream_events(request: web.Request) -> web.StreamResponse:  # type: ignore
+        if client_not_authorized(request):
+            return show_not_authorized(request.app)
+        main_app = request.app["parent"]
+        api_srv = main_app["api_srv"]
+        mod_addr = main_app["mod_addr"]
+        test_ring = api_srv.evnt_srv.test_ring
+        seq = test_ring.seq
+        resp = web.StreamResponse(
+            headers={"Content-Type": "text/event-stream", "Cache-Control": "no-cache"}
+        )
+        await resp.prepare(request)
+        try:
+            # Server-sent events of module while its test page is active
+            while (
+                api_srv._test_mode
+                and (main_app["mod_addr"] == mod_addr)
+                and (api_srv.evnt_srv.test_ring is test_ring)
+            ):
+                new_events = await test_ring.wait_since(
+                    mod_addr, seq, EVNT_SSE_KEEPALIVE
+                )
+                if new_events:
+                    seq = new_events[-1][0]
+                    data = json.dumps(events_by_type(new_events))
+                    await resp.write(f"data: {data}\n\n".encode())
+                else:
+                    await resp.write(b": keepalive\n\n")
+        except (ConnectionResetError, ConnectionError):
+            pass
+        return resp
+
     @routes.get("/stop")
     async def stop_test(request: web.Request) -> web.Response:  # type: ignore
         if client_not_authorized(request):
@@ -86,6 +117,18 @@ class ConfigTestingServer:
         return await show_module_testpage(main_app, mod_addr, False)
 
 
+def events_by_type(new_events: list[tuple[int, list[int]]]) -> dict:
+    """Group events of module by type name for testing page."""
+    events_dict: dict[str, list[list[int]]] = {}
+    for _, evnt in new_events:
+        dict_str = HA_EVENTS.EVENT_DICT[evnt[1]].replace(" ", "_")
+        if dict_str in events_dict.keys():
+            events_dict[dict_str].append([evnt[2], evnt[3]])
+        else:
+            events_dict[dict_str] = [[evnt[2], evnt[3]]]
+    return events_dict
+
+
 def show_modules_overview(app) -> web.Response:
     """Prepare modules page."""
     api_srv = app["api_srv"]
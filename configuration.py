@@ -1172,6 +1172,35 @@ class ModuleSettingsLight(ModuleSettings):
         self.get_descriptions()
 
 
+class ModuleSettingsCopy(ModuleSettings):
+    """Copy-on-write view of cached module settings for editing.
+
+    Attributes are read from the cached settings, mutable ones are copied into the
+    view on first access, so edits never reach the cache.
+    """
+
+    SHARED = ("module", "logger", "properties", "prop_keys")
+    IMMUTABLE = (bytes, str, int, float, bool, tuple, type(None))
+
+    def __init__(self, base: ModuleSettings):
+        """Keep cached settings, share module and io properties with it."""
+        memo = {id(base): self}
+        for attr in self.SHARED:
+            memo[id(getattr(base, attr))] = getattr(base, attr)
+        self.__dict__["_base"] = base
+        self.__dict__["_memo"] = memo
+
+    def __getattr__(self, name: str):
+        """Take attribute from cached settings, copy it if mutable."""
+        if name.startswith("__") or "_base" not in self.__dict__:
+            raise AttributeError(name)
+        val = getattr(self.__dict__["_base"], name)
+        if not isinstance(val, self.IMMUTABLE) and name not in self.SHARED:
+            val = dpcopy(val, self.__dict__["_memo"])
+        self.__dict__[name] = val
+        return val
+
+
 def replace_bytes(in_bytes: bytes, repl_bytes: bytes, idx: int) -> bytes:
     """Replaces bytes array from idx:idx+len(repl_bytes)."""
     return in_bytes[:idx] + repl_bytes + in_bytes[idx + len(repl_bytes) :]
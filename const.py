@@ -6,6 +6,7 @@ from typing import Final
 OWN_IP = "192.168.178.110"
 ANY_IP = "0.0.0.0"
 SMHUB_PORT = 7777
+SMHUB_SENSOR_INTERVAL = 10.0  # s, cpu, memory, and disk values sampled
 EVENT_PORT = 7778
 CONF_PORT = 7780
 QUERY_PORT = 30718
@@ -13,12 +14,49 @@ OWN_INGRESS_IP = "172.30.32.1"
 ALLOWED_INGRESS_IPS = ["172.30.32.2"]
 INGRESS_PORT = 8099
 RT_DEF_ADDR = 1
+RT_DEF_DEVICE = "/dev/serial0"
+RT_DEVICE_ENV = "SMHUB_SERIAL_DEVICE"  # overrides RT_DEF_DEVICE, e.g. simulator pty
+RT_CAPTURE_ENV = "SMHUB_SERIAL_CAPTURE"  # file to record serial traffic
+RT_REPLAY_ENV = "SMHUB_SERIAL_REPLAY"  # capture file replayed instead of router
+RT_REPLAY_SPEED_ENV = "SMHUB_REPLAY_SPEED"  # 1: original timing, 0: max speed
 RT_BAUDRATE = [19200, 38400]
 RT_TIMEOUT = 5
+RT_PROBE_TIMEOUT = 0.2  # max. wait for response to test command
+RT_BAUD_FILE = "baudrate.idx"  # index of last working RT_BAUDRATE
+RT_FRAME_QUEUE_LEN = 64
+RT_FRAMER_SIZE = 4096
+RT_READ_RETRY_DELAYS = (0.5, 2.0, 5.0)  # serial read errors, then hub restart
+RT_CMD_TIMEOUT = 1.5  # initial value of adaptive timeouts
+RT_RTO_MIN = 0.05
+RT_RTO_MAX = 5.0
+RT_CMD_WINDOW = 4
+RT_LAT_BUCKETS = (5, 10, 20, 50, 100, 200, 500, 1000, 2000)  # upper bounds in ms
+RT_RATE_WINDOW = 5.0
+RT_INIT_PARALLEL = 4  # modules initialized at once, commands share RT_CMD_WINDOW
+RT_INIT_RETRY_DELAYS = (10.0, 30.0, 120.0)  # background retries of failed modules
+RT_STAT_MATRIX_ROWS = 256  # module addresses are single bytes
+STAT_JOURNAL_LEN = 2048  # status changes kept for delta reads
+STAT_DELTA_GAP = 3  # unchanged bytes within one delta entry
+RT_CMD_RETRIES = 1
 MIRROR_CYC_TIME = 1
+EVNT_TIME_BUDGET = 0.01
+EVNT_RATE_WINDOW = 5.0
+EVNT_WS_WINDOW = 16  # events sent to home assistant without ack
+EVNT_ACK_TIMEOUT = 5.0
+EVNT_WS_RETRIES = 1
+EVNT_OUTBOX_LEN = 256
+EVNT_BATCH_MAX = 64  # events per call_service in batch mode
+EVNT_SUB_QUEUE_LEN = 256  # per event bus subscriber
+EVNT_HISTORY_LEN = 1000
+EVNT_MOD_RING_LEN = 64  # per module, for testing page
+EVNT_SSE_KEEPALIVE = 15.0
+EVNT_OUTBOX_POLICY = "drop_oldest"  # if full, or "coalesce": replace event of same entity
 RD_DELAY = 0.1
 DATA_FILES_DIR = "./"
 DATA_FILES_ADDON_DIR = "/config/"
+SMC_CACHE_FILE = "smc_cache.bin"  # per router, module lists by crc
+SNAPSHOT_FILE = "smhub_snapshot.bin"  # warm start, router and module status
+SNAPSHOT_INTERVAL = 300.0  # s, saved if status changed
 FWD_TABLE_FILE = "ip_table.fwd"
 WEB_FILES_DIR = "web/"
 FW_FILES_DIR = "firmware/"
@@ -93,6 +131,7 @@ class API_DATA:
 
     MOD_STAT_PCREAD = 256 * 5 + 1
     MOD_CSTAT_PCREAD = 256 * 5 + 2  # compact status
+    MOD_STAT_DELTA = 256 * 5 + 3  # changes since sequence number
     MOD_FW_FILE_VS = 256 * 5 + 10
 
     SMHUB_BOOTQUEST = 256 * 6 + 1
@@ -255,6 +294,7 @@ class API_ADMIN:
     SMHUB_REBOOT = 256 * 0 + 3
     SMHUB_NET_INFO = 256 * 0 + 4
     SMHUB_LOG_LEVEL = 256 * 0 + 5
+    SMHUB_SERIAL_STAT = 256 * 0 + 6
 
     RT_START_FWD = 256 * 1 + 1
     RT_RD_MODERRS = 256 * 1 + 2
@@ -474,6 +514,7 @@ class RT_RESP:
     MOD_NAMES = 104
     SER_NO = 105
     BOOT_PROBLEMS = 106
+    SYS_EVENT = 134
     MIRR_STAT = 135
     SYS_MODE = 136
     SYS_MODE_CHG = 137
@@ -900,6 +941,16 @@ class HA_EVENTS:
     }
 
 
+# Value events to coalesce, discrete events not listed
+EVNT_COALESCE_TYPES: list[int] = [
+    HA_EVENTS.DIM_VAL,
+    HA_EVENTS.COV_VAL,
+    HA_EVENTS.BLD_VAL,
+    HA_EVENTS.ANLG_VAL,
+    HA_EVENTS.CNT_VAL,
+]
+EVNT_COALESCE_ENV = "SMHUB_EVENT_COALESCE"  # window in s, e.g. 0.25; unset: off
+
 DAY_NIGHT_MODES: dict[int, str] = {
     -1: "inaktiv",
     0: "nur Zeit",
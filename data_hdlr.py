@@ -3,7 +3,7 @@ import asyncio
 
 from const import API_DATA as spec
 from hdlr_class import HdlrBase
-from const import MirrIdx, MStatIdx, RD_DELAY
+from const import RD_DELAY
 
 
 class DataHdlr(HdlrBase):
@@ -18,6 +18,7 @@ class DataHdlr(HdlrBase):
                 self.response = b"\x01"  # bool True
 
             case spec.SMHUB_GETINFO:
+                await self.api_srv.sm_hub.wait_info()
                 self.response = self.api_srv.sm_hub.get_info()
 
             case spec.SMHUB_UPDATE:
@@ -45,6 +46,7 @@ class DataHdlr(HdlrBase):
                 await self.api_srv.set_server_mode(rt)
                 for module in self.api_srv.routers[rt - 1].modules:
                     await module.initialize()
+                self.api_srv.routers[rt - 1].get_smc_cache().save()
                 self.response = "OK"
 
             case spec.MODOVW_FW:
@@ -120,18 +122,19 @@ class DataHdlr(HdlrBase):
                     mod_list = [mod]
                 if self.args_err:
                     return
-                stat_buf = b""
-                if self._spec == spec.MOD_STAT_PCREAD:
-                    # use full module status
-                    blk_len = chr(MirrIdx.END).encode("iso8859-1")
-                else:
-                    # use compacted module status
-                    blk_len = chr(MStatIdx.END).encode("iso8859-1")
-                for md in mod_list:
-                    stat_buf += blk_len  # type: ignore
-                    module = self.api_srv.routers[rt - 1].get_module(md)
-                    stat_buf += module.get_status(self._spec == spec.MOD_STAT_PCREAD)
-                self.response = stat_buf
+                # full or compacted module status, from router status matrix
+                self.response = self.api_srv.routers[rt - 1].get_modules_status(
+                    mod_list, self._spec == spec.MOD_STAT_PCREAD
+                )
+
+            case spec.MOD_STAT_DELTA:
+                # changes since sequence number, full status if unknown
+                # or from former run (epoch differs)
+                seq = int.from_bytes(self._args[:4], "little")
+                epoch = int.from_bytes(self._args[4:8], "little")
+                self.response = self.api_srv.status_journal.encode_delta(
+                    seq, self.api_srv.routers, epoch
+                )
 
             case spec.SMR_PCREAD:
                 self.check_router_no(rt)
@@ -0,0 +1,234 @@
+import asyncio
+from asyncio.streams import StreamReader, StreamWriter
+from collections import deque
+from collections.abc import Callable
+import json
+import logging
+import time
+from const import (
+    EVENT_PORT,
+    EVNT_SUB_QUEUE_LEN,
+    EVNT_HISTORY_LEN,
+    EVNT_MOD_RING_LEN,
+    HA_EVENTS,
+)
+
+
+def event_dict(t_event: float, rtr: int, event: list[int]) -> dict:
+    """Return event with time stamp as dict for json output."""
+    return {
+        "time": round(t_event, 3),
+        "rtr": rtr,
+        "mod": event[0],
+        "type": event[1],
+        "type_name": HA_EVENTS.EVENT_DICT.get(event[1], ""),
+        "arg1": event[2],
+        "arg2": event[3],
+    }
+
+
+class EventSubscriber:
+    """Consumer of event bus, bounded queue or handler called on publishing.
+
+    If the queue is full, oldest event is dropped, so a slow consumer never
+    holds up the others. Handlers must not block, e.g. queue event themselves.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        maxlen: int = EVNT_SUB_QUEUE_LEN,
+        handler: Callable[[int, list[int]], None] | None = None,
+    ) -> None:
+        self.name = name
+        self.maxlen = maxlen
+        self.handler = handler
+        self._queue: deque[tuple[float, int, list[int]]] = deque()
+        self._ready = asyncio.Event()
+        self.received: int = 0
+        self.dropped: int = 0
+
+    def put(self, t_event: float, rtr: int, event: list[int]) -> None:
+        """Hand event over to consumer."""
+        self.received += 1
+        if self.handler is not None:
+            self.handler(rtr, event)
+            return
+        if len(self._queue) >= self.maxlen:
+            self._queue.popleft()
+            self.dropped += 1
+        self._queue.append((t_event, rtr, event))
+        self._ready.set()
+
+    async def get(self) -> tuple[float, int, list[int]]:
+        """Wait for next event, return time stamp, router, and event."""
+        while not self._queue:
+            self._ready.clear()
+            await self._ready.wait()
+        return self._queue.popleft()
+
+    def get_all(self) -> list[tuple[float, int, list[int]]]:
+        """Return all queued events without waiting."""
+        events = list(self._queue)
+        self._queue.clear()
+        return events
+
+    def get_stats(self) -> dict[str, int]:
+        """Return queue depth and counters."""
+        return {
+            "queued": len(self._queue),
+            "received": self.received,
+            "dropped": self.dropped,
+        }
+
+
+class EventBus:
+    """Distributes events published by event server to independent subscribers."""
+
+    def __init__(self) -> None:
+        self.logger = logging.getLogger(__name__)
+        self._subscribers: dict[str, EventSubscriber] = {}
+        self.published: int = 0
+
+    def subscribe(
+        self,
+        name: str,
+        maxlen: int = EVNT_SUB_QUEUE_LEN,
+        handler: Callable[[int, list[int]], None] | None = None,
+    ) -> EventSubscriber:
+        """Add consumer, replaces former one of same name."""
+        sub = EventSubscriber(name, maxlen, handler)
+        self._subscribers[name] = sub
+        self.logger.debug(f"Event bus subscriber '{name}' added")
+        return sub
+
+    def unsubscribe(self, sub: EventSubscriber) -> None:
+        """Remove consumer."""
+        if self._subscribers.get(sub.name) is sub:
+            del self._subscribers[sub.name]
+            self.logger.debug(f"Event bus subscriber '{sub.name}' removed")
+
+    def publish(self, rtr: int, event: list[int]) -> None:
+        """Hand event over to all subscribers."""
+        self.published += 1
+        t_event = time.time()
+        for sub in list(self._subscribers.values()):
+            try:
+                sub.put(t_event, rtr, event)
+            except Exception as err_msg:
+                self.logger.error(
+                    f"Event bus subscriber '{sub.name}' failed: {err_msg}"
+                )
+
+    def get_stats(self) -> dict[str, dict[str, int]]:
+        """Return counters per subscriber."""
+        return {name: sub.get_stats() for name, sub in self._subscribers.items()}
+
+
+class EventHistory:
+    """Recorder of latest events on event bus."""
+
+    def __init__(self, bus: EventBus, maxlen: int = EVNT_HISTORY_LEN) -> None:
+        self._events: deque[tuple[float, int, list[int]]] = deque(maxlen=maxlen)
+        bus.subscribe("history", handler=self.record)
+
+    def record(self, rtr: int, event: list[int]) -> None:
+        """Store event with time stamp."""
+        self._events.append((time.time(), rtr, event))
+
+    def get_history(self, mod: int = 0, since: float = 0.0) -> list[dict]:
+        """Return recorded events, optionally of one module and after time stamp."""
+        return [
+            event_dict(t_event, rtr, event)
+            for t_event, rtr, event in self._events
+            if (t_event > since) and (mod == 0 or event[0] == mod)
+        ]
+
+
+class ModuleEventRing:
+    """Latest events per module with sequence numbers, for live views of single modules."""
+
+    def __init__(self, maxlen: int = EVNT_MOD_RING_LEN) -> None:
+        self.maxlen = maxlen
+        self.seq: int = 0
+        self._rings: dict[int, deque[tuple[int, list[int]]]] = {}
+        self._wakeups: dict[int, asyncio.Event] = {}
+
+    def record(self, rtr: int, event: list[int]) -> None:
+        """Event bus handler, store event in ring of its module and wake up waiters."""
+        mod = event[0]
+        self.seq += 1
+        if mod not in self._rings:
+            self._rings[mod] = deque(maxlen=self.maxlen)
+        self._rings[mod].append((self.seq, event))
+        if (wakeup := self._wakeups.pop(mod, None)) is not None:
+            wakeup.set()
+
+    def get_since(self, mod: int, seq: int) -> list[tuple[int, list[int]]]:
+        """Return events of module newer than seq, oldest first."""
+        ring = self._rings.get(mod)
+        if not ring or ring[-1][0] <= seq:
+            return []
+        new_events = []
+        for entry in reversed(ring):
+            if entry[0] <= seq:
+                break
+            new_events.append(entry)
+        new_events.reverse()
+        return new_events
+
+    async def wait_since(
+        self, mod: int, seq: int, timeout: float
+    ) -> list[tuple[int, list[int]]]:
+        """Wait for events of module newer than seq, empty list after timeout."""
+        if new_events := self.get_since(mod, seq):
+            return new_events
+        if mod not in self._wakeups:
+            self._wakeups[mod] = asyncio.Event()
+        try:
+            await asyncio.wait_for(self._wakeups[mod].wait(), timeout)
+        except TimeoutError:
+            return []
+        return self.get_since(mod, seq)
+
+
+class EventStreamServer:
+    """TCP server streaming all events as JSON lines, e.g. for monitoring."""
+
+    def __init__(self, bus: EventBus, host_ip: str, port: int = EVENT_PORT) -> None:
+        self.bus = bus
+        self._ip = host_ip
+        self._port = port
+        self.logger = logging.getLogger(__name__)
+
+    async def run_stream_srv(self) -> None:
+        """Accept clients until cancelled."""
+        self.server = await asyncio.start_server(
+            self.handle_client, self._ip, self._port
+        )
+        self.logger.info(f"Event stream server running on port {self._port}")
+        async with self.server:
+            await self.server.serve_forever()
+
+    async def handle_client(self, reader: StreamReader, writer: StreamWriter) -> None:
+        """Send events to one client with own queue until it disconnects."""
+        peer = writer.get_extra_info("peername")
+        sub = self.bus.subscribe(f"tcp {peer[0]}:{peer[1]}")
+        self.logger.info(f"Event stream client {peer[0]} connected")
+        closed = asyncio.ensure_future(reader.read())  # returns at EOF
+        try:
+            while True:
+                nxt = asyncio.ensure_future(sub.get())
+                await asyncio.wait([nxt, closed], return_when=asyncio.FIRST_COMPLETED)
+                if closed.done():
+                    nxt.cancel()
+                    break
+                writer.write((json.dumps(event_dict(*nxt.result())) + "\n").encode())
+                await writer.drain()
+        except (ConnectionError, OSError) as err_msg:
+            self.logger.debug(f"Event stream client {peer[0]}: {err_msg}")
+        finally:
+            closed.cancel()
+            self.bus.unsubscribe(sub)
+            writer.close()
+            self.logger.info(f"Event stream client {peer[0]} disconnected")
@@ -1,11 +1,28 @@
 import asyncio
 from asyncio.tasks import Task
+from collections import deque
 import logging
 import json
 import os
+import time
 import websockets
 from websockets import ConnectionClosedOK, WebSocketClientProtocol
-from const import DATA_FILES_ADDON_DIR, DATA_FILES_DIR, HA_EVENTS
+from const import (
+    DATA_FILES_ADDON_DIR,
+    DATA_FILES_DIR,
+    HA_EVENTS,
+    EVNT_COALESCE_TYPES,
+    EVNT_COALESCE_ENV,
+    EVNT_TIME_BUDGET,
+    EVNT_RATE_WINDOW,
+    EVNT_WS_WINDOW,
+    EVNT_ACK_TIMEOUT,
+    EVNT_WS_RETRIES,
+    EVNT_OUTBOX_LEN,
+    EVNT_OUTBOX_POLICY,
+    EVNT_BATCH_MAX,
+)
+from event_bus import EventSubscriber, ModuleEventRing
 from forward_hdlr import ForwardHdlr
 
 
@@ -49,6 +66,18 @@ class WEBSOCK_MSG:
             "evnt_arg2": 0,
         },
     }
+    # Offered by integrations accepting event lists, service_data: hub_uid, events
+    batch_service = "update_entities"
+    services_msg = {"id": 1, "type": "get_services"}
+
+
+class WsNotify:
+    """Event sent to home assistant, kept until acknowledged by result with same id."""
+
+    def __init__(self, ws_cmd: dict, retries: int = EVNT_WS_RETRIES) -> None:
+        self.ws_cmd = ws_cmd
+        self.retries = retries
+        self.t_sent: float = 0.0
 
 
 class EventServer:
@@ -66,13 +95,44 @@ class EventServer:
         self.auth_token: str | None = os.getenv("SUPERVISOR_TOKEN")
         self.notify_id = 1
         self.evnt_running = False
-        self.msg_appended = False
         self.busy_starting = False
         self.websck_is_closed = True
         self.default_token: str
         self.token_ok = True
         self.failure_count = 0
-        self.events_buffer: list[list[int]] = []
+        self.bus = api_srv.event_bus
+        self.test_sub: EventSubscriber | None = None
+        self.test_ring = ModuleEventRing()
+        self.frm_count: int = 0
+        self.frm_rate: float = 0.0
+        self.queue_lag: float = 0.0
+        self.max_queue_lag: float = 0.0
+        self._rate_start: float = time.monotonic()
+        self._rate_count: int = 0
+        self.rx_task: Task | None = None
+        self._in_flight: dict[int, WsNotify] = {}
+        self._requests: dict[int, asyncio.Future] = {}
+        self._ws_slots = asyncio.Semaphore(EVNT_WS_WINDOW)
+        self.ack_lag: float = 0.0
+        self.max_ack_lag: float = 0.0
+        self.resent_count: int = 0
+        self.lost_count: int = 0
+        self.tx_task: Task | None = None
+        self.outbox_len: int = EVNT_OUTBOX_LEN
+        self.outbox_policy: str = EVNT_OUTBOX_POLICY
+        self._outbox: deque[list] = deque()
+        self._outbox_keys: dict[tuple[int, int, int, int], list] = {}
+        self.max_outbox: int = 0
+        self.dropped_count: int = 0
+        self.coalesced_count: int = 0
+        self.coalesce_windows: dict[int, float] = {}
+        if window := os.getenv(EVNT_COALESCE_ENV):
+            self.set_coalesce_window(float(window))
+        self._coalescing: dict[tuple[int, int, int, int], list] = {}
+        self.merged_count: int = 0
+        self.batch_mode: bool | None = None  # unknown until websocket connected
+        self.batch_count: int = 0
+        self.bus.subscribe("home_assistant", handler=self.queue_event)
 
     def get_ident(self) -> str | None:
         """Return token"""
@@ -108,17 +168,7 @@ class EventServer:
             )
             return None
 
-    def extract_rest_msg(self, rt_event: bytes, msg_len: int) -> bytes:
-        """Check for more appended messages."""
-        if len(rt_event) > msg_len:
-            tail = rt_event[msg_len - 1 :]
-            self.logger.warning(f"Second event message: {tail}")
-            self.logger.info(f"     Complete message: {rt_event}")
-            self.msg_appended = True
-            return tail
-        return b""
-
-    async def watch_rt_events(self, rt_rd):
+    async def watch_rt_events(self, rt_arbiter):
         """Task for handling router responses and events in api mode"""
 
         self.logger.debug("Event server started")
@@ -126,98 +176,37 @@ class EventServer:
         self.evnt_running = True
         rtr_id = 100  # inital value, will be taken from event messages
         await self.open_websocket()
-        tail: bytes = b""
 
-        recvd_byte = b"\00"  # Initialization for resync
+        t_slice = time.monotonic()
         while self.evnt_running:
             self.busy_starting = False
-            # Fast loop, immediate checks here without message/handler
-            await asyncio.sleep(0.02)  # short break for other processes
             try:
-                # Get prefix
-                if self.msg_appended:
-                    try:
-                        # Don't read new message, generate new prefix
-                        prefix = ("\xff#" + chr(rtr_id) + chr(len(tail) + 4)).encode(
-                            "iso8859-1"
-                        )
-                    except:  # noqa: E722
-                        # If something goes wrong, rtr_id and tail are without value
-                        prefix = ("\xff#" + chr(1) + chr(4)).encode("iso8859-1")
-                elif recvd_byte == b"\xff":
-                    # Last loop of resync found first 2 bytes, reduce prefix to 2
-                    prefix = b"\xff\x23" + await rt_rd.readexactly(2)
-                    recvd_byte = b"\00"  # Turn off special condition
-                else:
-                    # Normal behaviour, read prefix of 4 bytes
-                    prefix = await rt_rd.readexactly(4)
-
-                if prefix[0:2] != b"\xff\x23":
-                    # If one is wrong, prefix is not a correct header
-                    # look for header in next bytes
-                    self.logger.warning(
-                        f"Operate mode router message with wrong header bytes: {prefix}, resync"
-                    )
-                    if prefix[1:3] == b"\xff\x23":
-                        prefix = prefix[1:4] + await rt_rd.readexactly(1)
-                    elif prefix[2:4] == b"\xff\x23":
-                        prefix = prefix[2:4] + await rt_rd.readexactly(2)
-                    elif prefix[3] == 0xFF:
-                        prefix = prefix[3:4] + await rt_rd.readexactly(1)
-                        if prefix[-1] == 0x23:
-                            prefix += await rt_rd.readexactly(2)
-
-                if prefix[3] == 0 or len(prefix) < 4:
-                    # Something went wrong, start reading until sequence 0xFF 0x23 found
-                    self.logger.warning(
-                        "Operate mode router message with length=0, resync"
-                    )
-                    resynced = False
-                    while not resynced:
-                        recvd_byte = b"\00"
-                        while recvd_byte != b"\xff":
-                            # Look for new start byte
-                            recvd_byte = await rt_rd.readexactly(1)
-                        resynced = await rt_rd.readexactly(1) == b"\x23"
-                    prefix = b"\xff\x23" + await rt_rd.readexactly(2)
-
-                if prefix[2:4] == b"\xff\x23":
-                    self.logger.warning(
-                        f"Operate mode router message with header {prefix}"
+                # Driven by frames only, no waiting if queued
+                rt_event, lag = await rt_arbiter.get_event()
+                if rt_event is None:
+                    # Wake-up call, check running flag
+                    continue
+                self.update_gauges(lag)
+                if time.monotonic() - t_slice > EVNT_TIME_BUDGET:
+                    # Long burst, give other tasks a chance
+                    await asyncio.sleep(0)
+                    t_slice = time.monotonic()
+                rtr_id = rt_event[2]
+                if len(rt_event) <= 5:
+                    self.logger.info(
+                        f"API mode router message too short: {rt_event}"
                     )
-                    prefix = prefix[2:4] + await rt_rd.readexactly(2)
-
-                if prefix[3] < 4:
-                    self.logger.warning(
-                        f"Operate mode router message too short, length: {prefix[3]-3} bytes"
-                    )
-                else:
-                    # Read rest of message
-                    if not (self.msg_appended):
-                        rtr_id = prefix[2]
-                        tail = await rt_rd.readexactly(prefix[3] - 3)
-                    else:
-                        # tail already taken from previous message
-                        self.msg_appended = False
-
-                    rt_event = prefix + tail
-                    if len(tail) == 1:
-                        self.logger.info(
-                            f"API mode router message too short, tail: {tail}"
-                        )
-                        msg_len = 0
-                    else:
-                        msg_len = await self.parse_event_message(
-                            rt_event, rt_rd, rtr_id
-                        )
-                    if msg_len:
-                        # Looks if message is longer than expexted msg_len
-                        tail = self.extract_rest_msg(rt_event, msg_len)
+                    continue
+                # Exactly one frame per event, split by framer of arbiter
+                await self.parse_event_message(rt_event, rtr_id)
 
             except RuntimeError as err_msg:
                 self.logger.error(f"Event server runtime error: {err_msg.args[0]}")
                 await self.close_websocket()
-                if not await self.ping_pong_reconnect():
+                if await self.ping_pong_reconnect():
+                    await self.resend_notifies()
+                else:
+                    self.drop_notifies()
                     self.logger.warning(
                         "Webwocket reconnect failed, websocket closed, event server terminated"
                     )
@@ -230,7 +219,42 @@ class EventServer:
                     f"Event server exception: {error_msg}, event server still running"
                 )
 
-    async def parse_event_message(self, rt_event, rt_rd, rtr_id) -> int:
+    def update_gauges(self, lag: float) -> None:
+        """Count frame for frame rate, track queueing time of frame."""
+        self.frm_count += 1
+        self._rate_count += 1
+        self.queue_lag = lag
+        self.max_queue_lag = max(self.max_queue_lag, lag)
+        t_now = time.monotonic()
+        if t_now - self._rate_start >= EVNT_RATE_WINDOW:
+            self.frm_rate = self._rate_count / (t_now - self._rate_start)
+            self._rate_start = t_now
+            self._rate_count = 0
+
+    def get_gauges(self) -> dict:
+        """Return frame rate and queue lag of router events, delivery counters."""
+        return {
+            "frames": self.frm_count,
+            "frames_per_sec": round(self.frm_rate, 1),
+            "queue_lag_ms": round(1000 * self.queue_lag, 2),
+            "max_queue_lag_ms": round(1000 * self.max_queue_lag, 2),
+            "ws_in_flight": len(self._in_flight),
+            "ws_ack_ms": round(1000 * self.ack_lag, 1),
+            "max_ws_ack_ms": round(1000 * self.max_ack_lag, 1),
+            "ws_resent": self.resent_count,
+            "ws_lost": self.lost_count,
+            "outbox_depth": len(self._outbox),
+            "max_outbox_depth": self.max_outbox,
+            "outbox_dropped": self.dropped_count,
+            "outbox_coalesced": self.coalesced_count,
+            "values_coalescing": len(self._coalescing),
+            "values_merged": self.merged_count,
+            "batch_mode": bool(self.batch_mode),
+            "batches": self.batch_count,
+            "subscribers": self.bus.get_stats(),
+        }
+
+    async def parse_event_message(self, rt_event, rtr_id) -> int:
         """Parse event code."""
 
         m_len = 0  # Correct length of parsed message, will be returned
@@ -249,10 +273,6 @@ class EventServer:
             self.logger.debug(
                 "API mode router message: Mirror/events stopped, stopping router event watcher"
             )
-            # if len(rt_rd._buffer) > 0:
-            #     prefix = await rt_rd.readexactly(4)
-            #     tail = await rt_rd.readexactly(prefix[3] - 3)
-            #     rt_event = prefix + tail
             self.evnt_running = False
 
         elif rt_event[4] == 100:  # router chan status
@@ -289,7 +309,6 @@ class EventServer:
                 self.fwd_hdlr = ForwardHdlr(self.api_srv)
                 self.logger.info("Forward handler instantiated")
             await self.fwd_hdlr.send_forward_response(rt_event[4:-1])
-            self.msg_appended = False
 
         elif rt_event[4] == 134:  # 0x86: System event
             m_len = await self.notify_system_events(rt_event, rtr_id)
@@ -341,9 +360,9 @@ class EventServer:
                             flg_no += 8
                         val = int((val & i_msk) > 0)
                         ev_list = [m_event[0], m_event[1], flg_no, val]
-                        await self.notify_event(rtr_id, ev_list)
+                        self.bus.publish(rtr_id, ev_list)
             else:
-                await self.notify_event(rtr_id, m_event)
+                self.bus.publish(rtr_id, m_event)
 
     async def notify_system_events(self, rt_event, rtr_id) -> int:
         """Parse received event message and call notify."""
@@ -423,44 +442,157 @@ class EventServer:
                 case _:
                     self.logger.warning(f"Unknown event id: {event_id}")
                     return m_len
-            await self.notify_event(rtr_id, ev_list)
+            self.bus.publish(rtr_id, ev_list)
         return m_len
 
-    async def notify_event(self, rtr: int, event: list[int]):
-        """Trigger event on remote host (e.g. home assistant)"""
-
-        if self.api_srv._test_mode:
-            self.events_buffer.append(event)
-
-        if self.websck_is_closed:
-            success = await self.open_websocket()
+    def set_coalesce_window(self, window: float) -> None:
+        """Set coalescing window in s for value events, 0 disables."""
+        if window > 0:
+            self.coalesce_windows = {evnt: window for evnt in EVNT_COALESCE_TYPES}
         else:
-            success = True
-        if not success:
-            if self.api_srv._test_mode:
-                return
-            self.logger.warning("Failed to send event via websocket, open failed")
-            return
-        if event is None:
+            self.coalesce_windows = {}
+        self.logger.info(f"Event coalescing window set to {window} s")
+
+    def queue_event(self, rtr: int, event: list[int]) -> None:
+        """Event bus handler for home assistant: queue event, send first value of entity at once, latest within window at its end."""
+        key = (rtr, event[0], event[1], event[2])  # entity of event
+        if key in self._coalescing:
+            # Value changed again within window, keep latest only
+            if self._coalescing[key][1] is not None:
+                self.merged_count += 1
+            self._coalescing[key][1] = event
             return
+        self.put_outbox(rtr, event)
+        if window := self.coalesce_windows.get(event[1], 0):
+            self._coalescing[key] = [rtr, None]
+            self.api_srv.loop.call_later(window, self.release_coalesced, key)
+
+    def release_coalesced(self, key: tuple[int, int, int, int]) -> None:
+        """Move latest value of entity to outbox at end of its window, if changed."""
+        if (entry := self._coalescing.pop(key, None)) is not None and entry[1]:
+            self.put_outbox(entry[0], entry[1])
+
+    def put_outbox(self, rtr: int, event: list[int]) -> None:
+        """Put event into outbox for sender task, router frames are not held up by websocket."""
+        key = (rtr, event[0], event[1], event[2])  # entity of event
+        if len(self._outbox) >= self.outbox_len:
+            if (self.outbox_policy == "coalesce") and (key in self._outbox_keys):
+                # Newest value of entity replaces queued one
+                self._outbox_keys[key][1] = event
+                self.coalesced_count += 1
+                return
+            dropped = self._outbox.popleft()
+            self.forget_outbox_key(dropped)
+            self.dropped_count += 1
+            self.logger.warning(f"Event outbox full, dropped event: {dropped[1]}")
+        entry = [rtr, event]
+        self._outbox.append(entry)
+        self._outbox_keys[key] = entry
+        self.max_outbox = max(self.max_outbox, len(self._outbox))
+        if (self.tx_task is None) or self.tx_task.done():
+            self.tx_task = self.api_srv.loop.create_task(
+                self.send_events(), name="evnt_sender"
+            )
+
+    def forget_outbox_key(self, entry: list) -> None:
+        """Remove entity index of entry leaving outbox."""
+        rtr, event = entry
+        key = (rtr, event[0], event[1], event[2])
+        if self._outbox_keys.get(key) is entry:
+            del self._outbox_keys[key]
+
+    async def send_events(self) -> None:
+        """Task delivering queued events in order, all queued ones at once."""
+        while self._outbox:
+            entries = []
+            while self._outbox and (len(entries) < EVNT_BATCH_MAX):
+                entry = self._outbox.popleft()
+                self.forget_outbox_key(entry)
+                entries.append(entry)
+            try:
+                await self.notify_events(entries)
+            except Exception as err_msg:
+                self.logger.error(f"Event delivery failed: {err_msg}")
+
+    async def check_batch_service(self) -> bool:
+        """Return True if integration offers service for event lists."""
         try:
+            resp = await self.ws_request(dict(WEBSOCK_MSG.services_msg))
+            services = resp["result"].get(WEBSOCK_MSG.call_service_msg["domain"], {})
+        except Exception as err_msg:
+            self.logger.warning(f"Could not read services of integration: {err_msg}")
+            return False
+        self.logger.info(
+            f"Integration event batch mode: {WEBSOCK_MSG.batch_service in services}"
+        )
+        return WEBSOCK_MSG.batch_service in services
+
+    def event_commands(self, entries: list[list]) -> list[dict]:
+        """Build call_service commands, one per event or one with list in batch mode."""
+        hub_uid = self.api_srv.sm_hub._host_ip
+        if self.batch_mode and (len(entries) > 1):
+            event_cmd = dict(WEBSOCK_MSG.call_service_msg)
+            event_cmd["service"] = WEBSOCK_MSG.batch_service
+            event_cmd["service_data"] = {
+                "hub_uid": hub_uid,
+                "events": [
+                    {
+                        "rtr_nmbr": rtr,
+                        "mod_nmbr": event[0],
+                        "evnt_type": event[1],
+                        "evnt_arg1": event[2],
+                        "evnt_arg2": event[3],
+                    }
+                    for rtr, event in entries
+                ],
+            }
+            self.batch_count += 1
+            return [event_cmd]
+        event_cmds = []
+        for rtr, event in entries:
             evnt_data = {
-                "hub_uid": self.api_srv.sm_hub._host_ip,
+                "hub_uid": hub_uid,
                 "rtr_nmbr": rtr,
                 "mod_nmbr": event[0],
                 "evnt_type": event[1],
                 "evnt_arg1": event[2],
                 "evnt_arg2": event[3],
             }
-            self.logger.debug(f"Event alerted: {evnt_data}")
-            event_cmd = WEBSOCK_MSG.call_service_msg
-            self.notify_id += 1
-            event_cmd["id"] = self.notify_id
+            event_cmd = dict(WEBSOCK_MSG.call_service_msg)
             event_cmd["service_data"] = evnt_data
+            event_cmds.append(event_cmd)
+        return event_cmds
 
-            await self.websck.send(json.dumps(event_cmd))  # Send command
-            resp = await self.websck.recv()
-            self.logger.debug(f"Notify returned {resp}")
+    async def notify_events(self, entries: list[list]):
+        """Trigger events on remote host (e.g. home assistant), entries of router and event"""
+
+        reopened = False
+        if self.websck_is_closed:
+            success = reopened = await self.open_websocket()
+        else:
+            success = True
+        if not success:
+            if self.api_srv._test_mode:
+                return
+            self.logger.warning("Failed to send event via websocket, open failed")
+            return
+        if not entries:
+            return
+        event_cmds: list[dict] = []
+        sent = 0  # commands handed over to websocket, in flight
+        try:
+            if reopened and self._in_flight:
+                # Not acknowledged on closed connection
+                await self.resend_notifies()
+            if self.batch_mode is None:
+                self.batch_mode = await self.check_batch_service()
+            event_cmds = self.event_commands(entries)
+            for event_cmd in event_cmds:
+                self.logger.debug(f"Event alerted: {event_cmd['service_data']}")
+                await self.acquire_ws_slot()
+                # Acknowledge is received by rx_task, no waiting here
+                sent += 1
+                await self.send_notify(WsNotify(event_cmd))
 
         except ConnectionClosedOK:
             self.logger.warning(
@@ -468,17 +600,175 @@ class EventServer:
             )
             self.websck_is_closed = True
             self.evnt_running = False
+            self.drop_notifies()
+            self.drop_unsent(self.unsent_entries(entries, event_cmds, sent))
             await self.stop()
             await self.api_srv.set_server_mode(1)
         except Exception as error_msg:
             # Use to get cancel event in api_server
             self.logger.error(f"Could not connect to event server: {error_msg}")
             self.websck_is_closed = True
+            unsent = self.unsent_entries(entries, event_cmds, sent)
             if await self.ping_pong_reconnect():
-                # Retry
-                await self.websck.send(json.dumps(event_cmd))  # Send command
-                resp = await self.websck.recv()
+                await self.resend_notifies()
+                self.requeue_outbox(unsent)
+            else:
+                self.drop_notifies()
+                self.drop_unsent(unsent)
+
+    def unsent_entries(
+        self, entries: list[list], event_cmds: list[dict], sent: int
+    ) -> list[list]:
+        """Return entries of commands not handed over to websocket."""
+        if not event_cmds:
+            return entries
+        if len(event_cmds) == len(entries):
+            return entries[sent:]  # one command per event
+        return [] if sent else entries  # one batch command
+
+    def requeue_outbox(self, entries: list[list]) -> None:
+        """Put unsent events back in front of outbox, keeping their order."""
+        for entry in reversed(entries):
+            self._outbox.appendleft(entry)
+            rtr, event = entry
+            self._outbox_keys.setdefault((rtr, event[0], event[1], event[2]), entry)
+        while len(self._outbox) > self.outbox_len:
+            dropped = self._outbox.popleft()
+            self.forget_outbox_key(dropped)
+            self.dropped_count += 1
+        if entries:
+            self.logger.info(f"{len(entries)} unsent events queued again")
+
+    def drop_unsent(self, entries: list[list]) -> None:
+        """Give up events not sent, count them as lost."""
+        if entries:
+            self.lost_count += len(entries)
+            self.logger.warning(f"{len(entries)} events not sent, dropped")
+
+    async def acquire_ws_slot(self) -> None:
+        """Wait for free slot in window of unacknowledged events."""
+        try:
+            await asyncio.wait_for(self._ws_slots.acquire(), EVNT_ACK_TIMEOUT)
+        except TimeoutError:
+            # Acknowledges missing, give up oldest events
+            self.expire_notifies()
+            await self._ws_slots.acquire()
+
+    async def send_notify(self, notify: WsNotify) -> None:
+        """Send event with new id, keep it in flight until acknowledged."""
+        self.notify_id += 1
+        notify.ws_cmd["id"] = self.notify_id
+        notify.t_sent = time.monotonic()
+        self._in_flight[self.notify_id] = notify
+        await self.websck.send(json.dumps(notify.ws_cmd))  # Send command
+
+    async def resend_notifies(self) -> None:
+        """Send unacknowledged events again after reconnect."""
+        if self.websck_is_closed:
+            # No websocket, e.g. test mode
+            self.drop_notifies()
+            return
+        notifies = list(self._in_flight.values())
+        self._in_flight.clear()
+        for notify in notifies:
+            if notify.retries <= 0:
+                self.lost_count += 1
+                self._ws_slots.release()
+                self.logger.warning(
+                    f"Event not acknowledged, dropped: {notify.ws_cmd['service_data']}"
+                )
+                continue
+            notify.retries -= 1
+            self.resent_count += 1
+            try:
+                await self.send_notify(notify)
+            except Exception as err_msg:
+                self.logger.error(f"Resending events failed: {err_msg}")
+                self.websck_is_closed = True
+                return
+
+    def drop_notifies(self) -> None:
+        """Give up all unacknowledged events."""
+        if self._in_flight:
+            self.logger.warning(
+                f"{len(self._in_flight)} events not acknowledged, dropped"
+            )
+        for _ in self._in_flight:
+            self.lost_count += 1
+            self._ws_slots.release()
+        self._in_flight.clear()
+
+    def expire_notifies(self) -> None:
+        """Drop events waiting longer than ack timeout."""
+        t_now = time.monotonic()
+        for ws_id, notify in list(self._in_flight.items()):
+            if t_now - notify.t_sent >= EVNT_ACK_TIMEOUT:
+                del self._in_flight[ws_id]
+                self.lost_count += 1
+                self._ws_slots.release()
+                self.logger.warning(
+                    f"No acknowledge for event {notify.ws_cmd['service_data']} within {EVNT_ACK_TIMEOUT} s"
+                )
+
+    def handle_ws_result(self, resp: str) -> None:
+        """Assign result message to event or request by id."""
+        msg = json.loads(resp)
+        ws_id = msg.get("id")
+        if (notify := self._in_flight.pop(ws_id, None)) is not None:
+            self._ws_slots.release()
+            self.ack_lag = time.monotonic() - notify.t_sent
+            self.max_ack_lag = max(self.max_ack_lag, self.ack_lag)
+            if not msg.get("success", True):
+                self.logger.warning(f"Notify failed: {msg.get('error')}")
+            else:
                 self.logger.debug(f"Notify returned {resp}")
+        elif (fut := self._requests.pop(ws_id, None)) is not None:
+            if not fut.done():
+                fut.set_result(msg)
+        else:
+            self.logger.debug(f"Websocket message without request: {resp}")
+
+    async def receive_ws_results(self) -> None:
+        """Task receiving all websocket messages after authentification."""
+        try:
+            async for resp in self.websck:
+                self.handle_ws_result(resp)
+            self.logger.info("Websocket closed by home assistant")
+        except asyncio.CancelledError:
+            raise
+        except Exception as err_msg:
+            self.logger.warning(f"Websocket receive failed: {err_msg}")
+        self.websck_is_closed = True
+        for fut in self._requests.values():
+            if not fut.done():
+                fut.set_exception(ConnectionError("Websocket closed"))
+        self._requests.clear()
+
+    def start_receiver(self) -> None:
+        """Start task receiving websocket results."""
+        self.stop_receiver()
+        self.rx_task = self.api_srv.loop.create_task(
+            self.receive_ws_results(), name="ws_receiver"
+        )
+
+    def stop_receiver(self) -> None:
+        """Cancel task receiving websocket results."""
+        if (self.rx_task is not None) and not self.rx_task.done():
+            self.rx_task.cancel()
+        self.rx_task = None
+
+    async def ws_request(self, ws_cmd: dict) -> dict:
+        """Send websocket command, result with same id comes from rx_task."""
+        self.notify_id += 1
+        ws_id = self.notify_id
+        ws_cmd["id"] = ws_id
+        fut = self.api_srv.loop.create_future()
+        self._requests[ws_id] = fut
+        try:
+            await self.websck.send(json.dumps(ws_cmd))  # Send command
+            return await asyncio.wait_for(fut, EVNT_ACK_TIMEOUT)
+        finally:
+            self._requests.pop(ws_id, None)
 
     async def get_ha_config(self):
         """Query home assistant config."""
@@ -489,12 +779,7 @@ class EventServer:
         if not success:
             self.logger.warning("Failed to get ha config via websocket, open failed")
             return
-        ws_cmd = WEBSOCK_MSG.config_msg
-        self.notify_id += 1
-        ws_cmd["id"] = self.notify_id
-        await self.websck.send(json.dumps(ws_cmd))  # Send command
-        resp = await self.websck.recv()
-        return json.loads(resp)
+        return await self.ws_request(dict(WEBSOCK_MSG.config_msg))
 
     async def ping_pong_reconnect(self) -> bool:
         """Check for living websocket connection, reconnect if needed."""
@@ -504,12 +789,8 @@ class EventServer:
         success = await self.open_websocket()
         if success:
             try:
-                ws_cmd = WEBSOCK_MSG.ping_msg
-                self.notify_id += 1
-                ws_cmd["id"] = self.notify_id
-                await self.websck.send(json.dumps(ws_cmd))  # Send command
-                resp = await self.websck.recv()
-                if json.loads(resp)["type"] == "pong":
+                resp = await self.ws_request(dict(WEBSOCK_MSG.ping_msg))
+                if resp["type"] == "pong":
                     self.logger.debug("Received pong from event server")
                     return True
                 else:
@@ -623,10 +904,13 @@ class EventServer:
             self.logger.info(f"Websocket connected to {self._uri}, response: {resp}")
             self.token_ok = True
         self.websck_is_closed = False
+        self.batch_mode = None  # integration may have changed
+        self.start_receiver()
         return True
 
     async def close_websocket(self):
         """Close websocket, if object still available."""
+        self.stop_receiver()
         if not self.websck_is_closed:
             try:
                 await asyncio.wait_for(asyncio.shield(self.websck.close()), timeout=1)
@@ -650,14 +934,16 @@ class EventServer:
             return
         self.busy_starting = True
         self.logger.debug("Starting new EventSrv task")
+        self.api_srv.rt_arbiter.enable_events(True)
         self.ev_srv_task = self.api_srv.loop.create_task(
-            self.watch_rt_events(self.api_srv._rt_serial[0])
+            self.watch_rt_events(self.api_srv.rt_arbiter)
         )
         self.ev_srv_task_running = True
 
     async def stop(self):
         """Stop running event server task."""
         self.evnt_running = False
+        self.api_srv.rt_arbiter.enable_events(False)  # wake up waiting task
         if not self.ev_srv_task_running:
             return
         self.logger.debug("Stopping EventSrv task")
@@ -697,8 +983,13 @@ class EventServer:
             self.ev_srv_task_running = False
         return self.ev_srv_task_running
 
-    def get_events_buffer(self) -> list[list[int]]:
-        """Return buffered events for testing and flush."""
-        buffer = self.events_buffer
-        self.events_buffer = []
-        return buffer
+    def set_testing_events(self, activate: bool) -> None:
+        """Subscribe module event rings for testing page or remove them."""
+        if activate and (self.test_sub is None):
+            self.test_ring = ModuleEventRing()
+            self.test_sub = self.bus.subscribe(
+                "testing", handler=self.test_ring.record
+            )
+        elif not activate and (self.test_sub is not None):
+            self.bus.unsubscribe(self.test_sub)
+            self.test_sub = None
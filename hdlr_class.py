@@ -1,13 +1,20 @@
 import logging
 import asyncio
-from const import API_ACTIONS
+from collections import deque
+from contextlib import asynccontextmanager, contextmanager
+from const import API_ACTIONS, RT_CMD_TIMEOUT
 from messages import RtMessage
-from typing import Iterable
+from typing import AsyncIterator, Iterable, Iterator
 
 
 class HdlrBase:
     """Base class of all api handlers."""
 
+    _cmd_batch: list[tuple[RtMessage, asyncio.Future | None]] | None = None
+    _cmd_batch_task: asyncio.Task | None = None
+    _prefetched: deque[tuple[str, asyncio.Future | None]] | None = None
+    _prefetch_task: asyncio.Task | None = None
+
     def __init__(self, api_srv) -> None:
         """Creates handler object with msg infos and serial interface"""
         self.api_srv = api_srv
@@ -71,30 +78,123 @@ class HdlrBase:
         self.check_router_no(rt_no)
         self.check_arg(mod_no, range(1, 251), "Error: module no out of range 1..250")
 
-    async def handle_router_cmd_resp(self, rt_no: int, cmd: str) -> None:
+    async def handle_router_cmd_resp(self, rt_no: int, cmd: str | bytes) -> None:
         """Sends router command via serial interface and get response"""
         self.rt_msg = RtMessage(self, rt_no, cmd)
-        await self.rt_msg.rt_send()
         self.rt_msg._resp_msg = b"\0"
         self.rt_msg._resp_buffer = b"\0\0"
-        if not self.api_srv._opr_mode:
-            # await asyncio.sleep(0.25)
+        if (self._cmd_batch is not None) and (
+            asyncio.current_task() is self._cmd_batch_task
+        ):
+            # Pipelined, responses collected when leaving router_cmd_batch()
+            self._cmd_batch.append((self.rt_msg, self.rt_msg.rt_submit()))
+            return
+        if (
+            self._prefetched
+            and (self._prefetched[0][0] == cmd)
+            and (asyncio.current_task() is self._prefetch_task)
+        ):
+            # Next command already sent by prefetch_router_cmds()
+            await self.collect_resp(self._prefetched.popleft()[1])
+            return
+        # Single command also in shared window of arbiter, resent on timeout
+        await self.collect_resp(self.rt_msg.rt_submit())
+
+    async def handle_router_cmds_resp(
+        self, rt_no: int, cmds: list[str] | list[bytes]
+    ) -> list[RtMessage]:
+        """Sends router commands pipelined, returns messages with responses in order"""
+        rt_msgs: list[RtMessage] = []
+        async with self.router_cmd_batch():
+            for cmd in cmds:
+                await self.handle_router_cmd_resp(rt_no, cmd)
+                rt_msgs.append(self.rt_msg)
+        return rt_msgs
+
+    @contextmanager
+    def prefetch_router_cmds(self, rt_no: int, cmds: list[str]) -> Iterator[None]:
+        """Send router commands pipelined, handle_router_cmd_resp picks up responses.
+
+        Responses are taken in order of cmds by the calling task only, responses
+        not picked up are dropped when leaving the context.
+        """
+        self._prefetched = deque(
+            (cmd, RtMessage(self, rt_no, cmd).rt_submit()) for cmd in cmds
+        )
+        self._prefetch_task = asyncio.current_task()
+        try:
+            yield
+        finally:
+            self.drop_resps(resp_fut for _, resp_fut in self._prefetched)
+            self._prefetched = None
+            self._prefetch_task = None
+
+    def drop_resps(self, resp_futs: Iterable[asyncio.Future | None]) -> None:
+        """Cancel pending responses, mark failed ones as retrieved."""
+        for resp_fut in resp_futs:
+            if resp_fut is None or resp_fut.cancel():
+                continue
+            if not resp_fut.cancelled():
+                resp_fut.exception()  # already done, mark as retrieved
+
+    async def collect_resp(self, resp_fut: asyncio.Future | None) -> None:
+        """Take response of queued command."""
+        if resp_fut is None:
+            return
+        try:
+            self.rt_msg.rt_set_resp(await resp_fut)
+        except TimeoutError:
+            self.logger.warning("Timeout receiving router response, returning 0 0")
+        except Exception as err_msg:
+            self.logger.warning(
+                f"Error receiving router response: {err_msg}, returning 0 0"
+            )
+
+    @asynccontextmanager
+    async def router_cmd_batch(
+        self,
+    ) -> AsyncIterator[list[tuple[RtMessage, asyncio.Future | None]]]:
+        """Queue router commands of calling task without waiting for each response.
+
+        Responses are collected when leaving the context, commands still pending
+        are dropped if the context is left by an exception. With a batch already
+        open on the handler, commands are sent one by one.
+        """
+        if self._cmd_batch is not None:
+            yield []
+            return
+        cmd_batch: list[tuple[RtMessage, asyncio.Future | None]] = []
+        self._cmd_batch = cmd_batch
+        self._cmd_batch_task = asyncio.current_task()
+        try:
+            yield cmd_batch
+            self._cmd_batch = None
+            self._cmd_batch_task = None
+            await self.collect_batch(cmd_batch)
+        finally:
+            self._cmd_batch = None
+            self._cmd_batch_task = None
+            self.drop_resps(resp_fut for _, resp_fut in cmd_batch)
+
+    async def collect_batch(
+        self, cmd_batch: list[tuple[RtMessage, asyncio.Future | None]]
+    ) -> None:
+        """Wait for all responses of batched router commands."""
+        for rt_msg, resp_fut in cmd_batch:
+            if resp_fut is None:
+                continue
             try:
-                await asyncio.wait_for(self.rt_msg.rt_recv(), timeout=1.5)
+                rt_msg.rt_set_resp(await resp_fut)
             except TimeoutError:
-                self.logger.warning("Timeout receiving router response, returning 0 0")
+                self.logger.warning(
+                    f"Timeout receiving router response to {rt_msg._buffer}, returning 0 0"
+                )
             except Exception as err_msg:
                 self.logger.warning(
                     f"Error receiving router response: {err_msg}, returning 0 0"
                 )
-            return
-        # no response possible
-        self.logger.warning(
-            f"handle_router_cmd_resp called in Opr mode, return 0 0, msg: {self.rt_msg._buffer.encode('iso8859-1')}"
-        )
-        return
 
-    async def handle_router_cmd(self, rt_no: int, cmd: str) -> None:
+    async def handle_router_cmd(self, rt_no: int, cmd: str | bytes) -> None:
         """Sends router command via serial interface and get response."""
         self.rt_msg = RtMessage(self, rt_no, cmd)
         await self.rt_msg.rt_send()
@@ -105,7 +205,7 @@ class HdlrBase:
         self.rt_msg._resp_msg = b"\0"
         self.rt_msg._resp_buffer = b"\0\0"
         try:
-            await asyncio.wait_for(self.rt_msg.rt_recv(), timeout=1.5)
+            await asyncio.wait_for(self.rt_msg.rt_recv(), timeout=RT_CMD_TIMEOUT)
         except TimeoutError:
             self.logger.warning("Timeout receiving router response, returning 0 0")
         return
@@ -1,4 +1,6 @@
 import logging
+from checksum import calc_crc, xor_checksum
+from rt_templates import finalize_cmd
 
 
 class BaseMessage:
@@ -97,18 +99,14 @@ class ApiMessage(BaseMessage):
 class RtMessage(BaseMessage):
     """Class of messages for the SmartIP2 API."""
 
-    def __init__(self, api_hdlr, rt_id: int, rt_command: str) -> None:
+    def __init__(self, api_hdlr, rt_id: int, rt_command: str | bytes) -> None:
         self.api_hdlr = api_hdlr
-        if api_hdlr.ser_if is not None:
-            self.rt_reader = api_hdlr.ser_if[0]
-            self.ser_writer = api_hdlr.ser_if[1]
-        else:
-            self.rt_reader = None
-            self.ser_writer = None
+        self.arbiter = api_hdlr.api_srv.rt_arbiter
+        self._request = None
         self.logger = logging.getLogger(__name__)
         self.rt = rt_id
         self.rt_command = rt_command
-        self._buffer: str = ""
+        self._buffer: bytes = b""
         self._length: int = 0
         self.rt_prepare()
         self._resp_msg = b"\0"
@@ -117,56 +115,71 @@ class RtMessage(BaseMessage):
 
     def rt_prepare(self):
         """Set current router, encode, and calc crc"""
-        self._buffer = self.rt_command.replace("<rtr>", chr(self.rt))
-        cmd_len = chr(len(self._buffer))
-        self._buffer = self._buffer[:2] + cmd_len + self._buffer[3:]
-        self.calc_CRC()
+        if isinstance(self.rt_command, bytes):
+            # Complete command, built by compiled template
+            self._buffer = self.rt_command
+        elif len(self.rt_command) > 2:
+            buf = bytearray(
+                self.rt_command.replace("<rtr>", chr(self.rt)).encode("iso8859-1")
+            )
+            self._buffer = finalize_cmd(buf)
+        else:
+            self._buffer = self.rt_command.encode("iso8859-1")
         self._length = 0
         if len(self._buffer) > 3:
-            self._length = ord(self._buffer[2])
-
-    def calc_CRC(self) -> None:
-        """Caclulates simple xor checksum"""
-        chksum = 0
-        self._buffer = self._buffer[:-1]
-        for byt in self._buffer:
-            chksum ^= ord(byt)
-        self._buffer += chr(chksum)
+            self._length = self._buffer[2]
 
     def check_CRC(self) -> bool:
         """Caclulates simple xor checksum and compares with received value"""
-        chksum = 0
-        for byt in self._resp_buffer[:-1]:
-            chksum ^= byt
-        self._crc_ok = self._resp_buffer[-1] == chksum
+        self._crc_ok = self._resp_buffer[-1] == xor_checksum(self._resp_buffer[:-1])
+        if not self._crc_ok and self.arbiter is not None:
+            self.arbiter.metrics.count_crc_error("responses")
         return self._crc_ok
 
-    async def rt_send(self) -> None:
+    async def rt_send(self, expect_resp: bool = False) -> None:
         """Sends router command via serial interface"""
-        if self.ser_writer is None:
-            self.logger.warning("Can't send to router, ser_writer is None")
+        if self.arbiter is None:
+            self.logger.warning("Can't send to router, serial interface is None")
             return
-        self.ser_writer.write(self._buffer.encode("iso8859-1"))
-        await self.ser_writer.drain()
-        self.logger.debug(f"Sent to router: {self._buffer.encode('iso8859-1')}")
+        cmd = self._buffer
+        if expect_resp:
+            # Register before sending, response may arrive any time
+            self._request = self.arbiter.expect(cmd)
+        await self.arbiter.send(cmd)
+        self.logger.debug(f"Sent to router: {cmd}")
 
     async def rt_recv(self) -> None:
-        """Reads router's response message via serial interface"""
-        if self.rt_reader is None:
-            self.logger.warning("Can't read from router, rt_reader is None")
+        """Waits for router's response message from serial arbiter.
+
+        Response to sent command is awaited with learned timeout of its kind.
+        """
+        if self.arbiter is None:
+            self.logger.warning("Can't read from router, serial interface is None")
             self._resp_code = 0
             self._resp_buffer = b"\0\0"
             self._resp_msg = b"\0\0"
             return
-        prefix = await self.rt_reader.readexactly(4)
-        if (prefix[3] - 3) < 1:
-            self.logger.error("Invalid message length")
-            if (b_len := len(self.rt_reader._buffer)) > 0:
-                # Empty buffer
-                await self.rt_reader.readexactly(b_len)
-            raise Exception("Invalid message length")
-        tail = await self.rt_reader.readexactly(prefix[3] - 3)
-        self._resp_buffer = prefix[1:] + tail
+        try:
+            if self._request is None:
+                frame = await self.arbiter.recv_unsolicited()
+            else:
+                frame = await self.arbiter.wait_resp(self._request)
+        finally:
+            if self._request is not None:
+                self.arbiter.discard(self._request)
+                self._request = None
+        self.rt_set_resp(frame)
+
+    def rt_submit(self):
+        """Queue command in pipelined command queue, return future of response frame"""
+        if self.arbiter is None:
+            self.logger.warning("Can't send to router, serial interface is None")
+            return None
+        return self.arbiter.cmd_queue.submit(self._buffer)
+
+    def rt_set_resp(self, frame: bytes) -> None:
+        """Take received response frame and parse it"""
+        self._resp_buffer = frame[1:]
         self._crc = self._resp_buffer[-1]
         self.check_CRC()
         self._resp_code = self._resp_buffer[3]
@@ -177,11 +190,11 @@ class RtMessage(BaseMessage):
             )
         self.logger.debug(f"Router returned: {self._resp_buffer}")
 
-    def f_hex(self, msg: str) -> str:
+    def f_hex(self, msg: bytes) -> str:
         """Make pretty hex string."""
         out_msg = ""
-        for msg_chr in msg:
-            out_msg += f" {ord(msg_chr):02X}"
+        for msg_byt in msg:
+            out_msg += f" {msg_byt:02X}"
         return out_msg
 
 
@@ -208,36 +221,5 @@ class RtResponse(BaseMessage):
 
     def check_CRC(self) -> bool:
         """Caclulates simple xor checksum and compares with received value"""
-        chksum = 0
-        for byt in self._resp_buffer[:-1]:
-            chksum ^= byt
-        self._crc_ok = self._resp_buffer[-1] == chksum
+        self._crc_ok = self._resp_buffer[-1] == xor_checksum(self._resp_buffer[:-1])
         return self._crc_ok
-
-
-def init_crc16_tbl() -> list[int]:
-    """Prepare the crc16 table."""
-    res: list[int] = []
-    for byte in range(256):
-        crc = 0x0000
-        for _ in range(8):
-            if (byte ^ crc) & 0x0001:
-                crc = (crc >> 1) ^ 0xA001
-            else:
-                crc >>= 1
-            byte >>= 1
-        res.append(crc)
-    return res
-
-
-__crc16_tbl: list[int] = init_crc16_tbl()
-
-
-def calc_crc(data: bytes) -> int:
-    """Calculate a crc16 for the given byte string."""
-    crc = 0xFFFF
-    for byt in data:
-        idx = __crc16_tbl[(crc ^ int(byt)) & 0xFF]
-        crc = ((crc >> 8) & 0xFF) ^ idx
-    crc_res = ((crc << 8) & 0xFF00) | ((crc >> 8) & 0x00FF)
-    return crc_res
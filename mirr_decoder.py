@@ -0,0 +1,169 @@
+from const import HA_EVENTS, MirrIdx
+
+# Modules without tracked mirror changes
+UNTRACKED_TYPES = [
+    "Smart Nature",
+    "Smart GSM",
+    "FanM-Bus",
+    "Smart In 8/24V",
+    "Smart In 8/230V",
+    "Fanekey",
+]
+
+
+def watched_ranges(mod_type: str) -> tuple[list[tuple[int, int]], list[int]]:
+    """Return mirror index ranges compared per module type and blocked indices."""
+    if mod_type in UNTRACKED_TYPES:
+        return [], []
+    if mod_type in ["Smart In 8/24V-1"]:
+        return [(MirrIdx.AD_1, MirrIdx.DISPL_CONTR + 1)], []
+    if mod_type in ["Smart Detect 180", "Smart Detect 180-2", "Smart Detect 360"]:
+        return [(MirrIdx.LUM, MirrIdx.MOV + 1)], []
+    if mod_type in [
+        "Smart Out 8/R",
+        "Smart Out 8/R-1",
+        "Smart Out 8/R-2",
+        "Smart Out 8/T",
+    ]:
+        block_list = [
+            MirrIdx.LUM,
+            MirrIdx.TEMP_ROOM,
+            MirrIdx.TEMP_PWR,
+            MirrIdx.TEMP_EXT,
+        ]
+        return [(MirrIdx.DIM_1, MirrIdx.T_SHORT)], block_list  # includes BLAD_POS
+    # Controller modules
+    block_list = [
+        MirrIdx.HUM,
+        MirrIdx.AQI,
+        MirrIdx.LUM,
+        MirrIdx.TEMP_ROOM,
+        MirrIdx.TEMP_PWR,
+        MirrIdx.TEMP_EXT,
+    ]
+    return [
+        (MirrIdx.LOGIC, MirrIdx.FLAG_LOC + 2),
+        (MirrIdx.MODE, MirrIdx.MODE + 1),
+        (MirrIdx.AD_1, MirrIdx.AD_2 + 1),
+        (MirrIdx.DIM_1, MirrIdx.T_SHORT),
+    ], block_list
+
+
+def swap_cover_idx(typ: bytes, mirr_idx: int) -> int:
+    """Return cover index from mirror index (0..2 -> 2..4)."""
+    cvr_idx = mirr_idx
+    if typ[0] != 1:
+        return cvr_idx
+    cvr_idx += 2
+    if cvr_idx > 4:
+        cvr_idx -= 5
+    return cvr_idx
+
+
+def classify(i_d: int, typ: bytes) -> tuple[int, int, str] | None:
+    """Return event type, index, and name of mirror byte, None if no event."""
+    if i_d == MirrIdx.MODE:
+        return HA_EVENTS.MODE, 0, "Mode"  # index is group of module
+    if i_d == MirrIdx.MOV:
+        return HA_EVENTS.MOVE, 0, "Movement"
+    if MirrIdx.COVER_POS <= i_d < MirrIdx.COVER_POS + 8:
+        idv = swap_cover_idx(typ, i_d - MirrIdx.COVER_POS)
+        return HA_EVENTS.COV_VAL, idv, f"Cover {idv + 1} pos"
+    if MirrIdx.BLAD_POS <= i_d < MirrIdx.BLAD_POS + 8:
+        idv = swap_cover_idx(typ, i_d - MirrIdx.BLAD_POS)
+        return HA_EVENTS.BLD_VAL, idv, f"Blade {idv + 1} pos"
+    if MirrIdx.DIM_1 <= i_d <= MirrIdx.DIM_4:
+        idv = i_d - MirrIdx.DIM_1
+        return HA_EVENTS.DIM_VAL, idv, f"Dimmmer {idv + 1}"
+    if MirrIdx.FLAG_LOC <= i_d < MirrIdx.FLAG_LOC + 2:
+        return HA_EVENTS.FLAG, 0, "Flag"  # index from changed bits
+    if MirrIdx.COUNTER_VAL <= i_d < MirrIdx.COUNTER_VAL + 28:
+        idv = (i_d - MirrIdx.COUNTER_VAL) // 3
+        return HA_EVENTS.CNT_VAL, idv, f"Counter {idv + 1}"
+    if MirrIdx.AD_1 <= i_d <= MirrIdx.AD_2:
+        idv = i_d - MirrIdx.AD_1
+        return HA_EVENTS.ANLG_VAL, idv, f"Analog in {idv + 1}"
+    if typ == b"\x0b\x1f":
+        if MirrIdx.GEN_1 <= i_d <= MirrIdx.GEN_2:
+            idv = i_d - MirrIdx.GEN_1 + 2
+            return HA_EVENTS.ANLG_VAL, idv, f"Analog in {idv + 1}"
+        if MirrIdx.GEN_3 <= i_d <= MirrIdx.GEN_4:
+            idv = i_d - MirrIdx.GEN_3 + 4
+            return HA_EVENTS.ANLG_VAL, idv, f"Analog in {idv + 1}"
+    return None
+
+
+def flag_change(i_d: int, old_val: int, new_val: int) -> tuple[int, int]:
+    """Return flag index and value of changed flag byte.
+
+    Single change: flag no and value 0/1, else mask + 1000 (+ 1000 for upper
+    byte) and byte.
+    """
+    chg_msk = old_val ^ new_val
+    val = new_val & chg_msk
+    i = (chg_msk & -chg_msk).bit_length() - 1  # lowest changed bit
+    if (1 << i) != chg_msk:
+        # more than one flag changed, return mask and byte
+        idv = chg_msk + 1000
+        if i_d > MirrIdx.FLAG_LOC:  # upper byte
+            idv = idv + 1000
+        return idv, val
+    idv = i
+    if i_d > MirrIdx.FLAG_LOC:  # upper byte
+        idv = idv + 8
+    return idv, int(val > 0)
+
+
+class MirrDecoder:
+    """Mirror diff decoder of a module type, built once, shared by its modules.
+
+    Maps each mirror index to its event, runs are contiguous watched indices with
+    events, compared as slices before looking at single bytes.
+    """
+
+    def __init__(self, typ: bytes, mod_type: str) -> None:
+        self.typ = typ
+        self.table: list[tuple[int, int, str] | None] = [None] * MirrIdx.END
+        self.runs: list[tuple[int, int]] = []
+        ranges, block_list = watched_ranges(mod_type)
+        for i0, i1 in ranges:
+            for i_d in range(i0, i1):
+                entry = None if i_d in block_list else classify(i_d, typ)
+                if entry is None:
+                    continue
+                self.table[i_d] = entry
+                if self.runs and self.runs[-1][1] == i_d:
+                    self.runs[-1] = (self.runs[-1][0], i_d + 1)
+                else:
+                    self.runs.append((i_d, i_d + 1))
+
+    def diff(self, old: bytes, new: bytes) -> list[tuple[int, int, int, int, str]]:
+        """Return index, event type, index, value, and name of changed mirror bytes."""
+        changes = []
+        table = self.table
+        max_idx = min(len(old), len(new))
+        for i0, i1 in self.runs:
+            if i1 > max_idx:
+                i1 = max_idx
+            if (i0 >= i1) or (old[i0:i1] == new[i0:i1]):
+                continue
+            for i_d in range(i0, i1):
+                if old[i_d] != new[i_d]:
+                    ev_type, idv, ev_str = table[i_d]  # type: ignore
+                    val = new[i_d]
+                    if ev_type == HA_EVENTS.FLAG:
+                        idv, val = flag_change(i_d, old[i_d], val)
+                        ev_str = f"Flag {idv + 1}"
+                    changes.append((i_d, ev_type, idv, val, ev_str))
+        return changes
+
+
+_decoders: dict[tuple[bytes, str], MirrDecoder] = {}
+
+
+def get_decoder(typ: bytes, mod_type: str) -> MirrDecoder:
+    """Return decoder of module type, build on first use."""
+    key = (bytes(typ), mod_type)
+    if key not in _decoders:
+        _decoders[key] = MirrDecoder(*key)
+    return _decoders[key]
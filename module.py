@@ -1,6 +1,7 @@
 import datetime
 from glob import glob
 import logging
+import time
 from copy import deepcopy as dpcopy
 from const import (
     MirrIdx,
@@ -11,9 +12,10 @@ from const import (
     FW_FILES_DIR,
     MODULE_FIRMWARE,
 )
-from configuration import ModuleSettings, ModuleSettingsLight
+from configuration import ModuleSettings, ModuleSettingsCopy, ModuleSettingsLight
 from config_commons import is_outdated
 from messages import calc_crc
+from mirr_decoder import MirrDecoder, get_decoder
 
 
 class HbtnModule:
@@ -31,23 +33,44 @@ class HbtnModule:
         self.api_srv = api_srv
         self.hdlr = hdlr
 
-        self.status: bytes = b""  # full mirror, holds module settings
+        self._status: bytes = b""  # full mirror, holds module settings
+        self.stat_matrix = None  # mirrors of router, full and compact
+        self._stat_row: int | None = None
         self.compact_status: bytes = b""  # compact status, subset
         self.smg_upload: bytes = b""  # buffer for SMG upload
         self.smg_crc = 0
-        self.list: bytes = b""  # SMC information: labels, commands
+        self._list: bytes = b""  # SMC information: labels, commands
         self.list_upload: bytes = b""  # buffer for SMC upload
         self.settings = None
+        self._settings_cache: ModuleSettings | None = None  # parsed once, copied
+        self._settings_key: tuple = ()
+        self.decoder: MirrDecoder | None = None  # mirror diff, per module type
         self.update_available = False
         self.update_version = ""
+        self.init_times: dict[str, float] = {}  # duration of initialization phases
 
     async def initialize(self):
         """Get full module status"""
+        t_phase = time.monotonic()
         self.hdlr.initialize(self)
         await self.hdlr.get_module_status(self._id)
-        self.comp_status = self.get_status(False)
-        self.calc_SMG_crc(self.build_smg())
+        t_phase = self.phase_done("mirror", t_phase)
+        self.parse_status()
+        self.list = await self.read_module_list()
+        t_phase = self.phase_done("smc", t_phase)
+        self.calc_SMC_crc(self.list)
+        self.io_properties, self.io_prop_keys = self.get_io_properties()
+        self._serial = await self.get_serial()
+        t_phase = self.phase_done("serial", t_phase)
+        await self.cleanup_descriptions()
+        self.check_firmware()
+        self.phase_done("descriptions", t_phase)
+
+        self.logger.debug(f"Module {self._name} at {self._id} initialized")
 
+    def parse_status(self) -> None:
+        """Take name, type, and settings crc from full mirror."""
+        self.calc_SMG_crc(self.build_smg())
         self._name = (
             self.status[MirrIdx.MOD_NAME : MirrIdx.MOD_NAME + 32]
             .decode("iso8859-1")
@@ -62,14 +85,59 @@ class HbtnModule:
         if sw_vers[:8] == "SC2 V4.6":
             self._typ = b"\x01\x03"
         self._type = MODULE_CODES[self._typ.decode("iso8859-1")]
-        self.list = await self.hdlr.get_module_list(self._id)
+        self.decoder = get_decoder(self._typ, self._type)
+
+    def restore(self, status: bytes, smc_list: bytes, serial: str) -> None:
+        """Set up module from warm start snapshot, without router access."""
+        self.hdlr.initialize(self)
+        self.status = status
+        self.parse_status()
+        self.list = smc_list
         self.calc_SMC_crc(self.list)
         self.io_properties, self.io_prop_keys = self.get_io_properties()
-        self._serial = await self.get_serial()
-        await self.cleanup_descriptions()
+        self._serial = serial
         self.check_firmware()
 
-        self.logger.debug(f"Module {self._name} at {self._id} initialized")
+    async def reconcile(self) -> bool:
+        """Read mirror of restored module, re-read list if crc differs.
+
+        Returns True if mirror or list of snapshot was outdated.
+        """
+        smg_crc = self.smg_crc
+        smc_crc = self.get_smc_crc()  # crc of restored list
+        await self.hdlr.get_module_status(self._id)
+        self.parse_status()
+        if self.get_smc_crc() != smc_crc:
+            self.list = await self.read_module_list()
+            self.calc_SMC_crc(self.list)
+            self.io_properties, self.io_prop_keys = self.get_io_properties()
+            return True
+        return self.smg_crc != smg_crc
+
+    async def read_module_list(self) -> bytes:
+        """Return SMC list from cache if crc of mirror matches, else read it."""
+        serial = (
+            self.status[MirrIdx.MOD_SERIAL : MirrIdx.MOD_SERIAL + 16]
+            .decode("iso8859-1")
+            .strip()
+        )
+        smc_crc = self.get_smc_crc()
+        smc_cache = self.get_rtr().get_smc_cache()
+        smc_list = smc_cache.get(self._id, serial, smc_crc)
+        if smc_list is not None:
+            self.logger.debug(f"SMC list of module {self._id} taken from cache")
+            return smc_list
+        smc_list = await self.hdlr.get_module_list(self._id)
+        if calc_crc(smc_list) == smc_crc:
+            # Module crc is reliable, use cache at next start
+            smc_cache.put(self._id, serial, smc_crc, smc_list)
+        return smc_list
+
+    def phase_done(self, phase: str, t_phase: float) -> float:
+        """Store duration of initialization phase, return start time of next one."""
+        t_now = time.monotonic()
+        self.init_times[phase] = t_now - t_phase
+        return t_now
 
     async def get_serial(self):
         """Get serial no from status, if not available, generate and set."""
@@ -126,10 +194,53 @@ class HbtnModule:
             + self.status[MirrIdx.SMC_CRC + 2 :]
         )
 
+    @property
+    def status(self) -> bytes:
+        """Full mirror, holds module settings."""
+        return self._status
+
+    @status.setter
+    def status(self, new_status: bytes) -> None:
+        """Store full mirror, also into row of router status matrix and journal."""
+        self.api_srv.status_journal.record(
+            self.rt_id, self._id, self._status, new_status
+        )
+        if new_status != self._status:
+            self._settings_cache = None
+        self._status = new_status
+        self.attach_status()
+        self.stat_matrix.write(self._stat_row, new_status)
+
+    @property
+    def list(self) -> bytes:
+        """SMC list, holds names and automations."""
+        return self._list
+
+    @list.setter
+    def list(self, new_list: bytes) -> None:
+        """Store SMC list, cached settings outdated if changed."""
+        if new_list != self._list:
+            self._settings_cache = None
+        self._list = new_list
+
+    def attach_status(self) -> None:
+        """Take row of router status matrix, if not done yet."""
+        if self._stat_row is None:
+            self.stat_matrix = self.get_rtr().stat_matrix
+            self._stat_row = self.stat_matrix.attach()
+
+    def release_status(self) -> None:
+        """Free row of router status matrix, if module gets removed."""
+        if self._stat_row is not None:
+            self.stat_matrix.release(self._stat_row)
+            self._stat_row = None
+
     def get_status(self, direct: bool) -> bytes:
         """Return status, if direct == False: compacted."""
         if direct:
             return self.status
+        if self._stat_row is not None:
+            return bytes(self.stat_matrix.comp_view(self._stat_row))
         compact_status = b""
         for i0, i1 in CStatBlkIdx:
             compact_status += self.status[i0:i1]
@@ -195,179 +306,32 @@ class HbtnModule:
             self.logger.info("Firmware upload to router failed, update terminated")
         await self.api_srv.block_network_if(rtr._id, False)
 
-    def swap_mirr_cover_idx(self, mirr_idx: int) -> int:
-        """Return cover index from mirror index (0..2 -> 2..4)."""
-        cvr_idx = mirr_idx
-        if self._typ[0] != 1:
-            return cvr_idx
-        cvr_idx += 2
-        if cvr_idx > 4:
-            cvr_idx -= 5
-        return cvr_idx
-
-    def compare_status(
-        self, stat1: bytes, stat2: bytes, diff_idx: list[int], idx: int
-    ) -> list[int]:
-        """Find updates fields."""
-        for x, y in zip(stat1, stat2):
-            if x != y:
-                diff_idx.append(idx)
-            idx += 1
-        return diff_idx
-
     def update_status(self, new_status: bytes):
         """Saves new mirror status and returns differences."""
 
         if self.status == new_status:
             return []
-        block_list = []
+        if (self.decoder is None) or (self.decoder.typ != self._typ):
+            self.decoder = get_decoder(self._typ, self._type)
         update_info = []
-        i_diff = []
-
-        # print(f"Module update {self._id}")
-        if self._type in [
-            "Smart Nature",
-            "Smart GSM",
-            "FanM-Bus",
-            "Smart In 8/24V",
-            "Smart In 8/230V",
-            "Fanekey",
-        ]:
-            pass  # Don't track update changes for these modules
-        else:
-            if self._type in ["Smart In 8/24V-1"]:
-                i0 = MirrIdx.AD_1
-                i1 = MirrIdx.DISPL_CONTR + 1
-            elif self._type in [
-                "Smart Detect 180",
-                "Smart Detect 180-2",
-                "Smart Detect 360",
-            ]:
-                i0 = MirrIdx.LUM
-                i1 = MirrIdx.MOV + 1
-            elif self._type in [
-                "Smart Out 8/R",
-                "Smart Out 8/R-1",
-                "Smart Out 8/R-2",
-                "Smart Out 8/T",
-            ]:
-                block_list = [
-                    MirrIdx.LUM,
-                    MirrIdx.TEMP_ROOM,
-                    MirrIdx.TEMP_PWR,
-                    MirrIdx.TEMP_EXT,
-                ]
-                i0 = MirrIdx.DIM_1
-                i1 = MirrIdx.T_SHORT  # includes BLAD_POS
-            else:  # Controller modules
-                block_list = [
-                    MirrIdx.HUM,
-                    MirrIdx.AQI,
-                    MirrIdx.LUM,
-                    MirrIdx.TEMP_ROOM,
-                    MirrIdx.TEMP_PWR,
-                    MirrIdx.TEMP_EXT,
+        for i_d, ev_type, idv, val, ev_str in self.decoder.diff(
+            self.status, new_status
+        ):
+            if ev_type == HA_EVENTS.MODE:
+                idv = self.get_group()
+            update_info.append(
+                [
+                    self._id,
+                    ev_type,
+                    idv,
+                    val,
                 ]
-                ia0 = MirrIdx.AD_1
-                ia1 = MirrIdx.AD_2 + 1
-                im0 = MirrIdx.MODE
-                im1 = MirrIdx.MODE + 1
-                i0 = MirrIdx.DIM_1
-                i1 = MirrIdx.T_SHORT
-                i2 = MirrIdx.LOGIC
-                i3 = MirrIdx.FLAG_LOC + 2
-                i_diff = self.compare_status(
-                    self.status[i2:i3], new_status[i2:i3], i_diff, i2
-                )
-                i_diff = self.compare_status(
-                    self.status[im0:im1], new_status[im0:im1], i_diff, im0
-                )
-                i_diff = self.compare_status(
-                    self.status[ia0:ia1], new_status[ia0:ia1], i_diff, ia0
-                )
-            i_diff = self.compare_status(
-                self.status[i0:i1], new_status[i0:i1], i_diff, i0
             )
-            for i_d in i_diff:
-                if i_d not in block_list:
-                    ev_type = 0
-                    ev_str = "-"
-                    val = new_status[i_d]
-                    if i_d in range(MirrIdx.MODE, MirrIdx.MODE + 1):
-                        ev_type = HA_EVENTS.MODE
-                        ev_str = "Mode"
-                        idv = self.get_group()
-                    elif i_d in range(MirrIdx.MOV, MirrIdx.MOV + 1):
-                        ev_type = HA_EVENTS.MOVE
-                        ev_str = "Movement"
-                        idv = 0
-                    elif i_d in range(MirrIdx.COVER_POS, MirrIdx.COVER_POS + 8):
-                        ev_type = HA_EVENTS.COV_VAL
-                        idv = self.swap_mirr_cover_idx(i_d - MirrIdx.COVER_POS)
-                        ev_str = f"Cover {idv + 1} pos"
-                    elif i_d in range(MirrIdx.BLAD_POS, MirrIdx.BLAD_POS + 8):
-                        ev_type = HA_EVENTS.BLD_VAL
-                        idv = self.swap_mirr_cover_idx(i_d - MirrIdx.BLAD_POS)
-                        ev_str = f"Blade {idv + 1} pos"
-                    elif i_d in range(MirrIdx.DIM_1, MirrIdx.DIM_4 + 1):
-                        ev_type = HA_EVENTS.DIM_VAL
-                        idv = i_d - MirrIdx.DIM_1
-                        ev_str = f"Dimmmer {idv + 1}"
-                    elif i_d in range(MirrIdx.FLAG_LOC, MirrIdx.FLAG_LOC + 2):
-                        ev_type = HA_EVENTS.FLAG
-                        old_val = self.status[i_d]
-                        new_val = new_status[i_d]
-                        chg_msk = old_val ^ new_val
-                        val = new_val & chg_msk
-                        for i in range(8):
-                            if (chg_msk & (1 << i)) > 0:
-                                break
-                        idv = 1 << i
-                        if idv != chg_msk:
-                            # more than one flag changed, return mask and byte
-                            idv = chg_msk + 1000
-                            if i_d > MirrIdx.FLAG_LOC:  # upper byte
-                                idv = idv + 1000
-                        else:
-                            # single change, return flag no and value 0/1
-                            idv = i
-                            if i_d > MirrIdx.FLAG_LOC:  # upper byte
-                                idv = idv + 8
-                            val = int(val > 0)
-                        ev_str = f"Flag {idv + 1}"
-                    elif i_d in range(MirrIdx.COUNTER_VAL, MirrIdx.COUNTER_VAL + 28):
-                        ev_type = HA_EVENTS.CNT_VAL
-                        idv = int((i_d - MirrIdx.COUNTER_VAL) / 3)
-                        ev_str = f"Counter {idv + 1}"
-                    elif i_d in range(MirrIdx.AD_1, MirrIdx.AD_2 + 1):
-                        ev_type = HA_EVENTS.ANLG_VAL
-                        idv = i_d - MirrIdx.AD_1
-                        ev_str = f"Analog in {idv + 1}"
-                    elif i_d in range(MirrIdx.GEN_1, MirrIdx.GEN_2 + 1):
-                        if self._typ == b"\x0b\x1f":
-                            ev_type = HA_EVENTS.ANLG_VAL
-                            idv = i_d - MirrIdx.GEN_1 + 2
-                            ev_str = f"Analog in {idv + 1}"
-                    elif i_d in range(MirrIdx.GEN_3, MirrIdx.GEN_4 + 1):
-                        if self._typ == b"\x0b\x1f":
-                            ev_type = HA_EVENTS.ANLG_VAL
-                            idv = i_d - MirrIdx.GEN_3 + 4
-                            ev_str = f"Analog in {idv + 1}"
-                    if ev_type > 0:
-                        update_info.append(
-                            [
-                                self._id,
-                                ev_type,
-                                idv,
-                                val,
-                            ]
-                        )
-                        self.logger.debug(
-                            f"Update in module status {self._id}: {self._name}: Event {ev_str}, Byte {i_d} - new: {val}"
-                        )
+            self.logger.debug(
+                f"Update in module status {self._id}: {self._name}: Event {ev_str}, Byte {i_d} - new: {val}"
+            )
         if len(new_status) > 100:
             self.status = new_status
-            self.comp_status = self.get_status(False)
         else:
             self.comp_status = new_status
         self.logger.debug(f"Status of module {self._id} updated")
@@ -510,8 +474,19 @@ class HbtnModule:
         return self.smg_crc
 
     def get_module_settings(self):
-        """Collect all settings and prepare for config server."""
-        self.settings = ModuleSettings(self)
+        """Return copy-on-write settings for config server, parsed once per crcs."""
+        rtr = self.get_rtr()
+        key = (
+            self.smg_crc,
+            self.get_smc_crc(),
+            self.get_group(),  # router setting, not in status or list
+            rtr.descriptions,
+            rtr.user_modes,
+        )
+        if (self._settings_cache is None) or (key != self._settings_key):
+            self._settings_cache = ModuleSettings(self)
+            self._settings_key = key
+        self.settings = ModuleSettingsCopy(self._settings_cache)
         return self.settings
 
     def get_settings_def(self):
@@ -528,7 +503,6 @@ class HbtnModule:
         if not self.api_srv.is_offline:
             await self.hdlr.send_module_smg(self._id)
             await self.hdlr.send_module_list(self._id)
-        self.comp_status = self.get_status(False)
         self.calc_SMG_crc(self.build_smg())
         self.calc_SMC_crc(self.list)
         self._name = (
@@ -546,7 +520,6 @@ class HbtnModule:
         self.list_upload = self.list
         if not self.api_srv.is_offline:
             await self.hdlr.send_module_list(self._id)
-        self.comp_status = self.get_status(False)
         # self.list = await self.hdlr.get_module_list(self._id)
         self.calc_SMC_crc(self.list)
 
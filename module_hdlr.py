@@ -3,6 +3,7 @@ import asyncio
 from math import ceil
 from const import MirrIdx, SMGIdx, RT_CMDS
 from hdlr_class import HdlrBase
+from rt_templates import RT_TMPL
 
 
 class ModHdlr(HdlrBase):
@@ -54,49 +55,51 @@ class ModHdlr(HdlrBase):
     async def send_module_smg(self, mod_addr: int):
         """Send SMG data from Smart Hub to router/module."""
         await self.api_srv.set_server_mode()
-        await self.set_module_name()
-        await self.set_buttons_times()
-        if int(self.mod._typ[0]) in [1, 0x32, 0x0B]:
-            # input related settings
-            await self.set_inputs_mode()
-            await self.set_analog_inputs()
-        if int(self.mod._typ[0]) in [1, 0x0A]:
-            # output related settings
-            await self.set_logic_units()
-            if self.mod._typ == "\x0a\x16":
-                # dimm module specific settings
+        # Settings commands are independent, send them pipelined
+        async with self.router_cmd_batch():
+            await self.set_module_name()
+            await self.set_buttons_times()
+            if int(self.mod._typ[0]) in [1, 0x32, 0x0B]:
+                # input related settings
+                await self.set_inputs_mode()
+                await self.set_analog_inputs()
+            if int(self.mod._typ[0]) in [1, 0x0A]:
+                # output related settings
+                await self.set_logic_units()
+                if self.mod._typ == "\x0a\x16":
+                    # dimm module specific settings
+                    await self.set_dimm_speed()
+                    await self.set_dimm_modes()
+                else:
+                    await self.set_covers_settings()
+                    await self.set_covers_times()
+                    await self.set_blinds_times()
+            if int(self.mod._typ[0]) in [1, 0x32, 0x50]:
+                # motion related settings
+                await self.set_motion_detection()
+            if int(self.mod._typ[0]) in [1, 0x32]:
+                # Smart Controller specific settings
+                await self.set_module_language()
+                await self.set_target_values()
+                await self.set_climate_settings()
+                await self.set_display_constrast()
+                await self.set_temp_control()
+            if int(self.mod._typ[0]) in [1]:
+                # Smart Controller XL specific settings
                 await self.set_dimm_speed()
                 await self.set_dimm_modes()
-            else:
-                await self.set_covers_settings()
-                await self.set_covers_times()
-                await self.set_blinds_times()
-        if int(self.mod._typ[0]) in [1, 0x32, 0x50]:
-            # motion related settings
-            await self.set_motion_detection()
-        if int(self.mod._typ[0]) in [1, 0x32]:
-            # Smart Controller specific settings
-            await self.set_module_language()
-            await self.set_target_values()
-            await self.set_climate_settings()
-            await self.set_display_constrast()
-            await self.set_temp_control()
-        if int(self.mod._typ[0]) in [1]:
-            # Smart Controller XL specific settings
-            await self.set_dimm_speed()
-            await self.set_dimm_modes()
-            await self.set_supply_prio()
-            await self.set_module_light()
-            await self.set_limit_temperature()
-        if self.mod._typ == b"\x1e\x01":
-            # Ekey specific settings
-            await self.set_ekey_version()
-        if self.mod._typ == b"\x1e\x03":
-            # GSM specific settings
-            if self.mod.settings.sim_pin_changed:
-                self.logger.info(f"Changed SIM Pin: {self.mod.settings.sim_pin}")
-                # await self.set_pin()
-            await self.set_logic_units()
+                await self.set_supply_prio()
+                await self.set_module_light()
+                await self.set_limit_temperature()
+            if self.mod._typ == b"\x1e\x01":
+                # Ekey specific settings
+                await self.set_ekey_version()
+            if self.mod._typ == b"\x1e\x03":
+                # GSM specific settings
+                if self.mod.settings.sim_pin_changed:
+                    self.logger.info(f"Changed SIM Pin: {self.mod.settings.sim_pin}")
+                    # await self.set_pin()
+                await self.set_logic_units()
         await self.api_srv.set_operate_mode()
 
     async def get_module_list(self, mod_addr: int) -> bytes:
@@ -107,11 +110,8 @@ class ModHdlr(HdlrBase):
         area = 50
         cnt = 1
         smc_buffer = b""
-        rt_command = (
-            RT_CMDS.GET_MOD_SMC.replace("<rtr>", chr(self.rt_id))
-            .replace("<mod>", chr(mod_addr))
-            .replace("<area>", chr(area))
-            .replace("<pckg>", chr(pckg))
+        rt_command = RT_TMPL.GET_MOD_SMC.build(
+            self.rt_id, mod=mod_addr, area=area, pckg=pckg
         )
         # Send command to router
         await self.handle_router_cmd_resp(self.rt_id, rt_command)
@@ -123,28 +123,36 @@ class ModHdlr(HdlrBase):
             smc_buffer += resp[1:]
             len_SMC_file = int.from_bytes(resp[3:5], "little")
             pckg_cnt = int(ceil(len_SMC_file / 31))
+            # Remaining packages are known in advance, request them pipelined
+            pckgs = []
+            pckg = resp[0]
             while cnt < pckg_cnt:
                 cnt += 1
-                pckg = resp[0]
-                pckg += 1
+                pckg = (pckg + 1) & 0xFF
                 if pckg == 0:
                     area += 1
                 if area == 100:
                     self.logger.error("Content of module will be deleted!")
-                rt_command = (
-                    RT_CMDS.GET_MOD_SMC.replace("<rtr>", chr(self.rt_id))
-                    .replace("<mod>", chr(mod_addr))
-                    .replace("<area>", chr(area))
-                    .replace("<pckg>", chr(pckg))
+                pckgs.append((area, pckg))
+            rt_commands = [
+                RT_TMPL.GET_MOD_SMC.build(
+                    self.rt_id, mod=mod_addr, area=area, pckg=pckg
                 )
-                # Send command to router
-                await self.handle_router_cmd_resp(self.rt_id, rt_command)
-                resp = self.rt_msg._resp_msg
-                if resp[0] == pckg:
-                    smc_buffer += resp[1:]
-                else:
+                for area, pckg in pckgs
+            ]
+            rt_msgs = await self.handle_router_cmds_resp(self.rt_id, rt_commands)
+            for rt_command, (area, pckg), rt_msg in zip(rt_commands, pckgs, rt_msgs):
+                resp = rt_msg._resp_msg
+                retry = 3
+                while (resp[0] != pckg) and (retry > 0):
                     self.logger.debug(f"SMC package {resp[0]} read again, discarded")
-                    cnt -= 1
+                    await self.handle_router_cmd_resp(self.rt_id, rt_command)
+                    resp = self.rt_msg._resp_msg
+                    retry -= 1
+                if resp[0] != pckg:
+                    self.logger.error(f"SMC package {pckg} of module {mod_addr} not read")
+                    break
+                smc_buffer += resp[1:]
         return smc_buffer
 
     async def send_module_list(self, mod_addr: int):
@@ -157,20 +165,19 @@ class ModHdlr(HdlrBase):
         l_len = len(mod_list)
         no_lines = int.from_bytes(mod_list[0:2], "little")
         l_cnt = 0
-        flg = chr(6)
+        flg = 6
         cnt = 1
         while l_cnt < l_len:
             l_pckg = mod_list[l_cnt : l_cnt + min(12, l_len - l_cnt)]
             l_p = len(l_pckg)
-            cmd = (
-                RT_CMDS.SEND_MOD_SMC.replace("<rtr>", chr(self.rt_id))
-                .replace("<mod>", chr(mod_addr))
-                .replace("<len>", chr(l_p + 10))
-                .replace("<l4>", chr(l_p + 6))
+            cmd = RT_TMPL.SEND_MOD_SMC.build(
+                self.rt_id,
+                bytes([flg, cnt]) + l_pckg + b"\xff",
+                mod=mod_addr,
+                l4=l_p + 6,
             )
-            cmd += flg + chr(cnt) + l_pckg.decode("iso8859-1") + "\xff"
             await self.handle_router_cmd_resp(self.rt_id, cmd)
-            flg = chr(7)
+            flg = 7
             resp_cnt = self.rt_msg._resp_buffer[-2]
             resp_flg = self.rt_msg._resp_buffer[8]
             if resp_cnt == cnt:
@@ -187,10 +194,10 @@ class ModHdlr(HdlrBase):
                     f"List upload (SMC) returned unexpected flag, repeat flag 6 or 7: Count {resp_cnt} Flag {resp_flg}"
                 )
                 if not flg_250:
-                    flg = chr(6)  # first time: retry with flag 6
+                    flg = 6  # first time: retry with flag 6
                     flg_250 = True
                 else:
-                    flg = chr(7)  # retry with flag 7
+                    flg = 7  # retry with flag 7
                     flg_250 = False
             elif resp_flg == 255:
                 self.logger.error(
@@ -1,6 +1,9 @@
+import asyncio
+from bisect import bisect
 from glob import glob
+import time
 from messages import calc_crc
-from os.path import isfile
+from os.path import isdir, isfile
 from config_commons import is_outdated
 from const import (
     RT_STAT_CODES,
@@ -9,12 +12,40 @@ from const import (
     FW_FILES_DIR,
     MODULE_CODES,
     RT_CMDS,
+    RT_INIT_PARALLEL,
+    RT_INIT_RETRY_DELAYS,
+    SMC_CACHE_FILE,
     MirrIdx,
+    MStatIdx,
 )
 from router_hdlr import RtHdlr
 from module import HbtnModule
 from module_hdlr import ModHdlr
 from configuration import RouterSettings
+from smc_cache import SmcCache
+from serial_arbiter import operate_reads
+from status_matrix import StatusMatrix
+
+# Router attributes of warm start snapshot, read from router at cold start
+RTR_SNAPSHOT_FIELDS = (
+    "status",
+    "status_idx",
+    "chan_status",
+    "channels",
+    "timeout",
+    "groups",
+    "mode_dependencies",
+    "name",
+    "_name",
+    "user_modes",
+    "serial",
+    "day_night",
+    "version",
+    "_version",
+    "date",
+    "grp_mode_status",
+    "descriptions",
+)
 
 
 class HbtnRouter:
@@ -30,10 +61,15 @@ class HbtnRouter:
         self.logger = api_srv.logger
         self.status = b""
         self.status_upload = b""
-        self.chan_status = b""
+        self._chan_status = b""
         self.status_idx = []
         self.mod_addrs = []
         self.modules = []
+        self.stat_matrix = StatusMatrix()
+        self.init_stats: dict[str, float] = {}
+        self.retry_task: asyncio.Task | None = None
+        self.reconcile_task: asyncio.Task | None = None
+        self.smc_cache: SmcCache | None = None
         self.hdlr = RtHdlr(self, self.api_srv)
         self.descriptions: str = ""
         self.smr: bytes = b""
@@ -122,6 +158,7 @@ class HbtnRouter:
         """Startup procedure: wait for router #1, get router info, start modules."""
         from module_hdlr import ModHdlr
 
+        self.cancel_init_tasks()
         await self.hdlr.waitfor_rt_booted()
         modules = await self.get_full_status()
         self.load_descriptions()
@@ -131,28 +168,219 @@ class HbtnRouter:
         for m_idx in range(modules[0]):
             self.mod_addrs.append(modules[m_idx + 1])
         self.mod_addrs.sort()
-        mods_to_remove = []
         for mod_addr in self.mod_addrs:
+            self.modules.append(
+                HbtnModule(
+                    mod_addr,
+                    self.get_channel(mod_addr),
+                    self._id,
+                    ModHdlr(mod_addr, self.api_srv),
+                    self.api_srv,
+                )
+            )
+            # Rows in address order, before concurrent initialization
+            self.modules[-1].attach_status()
+            self.logger.debug(f"   Module {mod_addr} instantiated")
+        failed_mods = await self.init_modules(self.modules)
+        for mod in failed_mods:
+            self.modules.remove(mod)
+            self.mod_addrs.remove(mod._id)
+            self.logger.warning(f"   Module {mod._id} removed, retried later")
+        if failed_mods:
+            self.retry_task = self.api_srv.loop.create_task(
+                self.retry_modules(failed_mods), name="mod_init_retry"
+            )
+
+    async def init_modules(self, modules: list[HbtnModule]) -> list[HbtnModule]:
+        """Initialize modules concurrently within router capacity, return failures."""
+        slots = asyncio.Semaphore(RT_INIT_PARALLEL)
+
+        async def init_module(mod: HbtnModule) -> bool:
+            async with slots:
+                try:
+                    await mod.initialize()
+                    self.logger.info(f"   Module {mod._id} initialized")
+                    return True
+                except Exception as err_msg:
+                    self.logger.error(f"   Failed to setup module {mod._id}: {err_msg}")
+                    return False
+
+        t_start = time.monotonic()
+        results = await asyncio.gather(*[init_module(mod) for mod in modules])
+        self.get_smc_cache().save()
+        self.init_stats = {"total": time.monotonic() - t_start}
+        for mod in modules:
+            for phase, t_phase in mod.init_times.items():
+                self.init_stats[phase] = self.init_stats.get(phase, 0.0) + t_phase
+        phases_str = ", ".join(
+            f"{phase} {t_phase:.2f} s"
+            for phase, t_phase in self.init_stats.items()
+            if phase != "total"
+        )
+        self.logger.info(
+            f"   {len(modules)} modules set up in {self.init_stats['total']:.2f} s, phases summed up: {phases_str}"
+        )
+        self.logger.info(f"   SMC list cache: {self.get_smc_cache().get_stats()}")
+        return [mod for mod, ok in zip(modules, results) if not ok]
+
+    def insert_module(self, mod: HbtnModule) -> None:
+        """Add initialized module to router lists in address order."""
+        idx = bisect(self.mod_addrs, mod._id)
+        self.mod_addrs.insert(idx, mod._id)
+        self.modules.insert(idx, mod)
+
+    def get_snapshot(self) -> tuple[dict, list[dict]]:
+        """Return router and module records for warm start snapshot."""
+        rtr_rec = {
+            field: getattr(self, field)
+            for field in RTR_SNAPSHOT_FIELDS
+            if hasattr(self, field)
+        }
+        mod_recs = [
+            {
+                "_id": mod._id,
+                "_channel": mod._channel,
+                "status": mod.status,
+                "list": mod.list,
+                "_serial": mod._serial,
+            }
+            for mod in self.modules
+        ]
+        return rtr_rec, mod_recs
+
+    def restore_snapshot(self, rtr_rec: dict, mod_recs: list[dict]) -> None:
+        """Set up router and modules from snapshot, without router access."""
+        for field, val in rtr_rec.items():
+            if field in RTR_SNAPSHOT_FIELDS:
+                setattr(self, field, val)
+        self.build_channel_list()
+        self.build_smr()
+        self.check_firmware()
+        self.get_router_settings()
+        for rec in mod_recs:
             try:
-                self.modules.append(
-                    HbtnModule(
-                        mod_addr,
-                        self.get_channel(mod_addr),
-                        self._id,
-                        ModHdlr(mod_addr, self.api_srv),
-                        self.api_srv,
-                    )
+                mod = HbtnModule(
+                    rec["_id"],
+                    rec["_channel"],
+                    self._id,
+                    ModHdlr(rec["_id"], self.api_srv),
+                    self.api_srv,
                 )
-                self.logger.debug(f"   Module {mod_addr} instantiated")
-                await self.modules[-1].initialize()
-                self.logger.info(f"   Module {mod_addr} initialized")
+                mod.attach_status()
+                mod.restore(rec["status"], rec["list"], rec["_serial"])
             except Exception as err_msg:
-                self.logger.error(f"   Failed to setup module {mod_addr}: {err_msg}")
-                self.modules.remove(self.modules[-1])
-                mods_to_remove.append(mod_addr)
-                self.logger.warning(f"   Module {mod_addr} removed")
-        for mod_addr in mods_to_remove:
-            self.mod_addrs.remove(mod_addr)
+                self.logger.warning(
+                    f"   Module {rec.get('_id')} not restored, checked later: {err_msg}"
+                )
+                continue
+            self.modules.append(mod)
+            self.mod_addrs.append(mod._id)
+        self.logger.info(f"   Router and {len(self.modules)} modules restored")
+
+    async def reconcile_snapshot(self) -> None:
+        """Background check of restored router and modules against the bus.
+
+        Runs in operate mode, reads go through the serial arbiter while events flow.
+        """
+        operate_reads.set(True)  # context of this task only
+        t_start = time.monotonic()
+        outdated = []
+        failed_mods = []
+        modules = await self.get_full_status()
+        bus_addrs = sorted(modules[1 : modules[0] + 1])
+        for mod in [mod for mod in self.modules if mod._id not in bus_addrs]:
+            mod.release_status()
+            self.modules.remove(mod)
+            self.mod_addrs.remove(mod._id)
+            self.logger.warning(f"   Module {mod._id} of snapshot removed")
+        for mod in list(self.modules):
+            try:
+                if await mod.reconcile():
+                    outdated.append(mod._id)
+            except Exception as err_msg:
+                self.logger.error(f"   Failed to check module {mod._id}: {err_msg}")
+        new_mods = [
+            HbtnModule(
+                mod_addr,
+                self.get_channel(mod_addr),
+                self._id,
+                ModHdlr(mod_addr, self.api_srv),
+                self.api_srv,
+            )
+            for mod_addr in bus_addrs
+            if mod_addr not in self.mod_addrs
+        ]
+        if new_mods:
+            failed_mods = await self.init_modules(new_mods)
+        self.get_smc_cache().save()
+        for mod in new_mods:
+            if mod not in failed_mods:
+                self.insert_module(mod)
+                self.logger.info(f"   Module {mod._id} added, missing in snapshot")
+        if failed_mods:
+            self.retry_task = self.api_srv.loop.create_task(
+                self.retry_modules(failed_mods), name="mod_init_retry"
+            )
+        self.logger.info(
+            f"Snapshot checked in {time.monotonic() - t_start:.2f} s, outdated modules: {outdated}"
+        )
+
+    def get_smc_cache(self) -> SmcCache:
+        """Return cache of module SMC lists, loaded on first use."""
+        if self.smc_cache is None:
+            if self.api_srv.is_addon and isdir(DATA_FILES_ADDON_DIR):
+                file_path = DATA_FILES_ADDON_DIR
+            else:
+                file_path = DATA_FILES_DIR
+            self.smc_cache = SmcCache(file_path + f"Rtr_{self._id}_{SMC_CACHE_FILE}")
+        return self.smc_cache
+
+    async def retry_modules(self, failed_mods: list[HbtnModule]) -> None:
+        """Background task, retry initialization of failed modules and add them."""
+        operate_reads.set(True)  # context of this task only
+        try:
+            for delay in RT_INIT_RETRY_DELAYS:
+                await asyncio.sleep(delay)
+                while self.api_srv._init_mode:
+                    await asyncio.sleep(1)
+                retry_mods = failed_mods
+                failed_mods = await self.init_modules(retry_mods)
+                for mod in retry_mods:
+                    if mod in failed_mods:
+                        continue
+                    self.insert_module(mod)
+                    self.logger.info(f"Module {mod._id} added after retry")
+                if not failed_mods:
+                    return
+            self.logger.error(
+                f"Modules {[mod._id for mod in failed_mods]} failed to initialize, giving up"
+            )
+        except asyncio.CancelledError:
+            self.logger.debug("Retry of failed modules cancelled")
+            raise
+        finally:
+            for mod in failed_mods:
+                if mod not in self.modules:
+                    mod.release_status()
+
+    def cancel_init_tasks(self) -> None:
+        """Stop background initialization of modules, before modules are set up again."""
+        for task in [self.retry_task, self.reconcile_task]:
+            if (task is not None) and not task.done():
+                task.cancel()
+        self.retry_task = None
+        self.reconcile_task = None
+
+    @property
+    def chan_status(self) -> bytes:
+        """Channel status of router."""
+        return self._chan_status
+
+    @chan_status.setter
+    def chan_status(self, new_status: bytes) -> None:
+        """Store channel status, record change in status journal."""
+        self.api_srv.status_journal.record(self._id, 0, self._chan_status, new_status)
+        self._chan_status = new_status
 
     async def get_status(self) -> bytes:
         """Returns router channel status"""
@@ -160,6 +388,17 @@ class HbtnRouter:
         self.chan_status = await self.hdlr.get_rt_status()
         return self.chan_status
 
+    def get_modules_status(self, mod_list: list[int], direct: bool) -> bytes:
+        """Return full or compact status of modules, each with preceding length byte."""
+        rows = [self.get_module(md)._stat_row for md in mod_list]  # type: ignore
+        if None in rows:
+            return b"".join(
+                bytes([MirrIdx.END if direct else MStatIdx.END])
+                + self.get_module(md).get_status(direct)  # type: ignore
+                for md in mod_list
+            )
+        return bytes(self.stat_matrix.read(rows, direct))  # type: ignore
+
     def get_module(self, mod_id: int) -> HbtnModule | None:
         """Return module object."""
         md_idx = self.mod_addrs.index(mod_id)
@@ -192,6 +431,15 @@ class HbtnRouter:
             mod_list.append(Mdle(mod._id, mod._typ, mod._name, mod.get_sw_version()))
         return mod_list
 
+    def build_channel_list(self) -> None:
+        """Build lists of module addresses per channel from channels."""
+        ptr = 1
+        for ch_i in range(4):
+            self.channel_list[ch_i + 1] = []
+            for mod_i in range(self.channels[ptr]):
+                self.channel_list[ch_i + 1].append(int(self.channels[ptr + 1 + mod_i]))
+            ptr += self.channels[ptr] + 2
+
     def get_channel(self, mod_addr: int) -> int:
         """Return router channel of module."""
         for ch_i in range(4):
@@ -238,7 +486,7 @@ class HbtnRouter:
 
     async def set_config_mode(self, set_not_reset: bool) -> None:
         """Switches to config mode and back."""
-        if self.api_srv._init_mode:
+        if self.api_srv._init_mode or operate_reads.get():
             return
         if set_not_reset:
             if not self.api_srv._opr_mode:
@@ -505,6 +753,7 @@ class HbtnRouter:
 
         mod = self.get_module(mod_addr)
         md_chan = mod._channel  # type: ignore
+        mod.release_status()  # type: ignore
         self.modules.remove(mod)
         self.mod_addrs.remove(mod_addr)
         # remove entry from channel list
@@ -567,6 +816,7 @@ class HbtnRouter:
         for m_ser in rm_list:
             # remove in second loop to not change order in fist loop
             mod = self.get_module_by_serial(m_ser)
+            mod.release_status()  # type: ignore
             self.modules.remove(mod)
         # prepare channels byte string from channel list
         for ch_i in range(1, 5):
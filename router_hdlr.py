@@ -9,6 +9,7 @@ from const import (
 )
 from hdlr_class import HdlrBase
 from messages import RtMessage, RtResponse
+from rt_templates import RT_TMPL
 from collections.abc import Awaitable, Callable
 
 
@@ -103,8 +104,7 @@ class RtHdlr(HdlrBase):
             self.logger.warning(
                 f"Response to get mode {group} command too long: {self.rt_msg._resp_buffer}"
             )
-            if (b_len := len(self.ser_if[0]._buffer)) > 0:
-                await self.ser_if[0].read(b_len)  # empty buffer
+            self.api_srv.rt_arbiter.flush()  # empty buffer
             other_responses = True
             while other_responses:
                 await self.handle_router_cmd_resp(self.rt_id, rt_cmd)
@@ -122,14 +122,7 @@ class RtHdlr(HdlrBase):
             # switch to Srv mode made without response, may be still in buffer
             await self.handle_router_resp(self.rt_id)
         self.rtr.channels = self.rt_msg._resp_msg
-        ptr = 1
-        for ch_i in range(4):
-            self.rtr.channel_list[ch_i + 1] = []
-            for mod_i in range(self.rtr.channels[ptr]):
-                self.rtr.channel_list[ch_i + 1].append(
-                    int(self.rtr.channels[ptr + 1 + mod_i])
-                )
-            ptr += self.rtr.channels[ptr] + 2
+        self.rtr.build_channel_list()
         return self.rtr.channels
 
     async def get_rt_timeout(self) -> bytes:
@@ -214,44 +207,62 @@ class RtHdlr(HdlrBase):
         #     1, RT_CMDS.SET_GLOB_MODE.replace("<md>", chr(75))
         # )
         await asyncio.sleep(0.3)
-        stat_idx = [0]
-        rt_stat = chr(self.rt_id).encode()
-        stat_idx.append(len(rt_stat))
+        # All getters below are independent, request them pipelined
+        with self.prefetch_router_cmds(
+            self.rt_id,
+            [
+                RT_CMDS.GET_RT_CHANS,
+                RT_CMDS.GET_RT_TIMEOUT,
+                RT_CMDS.GET_RT_GRPNO,
+                RT_CMDS.GET_RT_GRPMODE_DEP,
+                RT_CMDS.GET_RT_NAME,
+                RT_CMDS.GET_RT_MODENAM.replace("<umd>", "\x01"),
+                RT_CMDS.GET_RT_MODENAM.replace("<umd>", "\x02"),
+                RT_CMDS.GET_RT_SERNO,
+                RT_CMDS.GET_RT_DAYNIGHT,
+                RT_CMDS.GET_RT_SW_VERSION,
+                RT_CMDS.GET_DATE,
+                RT_CMDS.GET_RT_GRPMOD_STAT,
+            ],
+        ):
+            stat_idx = [0]
+            rt_stat = chr(self.rt_id).encode()
+            stat_idx.append(len(rt_stat))
 
-        rt_stat += await self.get_rt_channels()
-        stat_idx.append(len(rt_stat))
+            rt_stat += await self.get_rt_channels()
+            stat_idx.append(len(rt_stat))
 
-        rt_stat += await self.get_rt_timeout()
-        stat_idx.append(len(rt_stat))
+            rt_stat += await self.get_rt_timeout()
+            stat_idx.append(len(rt_stat))
 
-        rt_stat += await self.get_rt_group_no()
-        stat_idx.append(len(rt_stat))
+            rt_stat += await self.get_rt_group_no()
+            stat_idx.append(len(rt_stat))
 
-        rt_stat += await self.get_rt_group_deps()
-        stat_idx.append(len(rt_stat))
+            rt_stat += await self.get_rt_group_deps()
+            stat_idx.append(len(rt_stat))
 
-        rt_stat += await self.get_rt_name()
-        stat_idx.append(len(rt_stat))
+            rt_stat += await self.get_rt_name()
+            stat_idx.append(len(rt_stat))
 
-        rt_stat += await self.get_mode_names()
-        stat_idx.append(len(rt_stat))
+            rt_stat += await self.get_mode_names()
+            stat_idx.append(len(rt_stat))
 
-        rt_stat += await self.get_rt_serial()
-        stat_idx.append(len(rt_stat))
+            rt_stat += await self.get_rt_serial()
+            stat_idx.append(len(rt_stat))
 
-        rt_stat += await self.get_rt_day_night_changes()
-        stat_idx.append(len(rt_stat))
+            rt_stat += await self.get_rt_day_night_changes()
+            stat_idx.append(len(rt_stat))
 
-        rt_stat += await self.get_rt_sw_version()
-        stat_idx.append(len(rt_stat))
+            rt_stat += await self.get_rt_sw_version()
+            stat_idx.append(len(rt_stat))
 
-        rt_stat += await self.get_date()
-        stat_idx.append(len(rt_stat))
+            rt_stat += await self.get_date()
+            stat_idx.append(len(rt_stat))
 
-        rt_stat += await self.get_grp_mode_status()
-        stat_idx.append(len(rt_stat))
-        self.rtr.grp_mode_status = rt_stat[stat_idx[-2] : stat_idx[-1]]
-        self.rtr.status_idx = stat_idx
+            rt_stat += await self.get_grp_mode_status()
+            stat_idx.append(len(rt_stat))
+            self.rtr.grp_mode_status = rt_stat[stat_idx[-2] : stat_idx[-1]]
+            self.rtr.status_idx = stat_idx
 
         return rt_stat
 
@@ -380,6 +391,7 @@ class RtHdlr(HdlrBase):
     async def send_rt_full_status(self) -> None:
         """Send full router status from uploaded smr."""
         self.logger.debug("Starting SMR data transfer into router")
+        self.rtr.cancel_init_tasks()
         smr_ptr = 1
         mod_cnt = []
         mod_cnt.append(self.rtr.smr_upload[1])
@@ -422,12 +434,15 @@ class RtHdlr(HdlrBase):
     def set_rt_full_status(self) -> None:
         """Set full router status locally from uploaded smr."""
         self.logger.debug("Setting SMR data to local router data")
+        self.rtr.cancel_init_tasks()
         smr_ptr = 1
         mod_cnt = []
         mod_cnt.append(self.rtr.smr_upload[1])
         mod_cnt.append(self.rtr.smr_upload[1])
         self.rtr.smr = self.rtr.smr_upload
         rt_channels = b""
+        for mod in self.rtr.modules:
+            mod.release_status()
         self.rtr.modules = []
         self.rtr.mod_addrs = []
         for ch in range(4):
@@ -528,26 +543,15 @@ class RtHdlr(HdlrBase):
             await self.handle_router_cmd_resp(self.rt_id, RT_CMDS.SYSTEM_RESTART)
             self.logger.info("Router restarted")
             return "ERROR"
-        cmd_org = RT_CMDS.UPDATE_RT_PKG
         for pi in range(no_pkgs):
             pkg_low_target = (pi + 1) & 0xFF
             # pkg_high_target = (pi + 1) >> 8
-            if pi < (no_pkgs - 1):
-                cmd_str = (
-                    cmd_org.replace("<len>", chr(pkg_len + 8))
-                    .replace("<pno>", chr(pkg_low_target))
-                    .replace(
-                        "<buf>",
-                        fw_buf[pi * pkg_len : (pi + 1) * pkg_len].decode("iso8859-1"),
-                    )
-                )
-            else:
-                # last package with < pkg_len
-                cmd_str = (
-                    cmd_org.replace("<len>", chr(rest_len + 8))
-                    .replace("<pno>", chr(pkg_low_target))
-                    .replace("<buf>", fw_buf[pi * pkg_len :].decode("iso8859-1"))
-                )
+            # last package may be shorter than pkg_len
+            cmd_str = RT_TMPL.UPDATE_RT_PKG.build(
+                self.rt_id,
+                pno=pkg_low_target,
+                buf=fw_buf[pi * pkg_len : (pi + 1) * pkg_len],
+            )
             await self.handle_router_cmd_resp(self.rt_id, cmd_str)
             resp_code = self.rt_msg._resp_code
             resp_msg = self.rt_msg._resp_buffer[-self.rt_msg._resp_buffer[2] + 4 : -1]
@@ -617,7 +621,6 @@ class RtHdlr(HdlrBase):
 
         fw_buf = self.rtr.fw_upload
         fw_len = len(fw_buf)
-        cmd_org = RT_CMDS.UPDATE_MOD_PKG
         pkg_len = 246
         if fw_len > 0:
             no_pkgs = int(fw_len / pkg_len)
@@ -625,27 +628,15 @@ class RtHdlr(HdlrBase):
             if rest_len > 0:
                 no_pkgs += 1
             for pi in range(no_pkgs):
-                if pi < no_pkgs - 1:
-                    cmd_str = (
-                        cmd_org.replace("<len>", chr(pkg_len + 8))
-                        .replace("<pno>", chr(pi + 1))
-                        .replace("<pcnt>", chr(no_pkgs))
-                        .replace("<blen>", chr(pkg_len))
-                        .replace(
-                            "<buf>",
-                            fw_buf[pi * pkg_len : (pi + 1) * pkg_len].decode(
-                                "iso8859-1"
-                            ),
-                        )
-                    )
-                else:
-                    cmd_str = (
-                        cmd_org.replace("<len>", chr(rest_len + 8))
-                        .replace("<pno>", chr(pi + 1))
-                        .replace("<pcnt>", chr(no_pkgs))
-                        .replace("<blen>", chr(rest_len))
-                        .replace("<buf>", fw_buf[pi * pkg_len :].decode("iso8859-1"))
-                    )
+                # last package may be shorter than pkg_len
+                pkg_buf = fw_buf[pi * pkg_len : (pi + 1) * pkg_len]
+                cmd_str = RT_TMPL.UPDATE_MOD_PKG.build(
+                    self.rt_id,
+                    pno=pi + 1,
+                    pcnt=no_pkgs,
+                    blen=len(pkg_buf),
+                    buf=pkg_buf,
+                )
                 await self.handle_router_cmd_resp(self.rt_id, cmd_str)
                 if self.rt_msg._resp_buffer[5] == RT_STAT_CODES.PKG_OK:
                     await progress_fun(pi + 1, no_pkgs, RT_STAT_CODES.PKG_OK)
@@ -801,6 +792,7 @@ class RtHdlr(HdlrBase):
             self.logger.warning(
                 f"Invalid Operate mode router message crc, message: {resp_msg.resp_data}"
             )
+            self.api_srv.rt_arbiter.metrics.count_crc_error("events")
             return
         if resp_msg.resp_cmd == RT_RESP.MIRR_STAT:
             mod_id = resp_msg.resp_data[0]
@@ -0,0 +1,96 @@
+from collections.abc import Iterator
+import logging
+from const import RT_FRAMER_SIZE
+
+RT_FRAME_HDR = b"\xff\x23"
+
+
+class RtFramer:
+    """Incremental framer of router messages 0xFF 0x23 <rtr> <len> ..., fed with raw serial chunks.
+
+    Data is kept in a fixed bytearray, never resized, so frames can be handed out
+    as memoryviews. They are valid until next call of room(), copy to keep them.
+    """
+
+    def __init__(self, size: int = RT_FRAMER_SIZE) -> None:
+        self.logger = logging.getLogger(__name__)
+        self._buf = bytearray(size)
+        self._view = memoryview(self._buf)
+        self._head: int = 0  # first unparsed byte
+        self._tail: int = 0  # end of received data
+        self.reads: int = 0
+        self.frames: int = 0
+        self.resyncs: int = 0
+        self.skipped: int = 0
+        self.max_burst: int = 0
+
+    def room(self) -> int:
+        """Move unparsed rest to buffer start, return free space for next read."""
+        if self._head:
+            rest = self._tail - self._head
+            self._buf[:rest] = self._buf[self._head : self._tail]
+            self._head = 0
+            self._tail = rest
+        return len(self._buf) - self._tail
+
+    def reset(self) -> None:
+        """Discard all buffered data."""
+        self._head = 0
+        self._tail = 0
+
+    def feed(self, data: bytes) -> Iterator[memoryview]:
+        """Append received chunk, yield all complete frames."""
+        end = self._tail + len(data)
+        if end > len(self._buf):
+            self.room()
+            end = self._tail + len(data)
+            if end > len(self._buf):
+                # Caller ignored room(), keep newest data only
+                self.logger.warning(f"Router framer overflow, {self._tail} bytes dropped")
+                self.skipped += self._tail
+                self.reset()
+                data = data[-len(self._buf) :]
+                end = len(data)
+        self._buf[self._tail : end] = data
+        self._tail = end
+        self.reads += 1
+        buf = self._buf
+        pos = self._head
+        burst = 0
+        while end - pos >= 4:
+            if (buf[pos] != 0xFF) or (buf[pos + 1] != 0x23) or (buf[pos + 3] < 4):
+                nxt = buf.find(RT_FRAME_HDR, pos + 1, end)
+                if nxt < 0:
+                    # Keep last byte, could be start of next header
+                    nxt = end - 1 if buf[end - 1] == 0xFF else end
+                self.logger.warning(
+                    f"Router message with wrong header bytes: {bytes(buf[pos:min(nxt, pos + 16)])}, resync after {nxt - pos} bytes"
+                )
+                self.resyncs += 1
+                self.skipped += nxt - pos
+                pos = nxt
+                self._head = pos
+                continue
+            frm_len = buf[pos + 3] + 1
+            if end - pos < frm_len:
+                break
+            self._head = pos + frm_len
+            self.frames += 1
+            burst += 1
+            yield self._view[pos : pos + frm_len]
+            pos += frm_len
+        self._head = pos
+        if self._head == self._tail:
+            self.reset()
+        self.max_burst = max(self.max_burst, burst)
+
+    def get_stats(self) -> dict[str, int]:
+        """Return framing and resync statistics."""
+        return {
+            "reads": self.reads,
+            "frames": self.frames,
+            "resyncs": self.resyncs,
+            "skipped_bytes": self.skipped,
+            "max_burst": self.max_burst,
+            "buffered": self._tail - self._head,
+        }
@@ -0,0 +1,112 @@
+import re
+from checksum import xor_checksum
+from const import RT_CMDS
+
+PLACEHOLDER = re.compile(r"(<\w+>)")
+RT_LONG_CMD = 16  # longer commands carry data packages
+
+
+def finalize_cmd(buf: bytearray) -> bytes:
+    """Set length byte and checksum of router command."""
+    buf[2] = len(buf)
+    buf[-1] = xor_checksum(memoryview(buf)[:-1])
+    return bytes(buf)
+
+
+class RtCmdTemplate:
+    """Router command string of RT_CMDS, compiled into bytes skeleton with field offsets."""
+
+    def __init__(self, cmd: str) -> None:
+        self.cmd = cmd
+        self.fields: dict[str, list[int] | tuple[int, ...]] = {}
+        skeleton = bytearray()
+        for part in PLACEHOLDER.split(cmd):
+            if PLACEHOLDER.fullmatch(part):
+                self.fields.setdefault(part[1:-1], []).append(len(skeleton))
+                skeleton.append(0)
+            else:
+                skeleton += part.encode("iso8859-1")
+        self.skeleton = bytes(skeleton)
+        self.rtr_offs = self.fields.pop("rtr", [])
+        for name in list(self.fields):
+            # Length byte is always set by build()
+            self.fields[name] = tuple(offs for offs in self.fields[name] if offs != 2)
+        # Checksum of constant bytes without length byte, fields are zero
+        self.skel_xor = xor_checksum(self.skeleton) ^ self.skeleton[2]
+
+    def build(self, rtr: int, tail: bytes = b"", **values: int | bytes) -> bytes:
+        """Fill in router, field values, and appended tail, returns complete command.
+
+        Int values fill one byte, bytes values replace the placeholder byte.
+        Commands without closing checksum placeholder need tail ending with b"\\xff".
+        Checksum is updated per field, constant bytes are precomputed.
+        """
+        buf = bytearray(self.skeleton)
+        chksum = self.skel_xor
+        for offs in self.rtr_offs:
+            buf[offs] = rtr
+            chksum ^= rtr
+        fields = self.fields
+        splices = None
+        for name, val in values.items():
+            if val.__class__ is int:
+                for offs in fields.get(name, ()):
+                    buf[offs] = val
+                    chksum ^= val
+            else:
+                for offs in fields.get(name, ()):
+                    if splices is None:
+                        splices = []
+                    splices.append((offs, val))
+                    chksum ^= xor_checksum(val)
+        if splices:
+            for offs, val in sorted(splices, reverse=True):
+                buf[offs : offs + 1] = val
+        if tail:
+            buf += tail
+            chksum ^= xor_checksum(tail) ^ tail[-1]
+        else:
+            chksum ^= buf[-1]
+        buf[2] = len(buf)
+        buf[-1] = chksum ^ buf[2]
+        return bytes(buf)
+
+
+def cmd_kind(cmd: bytes | bytearray) -> int:
+    """Kind of command for latency statistics.
+
+    Router command code, for direct module commands 0x44 with module command
+    code, flag 0x10000 for long commands carrying data packages.
+    """
+    kind = cmd[3] << 8
+    if (cmd[3] == 0x44) and (len(cmd) > 6):
+        kind |= cmd[6]
+    elif (cmd[3] == 0x87) and (len(cmd) > 5) and (cmd[4] < 0xFC):
+        kind |= 1  # module status, long response
+    if len(cmd) > RT_LONG_CMD:
+        kind |= 0x10000
+    return kind
+
+
+def kind_name(kind: int) -> str:
+    """Return RT_CMDS names of command kind."""
+    if kind in RT_KIND_NAMES:
+        return RT_KIND_NAMES[kind]
+    return RT_KIND_NAMES.get(kind & 0xFFFF, f"0x{kind & 0xFFFF:04X}") + " (long)"
+
+
+class RT_TMPL:
+    """Compiled router commands, same names as RT_CMDS."""
+
+
+# Names of RT_CMDS per command kind, for diagnostics
+RT_KIND_NAMES: dict[int, str] = {}
+
+for _name, _cmd in vars(RT_CMDS).items():
+    if isinstance(_cmd, str) and not _name.startswith("_"):
+        setattr(RT_TMPL, _name, RtCmdTemplate(_cmd))
+        _kind = cmd_kind(getattr(RT_TMPL, _name).skeleton)
+        if _kind in RT_KIND_NAMES:
+            RT_KIND_NAMES[_kind] += "/" + _name
+        else:
+            RT_KIND_NAMES[_kind] = _name
@@ -0,0 +1,502 @@
+import asyncio
+from bisect import bisect_left
+from asyncio.streams import StreamReader, StreamWriter
+from asyncio.tasks import Task
+from collections import deque
+from contextvars import ContextVar
+import logging
+import time
+from rt_framer import RtFramer
+from rt_templates import cmd_kind, kind_name
+from const import (
+    RT_RESP,
+    RT_FRAME_QUEUE_LEN,
+    RT_CMD_TIMEOUT,
+    RT_CMD_WINDOW,
+    RT_CMD_RETRIES,
+    RT_LAT_BUCKETS,
+    RT_RATE_WINDOW,
+    RT_READ_RETRY_DELAYS,
+    RT_RTO_MIN,
+    RT_RTO_MAX,
+)
+
+RT_ERR_CODES = [RT_RESP.NN1, RT_RESP.NN2, RT_RESP.RT_INBOOT, RT_RESP.NN3]
+RT_EVENT_CODES = [RT_RESP.SYS_EVENT, RT_RESP.MIRR_STAT]
+RT_MOD_CODES = [RT_RESP.DIRECT_CMD, RT_RESP.MIRR_STAT]
+RT_ECHO_CODES = [0x66, 0x68]  # codes shared by commands, told apart by echoed args
+RT_ECHO_LEN = 3
+
+# Set in background tasks reading modules while events flow, skips mode switches
+operate_reads: ContextVar[bool] = ContextVar("operate_reads", default=False)
+
+
+class RtRequest:
+    """Router command waiting for its response frame."""
+
+    def __init__(self, cmd: bytes, resent: bool = False) -> None:
+        self.cmd = cmd
+        self.code: int = cmd[3]
+        self.kind: int = cmd_kind(cmd)
+        self.resent = resent  # no latency sample of resent commands
+        self.t_sent: float = time.monotonic()
+        self.mod: int = 0
+        if (self.code in RT_MOD_CODES) and (len(cmd) > 5) and (0 < cmd[4] < 251):
+            # Response carries module address in first data byte
+            self.mod = cmd[4]
+        self.echo: bytes = b""
+        if self.code in RT_ECHO_CODES:
+            # Response echoes command, leading arguments select the getter
+            self.echo = cmd[4 : min(len(cmd) - 1, 4 + RT_ECHO_LEN)]
+        self.future: asyncio.Future = asyncio.get_running_loop().create_future()
+
+    def matches(self, frame: bytes) -> bool:
+        """Check whether frame is the response to this command."""
+        if frame[4] != self.code:
+            return False
+        if self.echo and (frame[5 : 5 + len(self.echo)] != self.echo):
+            return False
+        return (self.mod == 0) or ((len(frame) > 5) and (frame[5] == self.mod))
+
+
+class RtTimeouts:
+    """Response timeouts per command kind, learned from latency like TCP RTO (RFC 6298)."""
+
+    def __init__(
+        self,
+        initial: float = RT_CMD_TIMEOUT,
+        rto_min: float = RT_RTO_MIN,
+        rto_max: float = RT_RTO_MAX,
+    ) -> None:
+        self.initial = initial
+        self.rto_min = rto_min
+        self.rto_max = rto_max
+        self._srtt: dict[int, float] = {}
+        self._rttvar: dict[int, float] = {}
+        self._rto: dict[int, float] = {}
+        self._samples: dict[int, int] = {}
+        self._timeouts: dict[int, int] = {}
+
+    def timeout(self, kind: int) -> float:
+        """Return current timeout of command kind."""
+        return self._rto.get(kind, self.initial)
+
+    def sample(self, kind: int, rtt: float) -> None:
+        """Update smoothed latency and variation by new measurement."""
+        if kind in self._srtt:
+            self._rttvar[kind] = 0.75 * self._rttvar[kind] + 0.25 * abs(
+                self._srtt[kind] - rtt
+            )
+            self._srtt[kind] = 0.875 * self._srtt[kind] + 0.125 * rtt
+        else:
+            self._srtt[kind] = rtt
+            self._rttvar[kind] = rtt / 2
+            self._timeouts[kind] = 0
+        self._samples[kind] = self._samples.get(kind, 0) + 1
+        self._rto[kind] = min(
+            max(self._srtt[kind] + 4 * self._rttvar[kind], self.rto_min),
+            self.rto_max,
+        )
+
+    def backoff(self, kind: int) -> None:
+        """Double timeout of command kind after missing response."""
+        self._rto[kind] = min(2 * self.timeout(kind), self.rto_max)
+        self._timeouts[kind] = self._timeouts.get(kind, 0) + 1
+
+    def get_stats(self) -> dict[str, dict[str, float]]:
+        """Return latency estimates and timeouts in ms per command kind."""
+        stats = {}
+        for kind in sorted(self._rto):
+            stats[kind_name(kind)] = {
+                "srtt_ms": round(1000 * self._srtt.get(kind, 0), 1),
+                "rttvar_ms": round(1000 * self._rttvar.get(kind, 0), 1),
+                "rto_ms": round(1000 * self._rto[kind], 1),
+                "samples": self._samples.get(kind, 0),
+                "timeouts": self._timeouts.get(kind, 0),
+            }
+        return stats
+
+
+class SerialMetrics:
+    """Serial link statistics: latency histograms per command kind, CRC errors, byte rates."""
+
+    def __init__(
+        self, buckets: tuple[int, ...] = RT_LAT_BUCKETS, window: float = RT_RATE_WINDOW
+    ) -> None:
+        self.buckets = buckets  # upper bounds in ms, last bucket open
+        self.window = window
+        self.baudrate: int = 0  # set by serial initialization, 0 if unknown
+        self.reset()
+
+    def reset(self) -> None:
+        """Clear all counters."""
+        self._hist: dict[int, list[int]] = {}
+        self._lat_sum: dict[int, float] = {}
+        self._lat_max: dict[int, float] = {}
+        self.crc_errors: dict[str, int] = {"responses": 0, "events": 0}
+        self.rx_bytes: int = 0
+        self.tx_bytes: int = 0
+        self.rx_rate: float = 0.0
+        self.tx_rate: float = 0.0
+        self._rx_win: int = 0
+        self._tx_win: int = 0
+        self._rate_start = time.monotonic()
+
+    def record_latency(self, kind: int, rtt: float) -> None:
+        """Count response time of command kind in histogram."""
+        rtt_ms = 1000 * rtt
+        if kind not in self._hist:
+            self._hist[kind] = [0] * (len(self.buckets) + 1)
+            self._lat_sum[kind] = 0.0
+            self._lat_max[kind] = 0.0
+        self._hist[kind][bisect_left(self.buckets, rtt_ms)] += 1
+        self._lat_sum[kind] += rtt_ms
+        self._lat_max[kind] = max(self._lat_max[kind], rtt_ms)
+
+    def count_crc_error(self, origin: str) -> None:
+        """Count router frame with wrong checksum, origin 'responses' or 'events'."""
+        self.crc_errors[origin] += 1
+
+    def count_rx(self, no_bytes: int) -> None:
+        """Count received bytes."""
+        self.rx_bytes += no_bytes
+        self._rx_win += no_bytes
+        self.update_rates()
+
+    def count_tx(self, no_bytes: int) -> None:
+        """Count sent bytes."""
+        self.tx_bytes += no_bytes
+        self._tx_win += no_bytes
+        self.update_rates()
+
+    def update_rates(self) -> None:
+        """Compute bytes per second after each window."""
+        t_now = time.monotonic()
+        if t_now - self._rate_start >= self.window:
+            self.rx_rate = self._rx_win / (t_now - self._rate_start)
+            self.tx_rate = self._tx_win / (t_now - self._rate_start)
+            self._rx_win = 0
+            self._tx_win = 0
+            self._rate_start = t_now
+
+    def utilisation(self, rate: float) -> float:
+        """Return link load in percent of baud rate, 10 bits per byte."""
+        if not self.baudrate:
+            return 0.0
+        return round(100 * 10 * rate / self.baudrate, 1)
+
+    def get_stats(self) -> dict:
+        """Return latency histograms in ms per command kind and link counters."""
+        self.update_rates()
+        labels = [f"<={bound}" for bound in self.buckets] + [f">{self.buckets[-1]}"]
+        latency = {}
+        for kind in sorted(self._hist):
+            cnt = sum(self._hist[kind])
+            latency[kind_name(kind)] = {
+                "count": cnt,
+                "mean_ms": round(self._lat_sum[kind] / cnt, 1),
+                "max_ms": round(self._lat_max[kind], 1),
+                "histogram_ms": dict(zip(labels, self._hist[kind])),
+            }
+        return {
+            "latency": latency,
+            "crc_errors": dict(self.crc_errors),
+            "baudrate": self.baudrate,
+            "rx_bytes": self.rx_bytes,
+            "tx_bytes": self.tx_bytes,
+            "rx_bytes_per_sec": round(self.rx_rate, 1),
+            "tx_bytes_per_sec": round(self.tx_rate, 1),
+            "rx_utilisation_pct": self.utilisation(self.rx_rate),
+            "tx_utilisation_pct": self.utilisation(self.tx_rate),
+        }
+
+
+class SerialArbiter:
+    """Owns the router serial interface, frames all incoming messages once and dispatches them."""
+
+    def __init__(self, api_srv, rt_serial: tuple[StreamReader, StreamWriter]) -> None:
+        self.api_srv = api_srv
+        self.logger = logging.getLogger(__name__)
+        self.rt_reader: StreamReader = rt_serial[0]
+        self.rt_writer: StreamWriter = rt_serial[1]
+        self.rd_task: Task | None = None
+        self.framer = RtFramer()
+        self.events_enabled: bool = False
+        self._pending: deque[RtRequest] = deque()
+        self._events: asyncio.Queue = asyncio.Queue(RT_FRAME_QUEUE_LEN)
+        self._unsolicited: asyncio.Queue = asyncio.Queue(RT_FRAME_QUEUE_LEN)
+        self._wr_lock = asyncio.Lock()
+        self.timeouts = RtTimeouts()
+        self.metrics = SerialMetrics()
+        self.cmd_queue = RtCmdQueue(self)
+
+    def start(self) -> None:
+        """Start reader task."""
+        if self.running():
+            return
+        self.rd_task = self.api_srv.loop.create_task(
+            self.read_frames(), name="rt_arbiter"
+        )
+        self.logger.debug("Serial arbiter started")
+
+    def stop(self) -> None:
+        """Cancel reader task and pending requests."""
+        if self.running():
+            self.rd_task.cancel()  # type: ignore
+        self.cmd_queue.cancel()
+        self.fail_pending(ConnectionError("Serial arbiter stopped"))
+        self.logger.debug("Serial arbiter stopped")
+
+    def running(self) -> bool:
+        """Return status of reader task."""
+        return (self.rd_task is not None) and not self.rd_task.done()
+
+    async def read_frames(self) -> None:
+        """Task reading all router messages, no other reader allowed on serial interface.
+
+        Read errors are retried with growing delays, if the interface is lost the
+        hub is restarted to open it again.
+        """
+        read_errors = 0
+        while True:
+            try:
+                data = await self.rt_reader.read(self.framer.room())
+                if not data:
+                    raise ConnectionError("End of stream")
+                read_errors = 0
+                self.metrics.count_rx(len(data))
+                for frame in self.framer.feed(data):
+                    # Copy frame, views are overwritten by next read
+                    self.dispatch(bytes(frame))
+            except asyncio.CancelledError:
+                raise
+            except Exception as err_msg:
+                self.logger.error(f"Serial interface read failed: {err_msg}")
+                self.fail_pending(ConnectionError(f"Serial read failed: {err_msg}"))
+                self.framer.reset()
+                if self.rt_reader.at_eof() or read_errors >= len(RT_READ_RETRY_DELAYS):
+                    self.restart_hub()
+                    return
+                await asyncio.sleep(RT_READ_RETRY_DELAYS[read_errors])
+                read_errors += 1
+
+    def restart_hub(self) -> None:
+        """Restart hub after serial interface is lost, reopens interface."""
+        self.logger.error("Serial interface lost, restarting Smart Hub")
+        try:
+            self.api_srv.sm_hub.restart_hub(0)
+        except Exception as err_msg:
+            self.logger.error(f"Restart of Smart Hub failed: {err_msg}")
+
+    def dispatch(self, frame: bytes) -> None:
+        """Route frame to awaiting command or to event pipeline."""
+        for req in self._pending:
+            if req.matches(frame):
+                if not req.resent and (frame[4] not in RT_ERR_CODES):
+                    rtt = time.monotonic() - req.t_sent
+                    self.timeouts.sample(req.kind, rtt)
+                    self.metrics.record_latency(req.kind, rtt)
+                self.resolve(req, frame)
+                return
+        if (frame[4] in RT_ERR_CODES) and self._pending:
+            if (req := self.error_owner(frame)) is not None:
+                self.resolve(req, frame)
+            else:
+                # Ambiguous, awaiting commands time out and are resent
+                self.logger.warning(
+                    f"Router error {frame[4]} with {len(self._pending)} commands pending, dropped"
+                )
+            return
+        if self.events_enabled:
+            self.put_event(frame)
+            return
+        if (len(self._pending) == 1) and (frame[4] not in RT_EVENT_CODES):
+            # Client/server mode: router answers one command at a time
+            self.logger.debug(
+                f"Unexpected response code {frame[4]} assigned to command {self._pending[0].cmd}"
+            )
+            self.resolve(self._pending[0], frame)
+            return
+        self.put_frame(self._unsolicited, frame)
+
+    def error_owner(self, frame: bytes) -> RtRequest | None:
+        """Return command of error frame by module byte, or single pending command."""
+        if len(frame) > 6:
+            for req in self._pending:
+                if req.mod == frame[5]:
+                    return req
+        if len(self._pending) == 1:
+            return self._pending[0]
+        return None
+
+    def resolve(self, req: RtRequest, frame: bytes) -> None:
+        """Hand frame over to waiting command."""
+        self._pending.remove(req)
+        if not req.future.done():
+            req.future.set_result(frame)
+
+    def put_event(self, frame: bytes | None) -> None:
+        """Put frame into event queue with time stamp for queue lag gauge."""
+        self.put_frame(self._events, (time.monotonic(), frame))
+
+    def put_frame(self, queue: asyncio.Queue, frame) -> None:
+        """Put frame into bounded queue, drop oldest if full."""
+        if queue.full():
+            dropped = queue.get_nowait()
+            self.logger.warning(f"Router frame queue full, dropped: {dropped}")
+        queue.put_nowait(frame)
+
+    def fail_pending(self, exc: Exception) -> None:
+        """Terminate all waiting commands."""
+        while self._pending:
+            req = self._pending.popleft()
+            if not req.future.done():
+                req.future.set_exception(exc)
+
+    def expect(self, cmd: bytes, resent: bool = False) -> RtRequest:
+        """Register command before sending, response will be routed to it."""
+        req = RtRequest(cmd, resent)
+        self._pending.append(req)
+        return req
+
+    async def wait_resp(self, req: RtRequest) -> bytes:
+        """Wait for response frame with learned timeout of command kind."""
+        try:
+            return await asyncio.wait_for(req.future, self.timeouts.timeout(req.kind))
+        except TimeoutError:
+            self.discard(req)
+            self.timeouts.backoff(req.kind)
+            raise
+
+    def discard(self, req: RtRequest) -> None:
+        """Remove command from pending list, e.g. after timeout."""
+        if req in self._pending:
+            self._pending.remove(req)
+
+    async def send(self, cmd: bytes) -> None:
+        """Write command to serial interface."""
+        async with self._wr_lock:
+            self.rt_writer.write(cmd)
+            await self.rt_writer.drain()
+        self.metrics.count_tx(len(cmd))
+
+    def get_metrics(self) -> dict:
+        """Return link metrics, learned timeouts, framing, and event statistics."""
+        metrics = self.metrics.get_stats()
+        metrics["timeouts"] = self.timeouts.get_stats()
+        metrics["framer"] = self.framer.get_stats()
+        if (evnt_srv := getattr(self.api_srv, "evnt_srv", None)) is not None:
+            metrics["events"] = evnt_srv.get_gauges()
+        return metrics
+
+    async def recv_unsolicited(self) -> bytes:
+        """Wait for next frame without awaiting command."""
+        return await self._unsolicited.get()
+
+    async def get_event(self) -> tuple[bytes | None, float]:
+        """Wait for next event frame, return it with its queueing time.
+
+        Frame None signals wake-up to event server.
+        """
+        t_queued, frame = await self._events.get()
+        return frame, time.monotonic() - t_queued
+
+    def enable_events(self, enable: bool) -> None:
+        """Route frames without awaiting command to event pipeline or hold them back."""
+        self.events_enabled = enable
+        if enable:
+            # Hand over what arrived before event server started
+            while not self._unsolicited.empty():
+                self.put_event(self._unsolicited.get_nowait())
+        else:
+            self.put_event(None)
+
+    def flush(self) -> None:
+        """Discard all queued frames, e.g. after leaving operate mode."""
+        cnt = self._events.qsize() + self._unsolicited.qsize()
+        for queue in [self._events, self._unsolicited]:
+            while not queue.empty():
+                queue.get_nowait()
+        if cnt:
+            self.logger.debug(f"Discarded {cnt} queued router frames")
+
+
+class RtCmdQueue:
+    """Pipelined router commands, keeps up to window commands in flight.
+
+    Commands are sent in submission order, responses with same code and module
+    are assigned in that order, too. After a lost response, callers must check
+    echoed content, e.g. package numbers.
+    """
+
+    def __init__(self, arbiter: SerialArbiter, window: int = RT_CMD_WINDOW) -> None:
+        self.arbiter = arbiter
+        self.logger = logging.getLogger(__name__)
+        self.window = window
+        self.tx_task: Task | None = None
+        self._slots = asyncio.Semaphore(window)
+        self._queue: deque[tuple[bytes, int, asyncio.Future]] = deque()
+        self._resp_tasks: set[Task] = set()  # strong references while in flight
+
+    def submit(self, cmd: bytes, retries: int = RT_CMD_RETRIES) -> asyncio.Future:
+        """Queue command, returned future gets response frame or TimeoutError."""
+        fut = self.arbiter.api_srv.loop.create_future()
+        self._queue.append((cmd, retries, fut))
+        if (self.tx_task is None) or self.tx_task.done():
+            self.tx_task = self.arbiter.api_srv.loop.create_task(
+                self.send_cmds(), name="rt_cmd_queue"
+            )
+        return fut
+
+    def cancel(self) -> None:
+        """Drop all queued commands."""
+        while self._queue:
+            fut = self._queue.popleft()[2]
+            if not fut.done():
+                fut.cancel()
+
+    async def send_cmds(self) -> None:
+        """Task sending queued commands in submission order, limited by window."""
+        while self._queue:
+            await self._slots.acquire()
+            if not self._queue:
+                self._slots.release()
+                return
+            cmd, retries, fut = self._queue.popleft()
+            try:
+                req = self.arbiter.expect(cmd)
+                await self.arbiter.send(cmd)
+            except Exception as err_msg:
+                self._slots.release()
+                if not fut.done():
+                    fut.set_exception(err_msg)
+                continue
+            resp_task = self.arbiter.api_srv.loop.create_task(
+                self.await_resp(req, retries, fut)
+            )
+            self._resp_tasks.add(resp_task)
+            resp_task.add_done_callback(self._resp_tasks.discard)
+
+    async def await_resp(self, req, retries: int, fut: asyncio.Future) -> None:
+        """Wait for response of sent command, resend on timeout."""
+        try:
+            while True:
+                try:
+                    frame = await self.arbiter.wait_resp(req)
+                    if not fut.done():
+                        fut.set_result(frame)
+                    return
+                except TimeoutError:
+                    if retries <= 0:
+                        raise
+                    retries -= 1
+                    self.logger.warning(
+                        f"Timeout receiving router response, resending {req.cmd}"
+                    )
+                    req = self.arbiter.expect(req.cmd, resent=True)
+                    await self.arbiter.send(req.cmd)
+        except Exception as err_msg:
+            if not fut.done():
+                fut.set_exception(err_msg)
+        finally:
+            self._slots.release()
@@ -0,0 +1,184 @@
+import asyncio
+from asyncio.streams import StreamReader, StreamWriter
+from asyncio.tasks import Task
+from collections.abc import Iterator
+import logging
+import struct
+import time
+from typing import BinaryIO
+
+CAP_MAGIC = b"SHCAP1\n"
+CAP_RX = 0  # router -> hub
+CAP_TX = 1  # hub -> router
+CAP_REC = struct.Struct("<dBH")  # time stamp, direction, length
+
+
+class CaptureWriter:
+    """Writes serial chunks with direction and monotonic time stamp to capture file."""
+
+    def __init__(self, fid: BinaryIO) -> None:
+        self.fid = fid
+        self.t_start = time.monotonic()
+        self.fid.write(CAP_MAGIC)
+
+    @classmethod
+    def open(cls, path: str) -> "CaptureWriter":
+        """Create new capture file."""
+        return cls(open(path, "wb"))
+
+    def record(self, direction: int, data: bytes) -> None:
+        """Append chunk, longer chunks are split into several records."""
+        t_stamp = time.monotonic() - self.t_start
+        for idx in range(0, len(data), 0xFFFF):
+            chunk = data[idx : idx + 0xFFFF]
+            self.fid.write(CAP_REC.pack(t_stamp, direction, len(chunk)) + chunk)
+
+    def close(self) -> None:
+        """Close capture file."""
+        self.fid.close()
+
+
+def read_capture(fid: BinaryIO) -> Iterator[tuple[float, int, bytes]]:
+    """Yield time stamp, direction, and data of capture records."""
+    if fid.read(len(CAP_MAGIC)) != CAP_MAGIC:
+        raise ValueError("No serial capture file")
+    while hdr := fid.read(CAP_REC.size):
+        if len(hdr) < CAP_REC.size:
+            break
+        t_stamp, direction, length = CAP_REC.unpack(hdr)
+        yield t_stamp, direction, fid.read(length)
+
+
+def load_capture(path: str) -> list[tuple[float, int, bytes]]:
+    """Read all records of capture file."""
+    with open(path, "rb") as fid:
+        return list(read_capture(fid))
+
+
+class RecordingReader:
+    """Serial stream reader which records all received chunks."""
+
+    def __init__(self, reader: StreamReader, cap: CaptureWriter) -> None:
+        self._reader = reader
+        self._cap = cap
+
+    def __getattr__(self, name):
+        return getattr(self._reader, name)
+
+    async def read(self, n: int = -1) -> bytes:
+        data = await self._reader.read(n)
+        self._cap.record(CAP_RX, data)
+        return data
+
+    async def readexactly(self, n: int) -> bytes:
+        data = await self._reader.readexactly(n)
+        self._cap.record(CAP_RX, data)
+        return data
+
+
+class RecordingWriter:
+    """Serial stream writer which records all sent chunks."""
+
+    def __init__(self, writer: StreamWriter, cap: CaptureWriter) -> None:
+        self._writer = writer
+        self._cap = cap
+
+    def __getattr__(self, name):
+        return getattr(self._writer, name)
+
+    def write(self, data: bytes) -> None:
+        self._cap.record(CAP_TX, data)
+        self._writer.write(data)
+
+    def close(self) -> None:
+        self._writer.close()
+        self._cap.close()
+
+
+def record_serial(
+    rt_serial: tuple[StreamReader, StreamWriter], path: str
+) -> tuple[StreamReader, StreamWriter]:
+    """Wrap serial streams, all traffic is written to capture file."""
+    cap = CaptureWriter.open(path)
+    logging.getLogger(__name__).info(f"   Recording serial traffic to {path}")
+    return (
+        RecordingReader(rt_serial[0], cap),  # type: ignore
+        RecordingWriter(rt_serial[1], cap),  # type: ignore
+    )
+
+
+class ReplayWriter:
+    """Stands in for serial writer during replay, counts written commands."""
+
+    def __init__(self) -> None:
+        self.tx_count = 0
+        self.tx_event = asyncio.Event()
+        self._closed = False
+
+    def write(self, data: bytes) -> None:
+        self.tx_count += 1
+        self.tx_event.set()
+
+    async def drain(self) -> None:
+        pass
+
+    def close(self) -> None:
+        self._closed = True
+
+    async def wait_closed(self) -> None:
+        pass
+
+
+class CaptureReplay:
+    """Feeds received chunks of a capture into a stream reader.
+
+    Received chunks following a sent chunk are held back until the hub has
+    written as many chunks as the capture, so responses arrive after their
+    commands. Speed 0 replays without delays, 1 with original timing.
+    """
+
+    def __init__(
+        self, records: list[tuple[float, int, bytes]], speed: float = 0
+    ) -> None:
+        self.logger = logging.getLogger(__name__)
+        self.records = records
+        self.speed = speed
+        self.reader = StreamReader()
+        self.writer = ReplayWriter()
+        self.rx_bytes = 0
+        self.task: Task | None = None
+
+    def start(self) -> tuple[StreamReader, StreamWriter]:
+        """Start feeding task, return streams to be used as serial interface."""
+        self.task = asyncio.get_running_loop().create_task(
+            self.feed(), name="cap_replay"
+        )
+        return self.reader, self.writer  # type: ignore
+
+    async def feed(self) -> None:
+        """Task replaying all records in order."""
+        tx_seen = 0
+        t_start = time.monotonic()
+        for t_stamp, direction, data in self.records:
+            if direction == CAP_TX:
+                tx_seen += 1
+                while self.writer.tx_count < tx_seen:
+                    self.writer.tx_event.clear()
+                    await self.writer.tx_event.wait()
+                continue
+            if self.speed > 0:
+                t_wait = t_stamp / self.speed - (time.monotonic() - t_start)
+                if t_wait > 0:
+                    await asyncio.sleep(t_wait)
+            self.reader.feed_data(data)
+            self.rx_bytes += len(data)
+            # Let consumers handle chunk, as with a real interface
+            await asyncio.sleep(0)
+        self.logger.info(f"Replay finished, {self.rx_bytes} bytes fed")
+        self.reader.feed_eof()
+
+
+def replay_serial(path: str, speed: float = 0) -> tuple[StreamReader, StreamWriter]:
+    """Open capture file and return replaying serial streams, must run in event loop."""
+    logging.getLogger(__name__).info(f"   Replaying serial traffic of {path}")
+    return CaptureReplay(load_capture(path), speed).start()
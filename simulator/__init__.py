@@ -0,0 +1,10 @@
+"""Virtual Habitron router on a pseudo-terminal, for load tests without hardware.
+
+Run: python -m simulator --modules 60 --link /tmp/ttySIM0
+then: SMHUB_SERIAL_DEVICE=/tmp/ttySIM0 python smarthub.py
+"""
+
+from .router_sim import RouterSimulator, rt_frame
+from .sim_modules import SimModule, create_modules
+
+__all__ = ["RouterSimulator", "SimModule", "create_modules", "rt_frame"]
@@ -0,0 +1,61 @@
+import argparse
+import asyncio
+import logging
+from .router_sim import RouterSimulator
+from .sim_modules import create_modules
+
+
+def parse_args() -> argparse.Namespace:
+    """Command line options of simulator."""
+    parser = argparse.ArgumentParser(
+        prog="python -m simulator", description="Virtual Habitron router on a pty"
+    )
+    parser.add_argument("--modules", type=int, default=10, help="number of modules")
+    parser.add_argument(
+        "--types",
+        default="",
+        help="module type codes, comma separated hex, e.g. 0102,0a33 (default: all)",
+    )
+    parser.add_argument("--rtr", type=int, default=1, help="router address")
+    parser.add_argument(
+        "--event-rate", type=float, default=2.0, help="random events per second"
+    )
+    parser.add_argument(
+        "--mirror-cyc", type=float, default=1.0, help="mirror burst cycle in seconds"
+    )
+    parser.add_argument(
+        "--resp-delay", type=float, default=0.0, help="delay of responses in seconds"
+    )
+    parser.add_argument("--link", default="", help="symlink to pty, e.g. /tmp/ttySIM0")
+    parser.add_argument("--stats", type=float, default=0, help="log counters every n s")
+    return parser.parse_args()
+
+
+async def run_simulator(args: argparse.Namespace) -> None:
+    """Start simulator and run until cancelled."""
+    types = [bytes.fromhex(typ) for typ in args.types.split(",") if typ]
+    sim = RouterSimulator(
+        create_modules(args.modules, types),
+        rtr_id=args.rtr,
+        event_rate=args.event_rate,
+        mirror_cyc=args.mirror_cyc,
+        resp_delay=args.resp_delay,
+        link=args.link,
+    )
+    device = await sim.start()
+    print(f"SMHUB_SERIAL_DEVICE={device}", flush=True)
+    try:
+        while True:
+            await asyncio.sleep(args.stats or 3600)
+            if args.stats:
+                sim.logger.info(f"Simulator counters: {sim.get_stats()}")
+    finally:
+        await sim.stop()
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    try:
+        asyncio.run(run_simulator(parse_args()))
+    except KeyboardInterrupt:
+        pass
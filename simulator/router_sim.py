@@ -0,0 +1,334 @@
+import asyncio
+from asyncio.tasks import Task
+import logging
+import os
+import random
+import time
+import tty
+from checksum import xor_checksum
+from const import MirrIdx, RT_RESP, RT_STAT_CODES, SYS_MODES
+from .sim_modules import SimModule
+
+SIM_PKG_OK = RT_STAT_CODES.PKG_OK
+
+
+def rt_frame(rtr: int, payload: bytes) -> bytes:
+    """Build router message 0xFF 0x23 <rtr> <len> <payload> <crc>."""
+    body = bytearray(b"\x23" + bytes([rtr, 0]) + payload)
+    body[2] = len(body) + 1
+    return b"\xff" + bytes(body) + bytes([xor_checksum(body)])
+
+
+class RouterSimulator:
+    """Virtual Habitron router on a pseudo-terminal, answers RT_CMDS and emits events."""
+
+    def __init__(
+        self,
+        modules: list[SimModule],
+        rtr_id: int = 1,
+        event_rate: float = 2.0,
+        mirror_cyc: float = 1.0,
+        resp_delay: float = 0.0,
+        link: str = "",
+    ) -> None:
+        self.logger = logging.getLogger(__name__)
+        self.modules: dict[int, SimModule] = {mod.addr: mod for mod in modules}
+        self.rtr_id = rtr_id
+        self.event_rate = event_rate
+        self.mirror_cyc = mirror_cyc
+        self.resp_delay = resp_delay
+        self.link = link
+        self.device = ""
+        self.mode0 = SYS_MODES.Config
+        self.opr_mode = False
+        self.events_on = False
+        self.mirror_on = False
+        self.flash_until = 0.0
+        self.cmd_count = 0
+        self.frm_count = 0
+        self._master = -1
+        self._slave = -1
+        self._buf = bytearray()
+        self._writer: asyncio.StreamWriter
+        self._tasks: list[Task] = []
+
+    async def start(self) -> str:
+        """Open pty, start command and traffic tasks, return device path for the hub."""
+        loop = asyncio.get_running_loop()
+        self._master, self._slave = os.openpty()
+        # No echo or line processing, router link is binary
+        tty.setraw(self._slave)
+        tty.setraw(self._master)
+        self.device = os.ttyname(self._slave)
+        if self.link:
+            if os.path.lexists(self.link):
+                os.remove(self.link)
+            os.symlink(self.device, self.link)
+        reader = asyncio.StreamReader()
+        await loop.connect_read_pipe(
+            lambda: asyncio.StreamReaderProtocol(reader),
+            os.fdopen(self._master, "rb", buffering=0),
+        )
+        w_transp, w_prot = await loop.connect_write_pipe(
+            asyncio.streams.FlowControlMixin,
+            os.fdopen(os.dup(self._master), "wb", buffering=0),
+        )
+        self._writer = asyncio.StreamWriter(w_transp, w_prot, reader, loop)
+        self._tasks = [
+            loop.create_task(self.serve_cmds(reader), name="sim_cmds"),
+            loop.create_task(self.emit_events(), name="sim_events"),
+            loop.create_task(self.emit_mirror(), name="sim_mirror"),
+        ]
+        self.logger.info(
+            f"Router simulator with {len(self.modules)} modules on {self.link or self.device}"
+        )
+        return self.link or self.device
+
+    async def stop(self) -> None:
+        """Cancel tasks and close pty."""
+        for task in self._tasks:
+            task.cancel()
+        self._writer.close()
+        os.close(self._slave)
+        if self.link and os.path.islink(self.link):
+            os.remove(self.link)
+
+    async def serve_cmds(self, reader: asyncio.StreamReader) -> None:
+        """Read commands 0x2A <rtr> <len> ... <crc>, answer each."""
+        while True:
+            data = await reader.read(1024)
+            if not data:
+                return
+            for cmd in self.split_cmds(data):
+                self.cmd_count += 1
+                resps = self.handle_cmd(cmd)
+                if self.resp_delay:
+                    await asyncio.sleep(self.resp_delay)
+                for resp in resps:
+                    await self.send(resp)
+
+    def split_cmds(self, data: bytes) -> list[bytes]:
+        """Collect complete commands from received data."""
+        self._buf += data
+        cmds = []
+        while True:
+            start = self._buf.find(b"\x2a")
+            if start < 0:
+                self._buf.clear()
+                break
+            if start:
+                self.logger.warning(f"Simulator skipped {bytes(self._buf[:start])}")
+                del self._buf[:start]
+            if len(self._buf) < 3:
+                break
+            cmd_len = self._buf[2]
+            if cmd_len < 5:
+                del self._buf[:1]
+                continue
+            if len(self._buf) < cmd_len:
+                break
+            cmd = bytes(self._buf[:cmd_len])
+            del self._buf[:cmd_len]
+            if xor_checksum(cmd[:-1]) != cmd[-1]:
+                self.logger.warning(f"Simulator received command with wrong crc: {cmd}")
+                continue
+            cmds.append(cmd)
+        return cmds
+
+    async def send(self, frame: bytes) -> None:
+        """Write frame to hub."""
+        self.frm_count += 1
+        self._writer.write(frame)
+        await self._writer.drain()
+
+    def resp(self, cmd: bytes, data: bytes = b"") -> list[bytes]:
+        """Response echoes command without checksum, followed by data."""
+        return [rt_frame(self.rtr_id, cmd[3:-1] + data)]
+
+    def handle_cmd(self, cmd: bytes) -> list[bytes]:
+        """Return response frames for command."""
+        code = cmd[3]
+        args = cmd[4:-1]
+        match code:
+            case 0x44:
+                return self.handle_mod_cmd(cmd)
+            case 0x63:
+                return self.handle_chan_cmd(cmd)
+            case 0x64 if args == b"L":  # GET_RT_STATUS
+                return self.resp(
+                    cmd,
+                    bytes([self.mode0])
+                    + bytes(40)
+                    + bytes([RT_STAT_CODES.SYS_RUNNING, RT_STAT_CODES.SYS_OK, 0]),
+                )
+            case 0x66:
+                if args[:2] == b"\x01\x4c":  # GET_RT_TIMEOUT
+                    return self.resp(cmd, b"\x0a")
+                if args[:3] == b"\x01\x89\x01":  # GET_RT_GRPNO
+                    return self.resp(cmd, bytes(len(self.modules)))
+                if args[:3] == b"\x01\x89\x65":  # GET_RT_GRPMODE_DEP
+                    return self.resp(cmd, bytes(16))
+            case 0x67 if args == b"L":
+                return self.resp(cmd, b"Simulated router".ljust(32))
+            case 0x68 if args[:1] == b"L":
+                return self.resp(cmd, args[1:2] + f"User {args[1]}".encode().ljust(10))
+            case 0x69 if args == b"L":
+                return self.resp(cmd, b"RTSIM00000000001")
+            case 0x6A:
+                return self.resp(cmd, b"\x00")
+            case 0x8C if args == b"L":
+                return self.resp(cmd, bytes(69))
+            case 0xBE if args[:1] == b"L":
+                tm = time.localtime()
+                if args[1:2] == b"D":
+                    return self.resp(cmd, bytes([tm.tm_mday, tm.tm_mon, tm.tm_year % 100]))
+                return self.resp(cmd, bytes([tm.tm_sec, tm.tm_min, tm.tm_hour]))
+            case 0xC8:
+                return self.resp(cmd, b"\x16" + b"RT SIM V1.0 01 01/2024".ljust(22))
+            case 0x85:  # SET_SRV_MODE / SET_OPR_MODE
+                self.opr_mode = args[0] == 1
+                if self.opr_mode:
+                    self.mirror_on = bool(args[1])
+                    self.events_on = bool(args[2])
+                else:
+                    self.mirror_on = False
+                    self.events_on = False
+                return self.resp(cmd)
+            case 0x86:  # START_EVENTS / STOP_EVENTS
+                self.events_on = args[0] == 0xFF
+                return self.resp(cmd)
+            case 0x87:
+                return self.handle_mirr_cmd(cmd)
+            case 0x88:  # GET_GLOB_MODE
+                mode = SYS_MODES.Update if time.time() < self.flash_until else self.mode0
+                return self.resp(cmd, bytes([mode]))
+            case 0x89:
+                if args[:1] == b"\x4f":
+                    if args[1:2] == b"\x4c":  # GET_GRP_MODE
+                        return self.resp(cmd, bytes([self.mode0]))
+                    if args[1:2] == b"\x01":  # GET_GRPS_MODE
+                        return self.resp(cmd, bytes([self.mode0]) * 64)
+                    return self.resp(cmd)
+                if args[:4] == b"ISPV":  # FLASH_MOD_FW
+                    self.flash_until = time.time() + 2
+                    return self.resp(cmd)
+                self.mode0 = args[0]  # SET_GLOB_MODE
+                return self.resp(cmd)
+            case 0xC7:
+                if len(args) > 3:  # UPDATE_MOD_PKG
+                    return [rt_frame(self.rtr_id, bytes([0xC7, args[0], SIM_PKG_OK]))]
+                return self.resp(cmd, b"\x00")
+            case 0xC9:
+                if args[:4] == b"ISPS":  # SET_ISP_MODE
+                    return [rt_frame(self.rtr_id, b"\xc9\x42\x4c\x00\x00")]
+                if args[:1] == b"\x46":  # UPDATE_RT_PKG
+                    return [rt_frame(self.rtr_id, b"\xc9\x42\x4c" + bytes([args[1], 0]))]
+                if args[:1] == b"\x5a":  # MOD_FLASH_STAT
+                    return self.resp(cmd, b"\x00Flash finished")
+                return self.resp(cmd)
+        return self.resp(cmd)
+
+    def handle_chan_cmd(self, cmd: bytes) -> list[bytes]:
+        """Channel and module address commands 0x63."""
+        args = cmd[4:-1]
+        if args == b"\x01":  # GET_RT_MODULES
+            addrs = sorted(self.modules)
+            return self.resp(cmd, bytes([len(addrs)] + addrs))
+        if args == b"\x50\x4c":  # GET_RT_CHANS
+            chans = b"\x04"
+            addrs = sorted(self.modules)
+            for ch in range(4):
+                ch_addrs = addrs[ch::4]
+                chans += bytes([len(ch_addrs)] + ch_addrs + [0])
+            return self.resp(cmd, chans)
+        return self.resp(cmd)
+
+    def handle_mirr_cmd(self, cmd: bytes) -> list[bytes]:
+        """Mirror commands 0x87: start, stop, read module status."""
+        arg = cmd[4]
+        if arg == 0xFC:
+            self.mirror_on = True
+        elif arg == 0xFE:
+            self.mirror_on = False
+        elif arg in self.modules:
+            return [rt_frame(self.rtr_id, b"\x87" + self.modules[arg].status)]
+        elif arg < 0xFC:
+            return [rt_frame(self.rtr_id, bytes([RT_RESP.NN1]))]
+        return self.resp(cmd)
+
+    def handle_mod_cmd(self, cmd: bytes) -> list[bytes]:
+        """Direct module commands 0x44 <mod> <len> <cmd> ..."""
+        mod = self.modules.get(cmd[4])
+        if mod is None:
+            return [rt_frame(self.rtr_id, bytes([RT_RESP.NN1]))]
+        sub = cmd[6]
+        args = cmd[7:-1]
+        events: list[bytes] = []
+        match sub:
+            case 0xC7 if cmd[5] == 6 and len(args) == 2:  # GET_MOD_SMC
+                return self.resp(cmd, args[1:2] + mod.get_smc_pckg(args[0], args[1]))
+            case 0xC7 if len(args) > 2 and args[0] in [6, 7]:  # SEND_MOD_SMC
+                mod.put_smc_pckg(args[0], args[2:])
+                return [
+                    rt_frame(
+                        self.rtr_id, bytes([0x44, mod.addr, 5, 0xC7, 0, args[0], args[1]])
+                    )
+                ]
+            case 0x69:
+                if args == b"L":  # GET_MOD_SERIAL
+                    return self.resp(cmd, b"S" + mod.serial.encode("iso8859-1"))
+                mod.serial = args[1:].decode("iso8859-1")
+                mod.set_text(MirrIdx.MOD_SERIAL, 16, mod.serial)
+            case 0x67 if args[:1] == b"S":  # SET_MOD_NAME
+                cnt = args[1]
+                name = bytearray(mod.status[MirrIdx.MOD_NAME : MirrIdx.MOD_NAME + 32])
+                name[cnt : cnt + 8] = args[2:10]
+                mod.status[MirrIdx.MOD_NAME : MirrIdx.MOD_NAME + 32] = name[:32]
+            case 0x0A | 0x0B if args[:1] in [b"\x45", b"\x41"]:  # SET_OUT_ON/OFF
+                on = sub == 0x0A
+                mask = int.from_bytes(args[1:4], "little")
+                for out in mod.set_outputs(mask, on):
+                    events.append(self.event_frame(mod.addr, 10 if on else 11, bytes([out])))
+            case 0x0A | 0x0B if args[:1] in [b"\x4d", b"\x4e"]:  # SET_FLAG_ON/OFF
+                on = sub == 0x0A
+                mask = int.from_bytes(args[1:3], "little")
+                for flg in mod.set_flags(mask, on):
+                    events.append(self.event_frame(mod.addr, 6, bytes([flg, int(on)])))
+            case 0x0F:  # SET_DIMM_VAL
+                if 1 <= args[0] <= 4:
+                    mod.status[MirrIdx.DIM_1 + args[0] - 1] = args[1]
+            case 0x12:  # SET_COVER_POS
+                if 1 <= args[2] <= 8:
+                    mod.status[MirrIdx.COVER_POS + args[2] - 1] = args[3]
+        return self.resp(cmd) + (events if self.events_on else [])
+
+    def event_frame(self, mod_addr: int, event_id: int, args: bytes) -> bytes:
+        """System event 0x86 <mod> <event> <args>."""
+        return rt_frame(self.rtr_id, bytes([0x86, mod_addr, event_id]) + args)
+
+    async def emit_events(self) -> None:
+        """Send random module events with configured rate while events are enabled."""
+        if self.event_rate <= 0:
+            return
+        while True:
+            await asyncio.sleep(random.expovariate(self.event_rate))
+            if not (self.events_on and self.modules):
+                continue
+            mod = random.choice(list(self.modules.values()))
+            event_id, args = mod.random_event()
+            await self.send(self.event_frame(mod.addr, event_id, args))
+
+    async def emit_mirror(self) -> None:
+        """Send mirror status burst of all modules each cycle while mirror is enabled."""
+        if self.mirror_cyc <= 0:
+            return
+        while True:
+            await asyncio.sleep(self.mirror_cyc)
+            if not self.mirror_on:
+                continue
+            for mod in list(self.modules.values()):
+                await self.send(rt_frame(self.rtr_id, b"\x87" + mod.status))
+
+    def get_stats(self) -> dict[str, int]:
+        """Return command and frame counters."""
+        return {"commands": self.cmd_count, "frames": self.frm_count}
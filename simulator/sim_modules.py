@@ -0,0 +1,116 @@
+import random
+from const import MirrIdx, MODULE_TYPES
+from event_server import EVENT_IDS
+
+# Event ids emitted per module family (first byte of type code)
+SIM_EVENTS: dict[int, list[int]] = {
+    1: [EVENT_IDS.BTN_SHORT, EVENT_IDS.OUT_ON, EVENT_IDS.OUT_OFF],
+    10: [EVENT_IDS.OUT_ON, EVENT_IDS.OUT_OFF],
+    11: [EVENT_IDS.SW_ON, EVENT_IDS.SW_OFF],
+    30: [EVENT_IDS.FLG_CHG],
+    50: [EVENT_IDS.BTN_SHORT, EVENT_IDS.OUT_ON, EVENT_IDS.OUT_OFF],
+}
+
+
+class SimModule:
+    """Synthetic Habitron module, keeps mirror status and SMC list."""
+
+    def __init__(self, addr: int, typ: bytes, name: str = "") -> None:
+        self.addr = addr
+        self.typ = typ
+        self.name = name if name else f"{MODULE_TYPES[typ.decode('iso8859-1')][:20]} {addr}"
+        self.serial = f"{typ[0]:03}{typ[1]:03}2400{800000 + addr:06}"
+        status = bytearray(MirrIdx.END)
+        status[MirrIdx.ADDR] = addr
+        status[MirrIdx.MOD_DESC : MirrIdx.MOD_DESC + 2] = typ
+        status[MirrIdx.TEMP_ROOM : MirrIdx.TEMP_ROOM + 2] = (210 + 500).to_bytes(2, "little")
+        self.status = status
+        self.set_text(MirrIdx.MOD_NAME, 32, self.name)
+        self.set_text(MirrIdx.MOD_SERIAL, 16, self.serial)
+        self.set_text(MirrIdx.SW_VERSION, 22, "SIM V1.0 01 01/2024")
+        self.smc = self.build_smc()
+        self._smc_upload = bytearray()
+
+    def set_text(self, idx: int, length: int, text: str) -> None:
+        """Write text into status, padded with spaces."""
+        self.status[idx : idx + length] = text.encode("iso8859-1")[:length].ljust(length)
+
+    def build_smc(self, no_flags: int = 2) -> bytes:
+        """Build SMC list with labels of local flags."""
+        lines = b""
+        for flg in range(1, no_flags + 1):
+            text = f"Flag {flg}".encode("iso8859-1")
+            lines += bytes([255, 0, 235, 119 + flg, 0, len(text) + 3, 0, 0]) + text
+        return (
+            no_flags.to_bytes(2, "little") + (len(lines) + 4).to_bytes(2, "little") + lines
+        )
+
+    def get_smc_pckg(self, area: int, pckg: int) -> bytes:
+        """Return package of SMC list, 31 bytes each, first package is 1 of area 50."""
+        idx = (area - 50) * 256 + pckg - 1
+        return self.smc[idx * 31 : (idx + 1) * 31]
+
+    def put_smc_pckg(self, flg: int, data: bytes) -> None:
+        """Store uploaded SMC package, flag 6 starts new list."""
+        if flg == 6:
+            self._smc_upload = bytearray()
+        self._smc_upload += data
+        if (len(self._smc_upload) >= 4) and (
+            len(self._smc_upload) >= int.from_bytes(self._smc_upload[2:4], "little")
+        ):
+            self.smc = bytes(self._smc_upload)
+
+    def set_outputs(self, mask: int, on: bool) -> list[int]:
+        """Switch outputs of bit mask, return changed output numbers."""
+        changed = []
+        for out in range(24):
+            if not mask & (1 << out):
+                continue
+            idx = MirrIdx.OUT_1_8 + (out >> 3)
+            bit = 1 << (out & 0x07)
+            if bool(self.status[idx] & bit) != on:
+                self.status[idx] ^= bit
+                changed.append(out + 1)
+        return changed
+
+    def set_flags(self, mask: int, on: bool) -> list[int]:
+        """Set local flags of bit mask, return changed flag numbers."""
+        changed = []
+        for flg in range(16):
+            if not mask & (1 << flg):
+                continue
+            idx = MirrIdx.FLAG_LOC + (flg >> 3)
+            bit = 1 << (flg & 0x07)
+            if bool(self.status[idx] & bit) != on:
+                self.status[idx] ^= bit
+                changed.append(flg + 1)
+        return changed
+
+    def random_event(self) -> tuple[int, bytes]:
+        """Create plausible event of module type, update status accordingly."""
+        event_id = random.choice(SIM_EVENTS.get(self.typ[0], [EVENT_IDS.OUT_ON]))
+        match event_id:
+            case EVENT_IDS.OUT_ON | EVENT_IDS.OUT_OFF:
+                out = random.randrange(8)
+                self.set_outputs(1 << out, event_id == EVENT_IDS.OUT_ON)
+                return event_id, bytes([out + 1])
+            case EVENT_IDS.SW_ON | EVENT_IDS.SW_OFF:
+                inp = random.randrange(8)
+                if event_id == EVENT_IDS.SW_ON:
+                    self.status[MirrIdx.INP_1_8] |= 1 << inp
+                else:
+                    self.status[MirrIdx.INP_1_8] &= ~(1 << inp) & 0xFF
+                return event_id, bytes([inp + 1])
+            case EVENT_IDS.FLG_CHG:
+                flg = random.randrange(8)
+                val = int(not self.status[MirrIdx.FLAG_LOC] & (1 << flg))
+                self.set_flags(1 << flg, bool(val))
+                return event_id, bytes([flg + 1, val])
+        return event_id, bytes([random.randrange(8) + 1])
+
+
+def create_modules(count: int, types: list[bytes] | None = None) -> list[SimModule]:
+    """Create count modules with addresses from 1, types cycle through given list."""
+    if not types:
+        types = [typ.encode("iso8859-1") for typ in MODULE_TYPES]
+    return [SimModule(addr, types[(addr - 1) % len(types)]) for addr in range(1, count + 1)]
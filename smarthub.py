@@ -12,6 +12,7 @@ import re
 import socket
 import uuid
 import os
+import time
 import psutil
 import cpuinfo
 from const import (
@@ -19,13 +20,27 @@ from const import (
     SMHUB_INFO,
     SMHUB_PORT,
     RT_DEF_ADDR,
+    RT_DEF_DEVICE,
+    RT_DEVICE_ENV,
+    RT_CAPTURE_ENV,
+    RT_REPLAY_ENV,
+    RT_REPLAY_SPEED_ENV,
     RT_BAUDRATE,
     RT_TIMEOUT,
+    RT_PROBE_TIMEOUT,
+    RT_BAUD_FILE,
+    DATA_FILES_DIR,
+    DATA_FILES_ADDON_DIR,
     RT_CMDS,
+    SNAPSHOT_INTERVAL,
+    SMHUB_SENSOR_INTERVAL,
 )
 from api_server import ApiServer, ApiServerMin
 from config_server import ConfigServer
+from event_bus import EventStreamServer
 from query_server import QueryServer
+from serial_capture import record_serial, replay_serial
+from snapshot import run_snapshots, save_snapshot
 
 
 class SmartHub:
@@ -38,16 +53,22 @@ class SmartHub:
         self.q_srv: QueryServer
         self.conf_srv: ConfigServer
         self.api_srv: ApiServer
+        self.evnt_stream_srv: EventStreamServer
         self._serial: str = ""
         self._pi_model: str = ""
         self._cpu_type: str = ""
-        self._cpu_info: dict
-        self._host: str = ""
-        self._host_ip: str = ""
+        self._cpu_info: dict = {}
+        self._cpu_freq_max: float = 0.0
+        self._mem_total: int = 0
+        self._disk_total: int = 0
+        self._sensors: dict[str, float] = {}  # sampled by run_sensor_sampling
+        self.info_ready: bool = False  # static info, collected by collect_info
+        self.info_task: asyncio.Task | None = None
+        self._host: str = socket.gethostname()
+        self._host_ip: str = self.get_ip()
         self.lan_mac: str = ""
         self.wlan_mac: str = ""
         self.curr_mac: str = ""
-        self.info = self.get_info()
         self.get_macs()
         self.logger.info("Smart Hub starting...")
         self.skip_init: bool = False
@@ -63,6 +84,9 @@ class SmartHub:
         self.skip_init = skip_init > 0
         self.restart = True
         self.logger.warning("Restart of sm_hub process requested")
+        save_snapshot(self.api_srv)
+        for rtr in self.api_srv.routers:
+            rtr.cancel_init_tasks()
         self.server.close()
         self.q_srv.close_query_srv()
         for tsk in self.tg._tasks:
@@ -79,6 +103,14 @@ class SmartHub:
         self.curr_mac = ":".join(re.findall("..", "%012x" % uuid.getnode()))
         return
 
+    def get_ip(self) -> str:
+        """Return ip of interface with default route, no packets sent."""
+        s = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        s.connect(("8.8.8.8", 80))
+        host_ip = s.getsockname()[0]
+        s.close()
+        return host_ip
+
     def get_host_ip(self) -> str:
         """Return own ip."""
         return self._host_ip
@@ -95,43 +127,87 @@ class SmartHub:
         """Return version string"""
         return SMHUB_INFO.TYPE
 
-    def get_info(self) -> str:
-        """Return information on Smart Hub hardware and software"""  # Get cpu statistics
-
-        if self._serial == "":
-            get_all = True
+    def read_static_info(self) -> None:
+        """Read device tree, cpu info, and totals, blocking, run in executor."""
+        try:
+            with open("/device-tree/model") as f:
+                self._pi_model = f.read()[:-1]
+            with open("/device-tree/serial-number") as f:
+                self._serial = f.read()[:-1]
+            with open("/device-tree/cpus/cpu@0/compatible") as f:
+                self._cpu_type = f.read()[:-1].split(",")[1]
+        except Exception:
             try:
-                with open("/device-tree/model") as f:
+                with open("/sys/firmware/devicetree/base/model") as f:
                     self._pi_model = f.read()[:-1]
-                    f.close()
-                with open("/device-tree/serial-number") as f:
+                with open("/sys/firmware/devicetree/base/serial-number") as f:
                     self._serial = f.read()[:-1]
-                    f.close()
-                with open("/device-tree/cpus/cpu@0/compatible") as f:
+                with open("/sys/firmware/devicetree/base/cpus/cpu@0/compatible") as f:
                     self._cpu_type = f.read()[:-1].split(",")[1]
-                    f.close()
             except Exception:
-                try:
-                    with open("/sys/firmware/devicetree/base/model") as f:
-                        self._pi_model = f.read()[:-1]
-                        f.close()
-                    with open("/sys/firmware/devicetree/base/serial-number") as f:
-                        self._serial = f.read()[:-1]
-                        f.close()
-                    with open(
-                        "/sys/firmware/devicetree/base/cpus/cpu@0/compatible"
-                    ) as f:
-                        self._cpu_type = f.read()[:-1].split(",")[1]
-                        f.close()
-                except Exception:
-                    self.logger.info("Using default devicetree")
-                    self._pi_model = "Raspberry Pi"
-                    self._serial = "10000000e3d90xxx"
-                    self._cpu_type = "unknown"
-            self._cpu_info = cpuinfo.get_cpu_info()
-        else:
-            get_all = False
+                self.logger.info("Using default devicetree")
+                self._pi_model = "Raspberry Pi"
+                self._serial = "10000000e3d90xxx"
+                self._cpu_type = "unknown"
+        self._cpu_info = cpuinfo.get_cpu_info()
+        self._cpu_freq_max = psutil.cpu_freq()[-1]
+        self._mem_total = psutil.virtual_memory().total
+        self._disk_total = psutil.disk_usage("/").total
+        self._host = socket.getfqdn()
+
+    def read_sensors(self) -> None:
+        """Sample cpu, memory, and disk values, blocking, run in executor."""
+        memory = psutil.virtual_memory()
+        disk = psutil.disk_usage("/")
+        self._sensors = {
+            "cpu_freq": psutil.cpu_freq()[0],
+            "cpu_load": psutil.cpu_percent(),
+            "cpu_temp": round(
+                psutil.sensors_temperatures()["cpu_thermal"][0].current, 1
+            ),
+            "mem_free": memory.available,
+            "mem_percent": memory.percent,
+            "disk_free": disk.free,
+            "disk_percent": disk.percent,
+        }
+
+    async def collect_info(self) -> None:
+        """Gather static info once off the event loop, then first sensor values."""
+        t_start = time.monotonic()
+        try:
+            await self.loop.run_in_executor(None, self.read_static_info)
+            await self.loop.run_in_executor(None, self.read_sensors)
+        except Exception as err_msg:
+            self.logger.warning(f"Host info incomplete: {err_msg}")
+        self.info_ready = True
+        self.logger.debug(
+            f"Host info collected in {time.monotonic() - t_start:.2f} s"
+        )
 
+    async def run_sensor_sampling(self, interval: float) -> None:
+        """Sample sensor values periodically for info and update requests."""
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                await self.loop.run_in_executor(None, self.read_sensors)
+            except Exception as err_msg:
+                self.logger.debug(f"Host sensors not sampled: {err_msg}")
+
+    async def wait_info(self) -> None:
+        """Wait for static host info collected at start."""
+        if not self.info_ready and self.info_task is not None:
+            await asyncio.shield(self.info_task)
+
+    def get_info(self) -> str:
+        """Return information on Smart Hub hardware and software from cache."""
+        if not self.info_ready:
+            # No blank identity data before collect_info has finished
+            return (
+                "hardware:\n  status: not ready\n"
+                + f"software:\n  type: {SMHUB_INFO.TYPE}\n"
+                + f"  version: {SMHUB_INFO.SW_VERSION}\n"
+            )
+        sensors = self._sensors
         info_str = "hardware:\n  platform:\n"
         info_str = info_str + "    type: " + self._pi_model + "\n"
         info_str = info_str + "    serial: " + self._serial + "\n"
@@ -139,63 +215,59 @@ class SmartHub:
         info_str = (
             info_str
             + "    type: "
-            + self._cpu_info["arch_string_raw"]
+            + self._cpu_info.get("arch_string_raw", "")
             + " "
             + self._cpu_type
             + "\n"
         )
         info_str = (
-            info_str + "    frequency current: " + str(psutil.cpu_freq()[0]) + "MHz\n"
+            info_str
+            + "    frequency current: "
+            + str(sensors.get("cpu_freq", 0.0))
+            + "MHz\n"
         )
         info_str = (
-            info_str + "    frequency max: " + str(psutil.cpu_freq()[-1]) + "MHz\n"
+            info_str + "    frequency max: " + str(self._cpu_freq_max) + "MHz\n"
         )
-        info_str = info_str + "    load: " + str(psutil.cpu_percent()) + "%\n"
+        info_str = info_str + "    load: " + str(sensors.get("cpu_load", 0.0)) + "%\n"
         info_str = (
             info_str
             + "    temperature: "
-            + str(round(psutil.sensors_temperatures()["cpu_thermal"][0].current, 1))
+            + str(sensors.get("cpu_temp", 0.0))
             + "°C\n"
         )
-        # Calculate memory information
-        memory = psutil.virtual_memory()
         info_str = info_str + "  memory:\n"
         info_str = (
             info_str
             + "    free: "
-            + str(round(memory.available / 1024.0 / 1024.0, 1))
+            + str(round(sensors.get("mem_free", 0) / 1024.0 / 1024.0, 1))
             + " MB\n"
         )
         info_str = (
             info_str
             + "    total: "
-            + str(round(memory.total / 1024.0 / 1024.0, 1))
+            + str(round(self._mem_total / 1024.0 / 1024.0, 1))
             + " MB\n"
         )
-        info_str = info_str + "    percent: " + str(memory.percent) + "%\n"
-        # Calculate disk information
-        disk = psutil.disk_usage("/")
+        info_str = (
+            info_str + "    percent: " + str(sensors.get("mem_percent", 0.0)) + "%\n"
+        )
         info_str = info_str + "  disk:\n"
         info_str = (
             info_str
             + "    free: "
-            + str(round(disk.free / 1024.0 / 1024.0 / 1024.0, 1))
+            + str(round(sensors.get("disk_free", 0) / 1024.0 / 1024.0 / 1024.0, 1))
             + " GB\n"
         )
         info_str = (
             info_str
             + "    total: "
-            + str(round(disk.total / 1024.0 / 1024.0 / 1024.0, 1))
+            + str(round(self._disk_total / 1024.0 / 1024.0 / 1024.0, 1))
             + " GB\n"
         )
-        info_str = info_str + "    percent: " + str(disk.percent) + "%\n"
-        if get_all:
-            # Get network info
-            s = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
-            s.connect(("8.8.8.8", 80))
-            self._host_ip = s.getsockname()[0]
-            s.close()
-            self._host = socket.getfqdn()
+        info_str = (
+            info_str + "    percent: " + str(sensors.get("disk_percent", 0.0)) + "%\n"
+        )
         info_str = info_str + "  network:\n"
         info_str = info_str + f"    host: {self._host}\n"
         info_str = info_str + f"    ip: {self._host_ip}\n"
@@ -216,28 +288,31 @@ class SmartHub:
         return info_str
 
     def get_update(self) -> str:
-        """Return updated information on Smart Hub sensors and status."""  # Get cpu statistics
-
+        """Return updated information on Smart Hub sensors and status from cache."""
+        sensors = self._sensors
         info_str = "hardware:\n"
         info_str = info_str + "  cpu:\n"
         info_str = (
-            info_str + "    frequency current: " + str(psutil.cpu_freq()[0]) + "MHz\n"
+            info_str
+            + "    frequency current: "
+            + str(sensors.get("cpu_freq", 0.0))
+            + "MHz\n"
         )
-        info_str = info_str + "    load: " + str(psutil.cpu_percent()) + "%\n"
+        info_str = info_str + "    load: " + str(sensors.get("cpu_load", 0.0)) + "%\n"
         info_str = (
             info_str
             + "    temperature: "
-            + str(round(psutil.sensors_temperatures()["cpu_thermal"][0].current, 1))
+            + str(sensors.get("cpu_temp", 0.0))
             + "°C\n"
         )
-        # Calculate memory information
-        memory = psutil.virtual_memory()
         info_str = info_str + "  memory:\n"
-        info_str = info_str + "    percent: " + str(memory.percent) + "%\n"
-        # Calculate disk information
-        disk = psutil.disk_usage("/")
+        info_str = (
+            info_str + "    percent: " + str(sensors.get("mem_percent", 0.0)) + "%\n"
+        )
         info_str = info_str + "  disk:\n"
-        info_str = info_str + "    percent: " + str(disk.percent) + "%\n"
+        info_str = (
+            info_str + "    percent: " + str(sensors.get("disk_percent", 0.0)) + "%\n"
+        )
 
         info_str = info_str + "software:\n"
         # Get logging levels
@@ -299,6 +374,46 @@ async def open_serial_interface(
     return (ser_rd, ser_wr)
 
 
+def baud_file_name() -> str:
+    """Return path of file with last working baud rate index."""
+    if os.getenv("SUPERVISOR_TOKEN") is None:
+        return DATA_FILES_DIR + RT_BAUD_FILE
+    return DATA_FILES_ADDON_DIR + RT_BAUD_FILE
+
+
+def read_baud_index(logger) -> int:
+    """Return index of baud rate to try first, last working one if stored."""
+    try:
+        with open(baud_file_name(), "r") as fid:
+            bd_rate = int(fid.read().strip())
+        if bd_rate in range(len(RT_BAUDRATE)):
+            return bd_rate
+    except FileNotFoundError:
+        pass
+    except Exception as err_msg:
+        logger.warning(f"   Could not read baud rate index: {err_msg}")
+    return 0
+
+
+def save_baud_index(bd_rate: int, logger) -> None:
+    """Store index of working baud rate for next start."""
+    try:
+        with open(baud_file_name(), "w") as fid:
+            fid.write(f"{bd_rate}\n")
+    except Exception as err_msg:
+        logger.warning(f"   Could not save baud rate index: {err_msg}")
+
+
+async def read_probe_resp(rd: StreamReader, timeout: float) -> bytes:
+    """Read response to test command, return as soon as frame is complete."""
+    t_end = time.monotonic() + timeout
+    resp_buf = b""
+    while (len(resp_buf) < 6) or (len(resp_buf) < resp_buf[3] + 1):
+        # Frame may arrive in pieces, e.g. single 0xFF first
+        resp_buf += await asyncio.wait_for(rd.read(1024), t_end - time.monotonic())
+    return resp_buf
+
+
 async def init_serial(bd_rate: int, logger):
     """Open and initialize serial interface to router."""
 
@@ -314,56 +429,52 @@ async def init_serial(bd_rate: int, logger):
     router_booting = True
 
     # For Pi5: "dtparam=uart0_console" into config.txt on sd boot partition
-    def_device = "/dev/serial0"  # ["/dev/ttyS0", "/dev/ttyS1", "/dev/ttyAMA0", "/dev/tty1", "/dev/tty0"]
+    # ["/dev/ttyS0", "/dev/ttyS1", "/dev/ttyAMA0", "/dev/tty1", "/dev/tty0"]
+    # Environment variable allows other devices, e.g. pty of router simulator
+    def_device = os.getenv(RT_DEVICE_ENV, RT_DEF_DEVICE)
+    rt_serial = None
     try:
         rt_serial = await open_serial_interface(def_device, bd_rate, logger)
     except Exception as err_msg:
         logger.info(f"   Error opening {def_device}: {err_msg}")
+        return None
 
+    t_probe = time.monotonic()
+    retries = 3  # unexpected responses, e.g. wrong baud rate
     try:
-        new_query = True
         while router_booting:
-            if new_query:
+            rt_cmd = prepare_buf_crc(
+                RT_CMDS.STOP_MIRROR.replace("<rtr>", chr(RT_DEF_ADDR))
+            )
+            rt_serial[1].write(rt_cmd.encode("iso8859-1"))
+            try:
+                resp_buf = await read_probe_resp(rt_serial[0], RT_PROBE_TIMEOUT)
+            except TimeoutError:
+                raise Exception("   No test response received")
+            if resp_buf[4] == 0x87:
+                logger.info(
+                    f"   Router available, responded in {1000 * (time.monotonic() - t_probe):.0f} ms"
+                )
+                router_booting = False
+            elif resp_buf[4] == 0xFD:  # 253
+                logger.info("   Waiting for router booting...")
+                await asyncio.sleep(5)
+            elif resp_buf[1:-1] == b"#\x01\x06\xc9\xff":
+                logger.info("   Router in ISP mode. Restarting system...")
                 rt_cmd = prepare_buf_crc(
-                    RT_CMDS.STOP_MIRROR.replace("<rtr>", chr(RT_DEF_ADDR))
+                    RT_CMDS.SYSTEM_RESTART.replace("<rtr>", chr(RT_DEF_ADDR))
                 )
                 rt_serial[1].write(rt_cmd.encode("iso8859-1"))
-            reading = asyncio.ensure_future(rt_serial[0].read(1024))
-            await asyncio.sleep(0.2)
-            if reading._state == "FINISHED":
-                resp_buf = reading.result()
-                if len(resp_buf) < 4:
-                    # sometimes just 0xff comes, needs another read
-                    logger.debug(f"   Unexpected short test response: {resp_buf}")
-                    new_query = False
-                elif new_query and (resp_buf[4] == 0x87):
-                    logger.info("   Router available")
-                    router_booting = False
-                elif (not new_query) and (resp_buf[3] == 0x87):
-                    logger.info("   Router available")
-                    router_booting = False
-                elif new_query and (resp_buf[4] == 0xFD):  # 253
-                    logger.info("   Waiting for router booting...")
-                    await asyncio.sleep(5)
-                    new_query = True
-                elif (not new_query) and (resp_buf[3] == 0xFD):  # 253
-                    logger.info("   Waiting for router booting...")
-                    await asyncio.sleep(5)
-                    new_query = True
-                elif resp_buf[1:-1] == b"#\x01\x06\xc9\xff":
-                    logger.info("   Router in ISP mode. Restarting system...")
-                    rt_cmd = prepare_buf_crc(
-                        RT_CMDS.SYSTEM_RESTART.replace("<rtr>", chr(RT_DEF_ADDR))
-                    )
-                    rt_serial[1].write(rt_cmd.encode("iso8859-1"))
-                else:
-                    logger.info("   Retry to connect router")
-                    logger.debug(f"   Unexpected test response: {resp_buf}")
-                    new_query = True
+            elif retries > 0:
+                logger.info("   Retry to connect router")
+                logger.debug(f"   Unexpected test response: {resp_buf}")
+                retries -= 1
             else:
-                raise Exception("   No test response received")
+                raise Exception(f"   Unexpected test response: {resp_buf}")
+            t_probe = time.monotonic()
     except Exception as err_msg:
         logger.error(f"   Error during test stop mirror command: {err_msg}")
+        await close_serial_interface(rt_serial)
         rt_serial = None
     return rt_serial
 
@@ -381,20 +492,28 @@ async def main(ev_loop):
     retry_max = 3
     retry_serial = retry_max
     logger = setup_logging()
+    t_start = time.monotonic()
     try:
         # Instantiate SmartHub object
         sm_hub = SmartHub(ev_loop, logger)
+        sm_hub.info_task = ev_loop.create_task(sm_hub.collect_info(), name="host_info")
         rt_serial = None
-        bd_rate = 0
+        bd_rate = read_baud_index(logger)  # last working rate first
+        saved_rate = bd_rate
+        if replay_file := os.getenv(RT_REPLAY_ENV):
+            # Recorded router traffic instead of serial interface
+            rt_serial = replay_serial(
+                replay_file, float(os.getenv(RT_REPLAY_SPEED_ENV, "1"))
+            )
         while (rt_serial is None) and (retry_serial >= 0):
             if retry_serial < retry_max:
                 logger.warning(
                     f"   Initialization of serial connection failed, retry {retry_max-retry_serial}"
                 )
-            rt_serial = await init_serial(bd_rate, logger)  # lower baud rate
+            rt_serial = await init_serial(bd_rate, logger)
             if rt_serial is None:
-                bd_rate = 1
-                rt_serial = await init_serial(bd_rate, logger)  # higher baud rate
+                bd_rate = 1 - bd_rate  # other baud rate
+                rt_serial = await init_serial(bd_rate, logger)
             retry_serial -= 1
         if rt_serial is None:
             init_flag = False
@@ -404,8 +523,12 @@ async def main(ev_loop):
             )
         else:
             logger.info(
-                f"   Initialization of serial connection with {RT_BAUDRATE[bd_rate]} baud succeeded"
+                f"   Initialization of serial connection with {RT_BAUDRATE[bd_rate]} baud succeeded after {time.monotonic() - t_start:.2f} s"
             )
+            if (bd_rate != saved_rate) and not replay_file:
+                save_baud_index(bd_rate, logger)
+            if (capture_file := os.getenv(RT_CAPTURE_ENV)) and not replay_file:
+                rt_serial = record_serial(rt_serial, capture_file)
             running_online = True
         if running_online:
             # Instantiate query object
@@ -414,6 +537,7 @@ async def main(ev_loop):
             await sm_hub.q_srv.initialize()
             # Instantiate api_server object
             sm_hub.api_srv = ApiServer(ev_loop, sm_hub, rt_serial)
+            sm_hub.api_srv.rt_arbiter.metrics.baudrate = RT_BAUDRATE[bd_rate]
         else:
             # Instantiate api_server object
             sm_hub.api_srv = ApiServerMin(ev_loop, sm_hub)
@@ -424,6 +548,9 @@ async def main(ev_loop):
         await sm_hub.conf_srv.initialize()  # ignore_ type
         if init_flag:
             await sm_hub.api_srv.get_initial_status()
+            logger.info(
+                f"Smart Hub initialized in {time.monotonic() - t_start:.2f} s"
+            )
         else:
             logger.warning("Initialization of router and modules skipped")
         startup_ok = True
@@ -445,6 +572,22 @@ async def main(ev_loop):
             if running_online:
                 logger.debug("   Starting query server")
                 sm_hub.tg.create_task(sm_hub.q_srv.run_query_srv(), name="q_srv")
+                logger.debug("   Starting event stream server")
+                sm_hub.evnt_stream_srv = EventStreamServer(
+                    sm_hub.api_srv.event_bus, sm_hub._host_ip
+                )
+                sm_hub.tg.create_task(
+                    sm_hub.evnt_stream_srv.run_stream_srv(), name="evnt_stream_srv"
+                )
+                if init_flag:
+                    logger.debug("   Starting snapshot task")
+                    sm_hub.tg.create_task(
+                        run_snapshots(sm_hub.api_srv, SNAPSHOT_INTERVAL),
+                        name="snapshots",
+                    )
+            sm_hub.tg.create_task(
+                sm_hub.run_sensor_sampling(SMHUB_SENSOR_INTERVAL), name="host_sensors"
+            )
             logger.debug("   Starting config server")
             await sm_hub.conf_srv.prepare()
             sm_hub.tg.create_task(sm_hub.conf_srv.site.start(), name="conf_srv")
@@ -463,6 +606,7 @@ async def main(ev_loop):
     except Exception:
         pass
     if rt_serial is not None:
+        sm_hub.api_srv.rt_arbiter.stop()
         rt_serial[1].close()
     if sm_hub.restart:
         return 1
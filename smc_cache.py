@@ -0,0 +1,89 @@
+import logging
+import os
+from checksum import calc_crc
+
+SMC_CACHE_MAGIC = b"SMC1"
+
+
+class SmcCache:
+    """On-disk cache of module SMC lists, keyed by module address, serial, and SMC crc.
+
+    Entries are only used if the crc of the cached list matches the crc of the
+    module mirror, so changed lists are read from the module again.
+    """
+
+    def __init__(self, file_name: str) -> None:
+        self.logger = logging.getLogger(__name__)
+        self.file_name = file_name
+        self._entries: dict[tuple[int, str], tuple[int, bytes]] = {}
+        self._dirty = False
+        self.hits: int = 0
+        self.misses: int = 0
+        self.load()
+
+    def get(self, mod_addr: int, serial: str, smc_crc: int) -> bytes | None:
+        """Return cached list, if crc matches."""
+        entry = self._entries.get((mod_addr, serial))
+        if (entry is None) or (entry[0] != smc_crc) or (calc_crc(entry[1]) != smc_crc):
+            self.misses += 1
+            return None
+        self.hits += 1
+        return entry[1]
+
+    def put(self, mod_addr: int, serial: str, smc_crc: int, smc_list: bytes) -> None:
+        """Store list read from module, saved with next save()."""
+        self._entries[(mod_addr, serial)] = (smc_crc, smc_list)
+        self._dirty = True
+
+    def load(self) -> None:
+        """Read cache file, start empty if missing or invalid."""
+        if not os.path.isfile(self.file_name):
+            return
+        try:
+            with open(self.file_name, "rb") as fid:
+                buf = fid.read()
+            if buf[:4] != SMC_CACHE_MAGIC:
+                raise ValueError("wrong file type")
+            ptr = 4
+            entries = {}
+            while ptr < len(buf):
+                mod_addr = buf[ptr]
+                s_len = buf[ptr + 1]
+                serial = buf[ptr + 2 : ptr + 2 + s_len].decode("iso8859-1")
+                ptr += 2 + s_len
+                smc_crc = int.from_bytes(buf[ptr : ptr + 2], "little")
+                l_len = int.from_bytes(buf[ptr + 2 : ptr + 6], "little")
+                ptr += 6
+                if ptr + l_len > len(buf):
+                    raise ValueError("truncated file")
+                entries[(mod_addr, serial)] = (smc_crc, buf[ptr : ptr + l_len])
+                ptr += l_len
+            self._entries = entries
+            self.logger.debug(
+                f"SMC cache {self.file_name} loaded, {len(entries)} modules"
+            )
+        except Exception as err_msg:
+            self.logger.warning(f"SMC cache {self.file_name} ignored: {err_msg}")
+
+    def save(self) -> None:
+        """Write cache file, if entries changed."""
+        if not self._dirty:
+            return
+        buf = bytearray(SMC_CACHE_MAGIC)
+        for (mod_addr, serial), (smc_crc, smc_list) in self._entries.items():
+            serial_b = serial.encode("iso8859-1")
+            buf += bytes([mod_addr, len(serial_b)]) + serial_b
+            buf += smc_crc.to_bytes(2, "little") + len(smc_list).to_bytes(4, "little")
+            buf += smc_list
+        try:
+            with open(self.file_name + ".tmp", "wb") as fid:
+                fid.write(buf)
+            os.replace(self.file_name + ".tmp", self.file_name)
+            self._dirty = False
+            self.logger.debug(f"SMC cache saved to {self.file_name}")
+        except Exception as err_msg:
+            self.logger.error(f"Error saving SMC cache {self.file_name}: {err_msg}")
+
+    def get_stats(self) -> dict[str, int]:
+        """Return counters."""
+        return {"modules": len(self._entries), "hits": self.hits, "misses": self.misses}
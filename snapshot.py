@@ -0,0 +1,125 @@
+import asyncio
+import logging
+import os
+from os.path import isdir
+from const import DATA_FILES_ADDON_DIR, DATA_FILES_DIR, SNAPSHOT_FILE
+
+SNAPSHOT_MAGIC = b"SMHS"
+SNAPSHOT_VERSION = 1
+
+logger = logging.getLogger(__name__)
+
+
+def snapshot_file_name(api_srv) -> str:
+    """Return path of snapshot file, in addon config dir if present."""
+    if api_srv.is_addon and isdir(DATA_FILES_ADDON_DIR):
+        return DATA_FILES_ADDON_DIR + SNAPSHOT_FILE
+    return DATA_FILES_DIR + SNAPSHOT_FILE
+
+
+def encode_record(rec: dict) -> bytes:
+    """Return record as field count and fields of name, type tag, length, value."""
+    buf = bytearray(len(rec).to_bytes(2, "little"))
+    for key, val in rec.items():
+        if isinstance(val, (bytes, bytearray, memoryview)):
+            tag, data = b"b", bytes(val)
+        elif isinstance(val, str):
+            tag, data = b"s", val.encode("utf-8")
+        elif isinstance(val, int):
+            tag, data = b"i", val.to_bytes(4, "little", signed=True)
+        elif isinstance(val, list):
+            tag, data = b"l", b"".join(v.to_bytes(4, "little") for v in val)
+        else:
+            raise ValueError(f"field {key} of unknown type {type(val)}")
+        key_b = key.encode("iso8859-1")
+        buf += bytes([len(key_b)]) + key_b + tag + len(data).to_bytes(4, "little")
+        buf += data
+    return bytes(buf)
+
+
+def decode_record(buf: bytes, ptr: int) -> tuple[dict, int]:
+    """Return record at ptr and pointer behind it."""
+    rec = {}
+    cnt = int.from_bytes(buf[ptr : ptr + 2], "little")
+    ptr += 2
+    for _ in range(cnt):
+        k_len = buf[ptr]
+        key = buf[ptr + 1 : ptr + 1 + k_len].decode("iso8859-1")
+        ptr += 1 + k_len
+        tag = buf[ptr : ptr + 1]
+        d_len = int.from_bytes(buf[ptr + 1 : ptr + 5], "little")
+        ptr += 5
+        if ptr + d_len > len(buf):
+            raise ValueError("truncated file")
+        data = buf[ptr : ptr + d_len]
+        ptr += d_len
+        if tag == b"b":
+            rec[key] = data
+        elif tag == b"s":
+            rec[key] = data.decode("utf-8")
+        elif tag == b"i":
+            rec[key] = int.from_bytes(data, "little", signed=True)
+        elif tag == b"l":
+            rec[key] = [
+                int.from_bytes(data[i : i + 4], "little") for i in range(0, d_len, 4)
+            ]
+        else:
+            raise ValueError(f"unknown type tag {tag!r}")
+    return rec, ptr
+
+
+def save_snapshot(api_srv) -> None:
+    """Write router and module status to snapshot file, atomically replaced."""
+    file_name = snapshot_file_name(api_srv)
+    rtr = api_srv.routers[0]
+    if api_srv._init_mode or not rtr.modules:
+        return  # incomplete status
+    rtr_rec, mod_recs = rtr.get_snapshot()
+    try:
+        buf = bytearray(SNAPSHOT_MAGIC)
+        buf.append(SNAPSHOT_VERSION)
+        buf += encode_record(rtr_rec)
+        buf += len(mod_recs).to_bytes(2, "little")
+        for mod_rec in mod_recs:
+            buf += encode_record(mod_rec)
+        with open(file_name + ".tmp", "wb") as fid:
+            fid.write(buf)
+        os.replace(file_name + ".tmp", file_name)
+        api_srv.snapshot_seq = api_srv.status_journal.seq
+        logger.debug(f"Snapshot with {len(mod_recs)} modules saved to {file_name}")
+    except Exception as err_msg:
+        logger.error(f"Error saving snapshot {file_name}: {err_msg}")
+
+
+def load_snapshot(api_srv) -> tuple[dict, list[dict]] | None:
+    """Return router and module records of snapshot file, None if missing or invalid."""
+    file_name = snapshot_file_name(api_srv)
+    if not os.path.isfile(file_name):
+        return None
+    try:
+        with open(file_name, "rb") as fid:
+            buf = fid.read()
+        if buf[:4] != SNAPSHOT_MAGIC:
+            raise ValueError("wrong file type")
+        if buf[4] != SNAPSHOT_VERSION:
+            raise ValueError(f"version {buf[4]} not supported")
+        rtr_rec, ptr = decode_record(buf, 5)
+        mod_cnt = int.from_bytes(buf[ptr : ptr + 2], "little")
+        ptr += 2
+        mod_recs = []
+        for _ in range(mod_cnt):
+            mod_rec, ptr = decode_record(buf, ptr)
+            mod_recs.append(mod_rec)
+    except Exception as err_msg:
+        logger.warning(f"Snapshot {file_name} ignored: {err_msg}")
+        return None
+    logger.info(f"Snapshot {file_name} loaded, {len(mod_recs)} modules")
+    return rtr_rec, mod_recs
+
+
+async def run_snapshots(api_srv, interval: float) -> None:
+    """Save snapshot periodically, if status changed since last save."""
+    while True:
+        await asyncio.sleep(interval)
+        if api_srv.status_journal.seq != api_srv.snapshot_seq:
+            save_snapshot(api_srv)
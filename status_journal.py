@@ -0,0 +1,129 @@
+from collections import deque
+import os
+from const import STAT_DELTA_GAP, STAT_JOURNAL_LEN
+
+
+def changed_ranges(
+    old: bytes, new: bytes, gap: int = STAT_DELTA_GAP
+) -> list[tuple[int, bytes]]:
+    """Return offsets and new data of changed parts, joined up to gap bytes apart."""
+    if len(old) != len(new):
+        return [(0, new)]
+    ranges: list[tuple[int, bytes]] = []
+    start = last = -1
+    for idx, (x, y) in enumerate(zip(old, new)):
+        if x == y:
+            continue
+        if (start >= 0) and (idx - last <= gap + 1):
+            last = idx
+            continue
+        if start >= 0:
+            ranges.append((start, new[start : last + 1]))
+        start = last = idx
+    if start >= 0:
+        ranges.append((start, new[start : last + 1]))
+    return ranges
+
+
+class StatusJournal:
+    """Bounded journal of module and router status changes with global sequence number.
+
+    Entries keep references of former and new status, diffs are computed on reads.
+    Module 0 is the channel status of the router. Sequence numbers restart with
+    each run, so readers pass the random epoch of the run they got them from.
+    """
+
+    def __init__(self, maxlen: int = STAT_JOURNAL_LEN) -> None:
+        self.epoch: int = int.from_bytes(os.urandom(4), "little") | 1  # never 0
+        self.seq: int = 0
+        self._entries: deque[tuple[int, int, int, bytes, bytes]] = deque(
+            maxlen=maxlen
+        )
+
+    def record(self, rtr: int, mod: int, old: bytes, new: bytes) -> None:
+        """Append status change, bump sequence number."""
+        if old == new:
+            return
+        self.seq += 1
+        self._entries.append((self.seq, rtr, mod, old, new))
+
+    def clear(self) -> None:
+        """Drop all entries, readers of former sequence numbers get full status."""
+        self._entries.clear()
+
+    def changes_since(
+        self, seq: int
+    ) -> dict[tuple[int, int], tuple[bytes, bytes]] | None:
+        """Return status before seq and latest status per router and module.
+
+        None, if seq is unknown or journal has wrapped, full snapshot needed.
+        """
+        if (seq == 0) or (seq > self.seq):
+            return None
+        if seq == self.seq:
+            return {}
+        if not self._entries or (self._entries[0][0] > seq + 1):
+            return None
+        changes: dict[tuple[int, int], tuple[bytes, bytes]] = {}
+        for e_seq, rtr, mod, old, new in reversed(self._entries):
+            if e_seq <= seq:
+                break
+            if (rtr, mod) in changes:
+                changes[(rtr, mod)] = (old, changes[(rtr, mod)][1])
+            else:
+                changes[(rtr, mod)] = (old, new)
+        return changes
+
+    def get_delta(
+        self, seq: int, routers: list, epoch: int = 0
+    ) -> tuple[int, bool, list[tuple[int, int, int, bytes]]]:
+        """Return sequence number, full flag, and changes per router and module.
+
+        Full status, if epoch is not the one of this run.
+        """
+        changes = self.changes_since(seq) if epoch == self.epoch else None
+        if changes is None:
+            entries = []
+            for rtr in routers:
+                entries.append((rtr._id, 0, 0, rtr.chan_status))
+                for mod in rtr.modules:
+                    entries.append((rtr._id, mod._id, 0, mod.status))
+            return self.seq, True, entries
+        return (
+            self.seq,
+            False,
+            [
+                (rtr, mod, offs, data)
+                for (rtr, mod), (old, new) in sorted(changes.items())
+                for offs, data in changed_ranges(old, new)
+            ],
+        )
+
+    def encode_delta(self, seq: int, routers: list, epoch: int = 0) -> bytes:
+        """Return delta as bytes.
+
+        Sequence number (4), epoch (4), full flag, count (2), entries of router,
+        module, offset, length, data.
+        """
+        new_seq, full, entries = self.get_delta(seq, routers, epoch)
+        buf = bytearray(new_seq.to_bytes(4, "little"))
+        buf += self.epoch.to_bytes(4, "little")
+        buf.append(int(full))
+        buf += len(entries).to_bytes(2, "little")
+        for rtr, mod, offs, data in entries:
+            buf += bytes([rtr, mod, offs, len(data)])
+            buf += data
+        return bytes(buf)
+
+    def delta_dict(self, seq: int, routers: list, epoch: int = 0) -> dict:
+        """Return delta for json output, data as hex strings."""
+        new_seq, full, entries = self.get_delta(seq, routers, epoch)
+        return {
+            "seq": new_seq,
+            "epoch": self.epoch,
+            "full": full,
+            "changes": [
+                {"rtr": rtr, "mod": mod, "offs": offs, "data": data.hex()}
+                for rtr, mod, offs, data in entries
+            ],
+        }
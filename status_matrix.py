@@ -0,0 +1,80 @@
+import heapq
+from const import CStatBlkIdx, MirrIdx, MStatIdx, RT_STAT_MATRIX_ROWS
+
+
+def gather_plan(blocks: list[tuple[int, int]]) -> list[tuple[int, int, int]]:
+    """Merge adjacent index blocks, return (source start, source end, destination)."""
+    plan: list[tuple[int, int, int]] = []
+    dst = 0
+    for i0, i1 in blocks:
+        if plan and plan[-1][1] == i0:
+            plan[-1] = (plan[-1][0], i1, plan[-1][2])
+        else:
+            plan.append((i0, i1, dst))
+        dst += i1 - i0
+    return plan
+
+
+COMP_PLAN = gather_plan(CStatBlkIdx)
+COMP_LEN = sum(i1 - i0 for i0, i1, _ in COMP_PLAN)
+
+
+class StatusMatrix:
+    """Preallocated full and compact mirrors of all modules of a router.
+
+    Each row starts with the length byte of status reads, followed by the mirror,
+    so reading all modules in row order is a single slice of the matrix.
+    """
+
+    def __init__(self, rows: int = RT_STAT_MATRIX_ROWS) -> None:
+        self.full_stride = 1 + MirrIdx.END
+        self.comp_stride = 1 + COMP_LEN
+        self.full = bytearray(rows * self.full_stride)
+        self.compact = bytearray(rows * self.comp_stride)
+        self._full_mv = memoryview(self.full)
+        self._comp_mv = memoryview(self.compact)
+        self._free = list(range(rows))  # heap, lowest free row first
+
+    def attach(self) -> int:
+        """Return free row, initialized with length bytes and zeros."""
+        row = heapq.heappop(self._free)
+        f_base = row * self.full_stride
+        c_base = row * self.comp_stride
+        self._full_mv[f_base : f_base + self.full_stride] = bytes(self.full_stride)
+        self._comp_mv[c_base : c_base + self.comp_stride] = bytes(self.comp_stride)
+        self.full[f_base] = MirrIdx.END
+        self.compact[c_base] = MStatIdx.END
+        return row
+
+    def release(self, row: int) -> None:
+        """Return row of removed module."""
+        heapq.heappush(self._free, row)
+
+    def full_view(self, row: int) -> memoryview:
+        """Return window of full mirror of row, without length byte."""
+        f_base = row * self.full_stride + 1
+        return self._full_mv[f_base : f_base + MirrIdx.END]
+
+    def comp_view(self, row: int) -> memoryview:
+        """Return window of compact mirror of row, without length byte."""
+        c_base = row * self.comp_stride + 1
+        return self._comp_mv[c_base : c_base + COMP_LEN]
+
+    def write(self, row: int, status: bytes) -> None:
+        """Copy full mirror into row and gather its compact mirror in place."""
+        full = self.full_view(row)
+        s_len = min(len(status), MirrIdx.END)
+        full[:s_len] = status[:s_len]
+        if s_len < MirrIdx.END:
+            full[s_len:] = bytes(MirrIdx.END - s_len)
+        comp = self.comp_view(row)
+        for i0, i1, dst in COMP_PLAN:
+            comp[dst : dst + i1 - i0] = full[i0:i1]
+
+    def read(self, rows: list[int], direct: bool) -> memoryview | bytes:
+        """Return rows with length bytes, full or compact, a slice if rows are consecutive."""
+        stride = self.full_stride if direct else self.comp_stride
+        mv = self._full_mv if direct else self._comp_mv
+        if rows and rows == list(range(rows[0], rows[0] + len(rows))):
+            return mv[rows[0] * stride : (rows[-1] + 1) * stride]
+        return b"".join(mv[row * stride : (row + 1) * stride] for row in rows)
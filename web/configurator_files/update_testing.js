@@ -25,10 +25,26 @@ watchEventStatus();
 
 async function watchEventStatus() {
 
-    await setInterval(function () {
-        // alle 0.5 Sekunden ausführen 
-        getEvents();
-    }, 500);
+    if (typeof EventSource === "undefined") {
+        await setInterval(function () {
+            // alle 0.5 Sekunden ausführen 
+            getEvents();
+        }, 500);
+        return;
+    }
+    // Events vom Server gesendet, Tasten-Anzeige nach 0.5 Sekunden zurücksetzen
+    let resetTimer = null;
+    const evntSource = new EventSource("test/event_stream");
+    evntSource.onmessage = function (e) {
+        setEventStatus(e.data);
+        clearTimeout(resetTimer);
+        resetTimer = setTimeout(function () {
+            setEventStatus("{}");
+        }, 500);
+    };
+    window.addEventListener("beforeunload", function () {
+        evntSource.close();
+    });
 }
 
 function undoChecking(i) {